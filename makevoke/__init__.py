@@ -1,6 +1,16 @@
 """Common project Makefile implemented with Invoke"""
-from importlib.metadata import version
 
 
 __pkgname__ = "makevoke"
-__version__ = version(__pkgname__)
+
+
+def __getattr__(name):
+    # Version is resolved lazily since 'importlib.metadata' is slow to import and
+    # most usages (like the commandline) do not need it
+    if name == "__version__":
+        from importlib.metadata import version
+
+        globals()["__version__"] = version(__pkgname__)
+        return globals()["__version__"]
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,8 +1,16 @@
+import contextlib
+import contextvars
+import functools
 from pathlib import Path
 
+from . import history, logarchive, profiling
 from .exceptions import MakevokeContextError
 
 
+# Contexts already resolved for some classes, see 'MakevokeBase.use_context()'
+_RESOLVED_CONTEXTS = contextvars.ContextVar("makevoke_resolved_contexts", default={})
+
+
 class MakevokeBase:
     """
     Base implements context builder and command runner.
@@ -11,6 +19,12 @@ class MakevokeBase:
     ENABLED_CONTEXT_VARS = [
         "BASE_DIR",
     ]
+    EXECUTORS = []
+    PROFILE = []
+    PROFILE_TASKS = []
+    PROFILE_DIR = None
+    HISTORY = None
+    LOG_ARCHIVE = None
 
     @classmethod
     def get_context(cls, extra=None):
@@ -20,6 +34,8 @@ class MakevokeBase:
         Context is just a set of variables enabled from ``ENABLED_CONTEXT_VARS``
         attribute. All of these variables are expected to be set as Makefile attributes.
 
+        Inside ``use_context()``, the given resolved context is used instead.
+
         Keyword Arguments:
             extra (dict): Optionnal dictionnary to add or override some items into the
                 base context.
@@ -29,6 +45,10 @@ class MakevokeBase:
         """
         extra = extra or {}
 
+        resolved = _RESOLVED_CONTEXTS.get().get(cls)
+        if resolved is not None:
+            return dict(resolved, **extra)
+
         unfound = [
             name
             for name in getattr(cls, "ENABLED_CONTEXT_VARS", [])
@@ -69,12 +89,43 @@ class MakevokeBase:
 
         return context
 
+    @classmethod
+    @contextlib.contextmanager
+    def use_context(cls, context):
+        """
+        Use an already resolved context for this class, only in the current thread
+        and until the end of the block.
+
+        Every ``get_context()`` call for this class, like the ones from ``run()``,
+        then returns a copy of this context updated with its ``extra`` argument.
+
+        Arguments:
+            context (dict): Resolved context.
+        """
+        contexts = dict(_RESOLVED_CONTEXTS.get())
+        contexts[cls] = context
+        token = _RESOLVED_CONTEXTS.set(contexts)
+        try:
+            yield context
+        finally:
+            _RESOLVED_CONTEXTS.reset(token)
+
     @classmethod
     def run(cls, inv, commandline, extra=None, **kwargs):
         """
         Format given command line with Makefile context then run it with given
         'invoke' instance.
 
+        Command is given to the first executor from ``EXECUTORS`` attribute which
+        accepts it, if any. An executor is an object with methods
+        ``accepts(command, **kwargs)`` and ``run(inv, command, **kwargs)`` which
+        returns a result like 'invoke' runner, see
+        ``makevoke.forkserver.ForkServerExecutor``.
+
+        Run is profiled when profiling is enabled, see ``makevoke.profiling``, and
+        recorded when history is enabled, see ``makevoke.history``. Its outputs are
+        archived when log archive is enabled, see ``makevoke.logarchive``.
+
         Arguments:
             inv (invoke): Invoke instance.
             commandline (string): Command line with possible patterns for context
@@ -90,8 +141,177 @@ class MakevokeBase:
             invoke.runners.Result: Returned result from 'invoke' runner.
         """
         extra = extra or {}
+        command = commandline.format(**cls.get_context(extra=extra))
+
+        if history.is_enabled(cls):
+            return history.record_call(
+                cls, "command", command, commandline, cls._execute, inv, command,
+                **kwargs
+            )
+
+        return cls._execute(inv, command, **kwargs)
+
+    @classmethod
+    def _execute(cls, inv, command, **kwargs):
+        if profiling.is_enabled(cls):
+            return profiling.profile_run(cls, cls._dispatch, inv, command, **kwargs)
+
+        return cls._dispatch(inv, command, **kwargs)
+
+    @classmethod
+    def _dispatch(cls, inv, command, **kwargs):
+        executor = next(
+            (item for item in cls.EXECUTORS if item.accepts(command, **kwargs)),
+            None,
+        )
+        if executor is None:
+            runner = inv.run
+        else:
+            runner = functools.partial(executor.run, inv)
+
+        if logarchive.is_enabled(cls):
+            return logarchive.archive_run(
+                cls, runner, command, streaming=executor is None,
+                config=getattr(inv, "config", None), **kwargs
+            )
+
+        return runner(command, **kwargs)
+
+    @classmethod
+    def run_python(cls, func, *args, extra=None, pool=False, hide=False, warn=False,
+                   **kwargs):
+        """
+        Run a Python callable with Makefile context instead of a Python command
+        line, so it does not pay for an interpreter startup.
+
+        See ``makevoke.runners`` for details.
+
+        Arguments:
+            func (callable): Function to call with context as first argument.
+            *args: Any positional arguments are passed to function after context.
+            **kwargs: Any keyword arguments are passed to function (except the
+                ones below).
+
+        Keyword Arguments:
+            extra (dict): A dictionnary for extra variable to pass into
+                Makefile context. Default to an empty dict.
+            pool (boolean): If True, function is run on a process pool shared
+                during session, else it is run in current process. Default to False.
+            hide (boolean): If True, captured outputs are not printed.
+            warn (boolean): If True, a failure does not raise an
+                ``invoke.exceptions.UnexpectedExit`` exception.
 
-        return inv.run(
-            commandline.format(**cls.get_context(extra=extra)),
-            **kwargs,
+        Returns:
+            makevoke.runners.PythonResult: Result with captured outputs, exit code
+            and returned value.
+        """
+        from .runners import run_python
+
+        return run_python(
+            func,
+            cls.get_context(extra=extra),
+            args=args,
+            kwargs=kwargs,
+            pool=pool,
+            hide=hide,
+            warn=warn,
         )
+
+    @classmethod
+    def pipeline(cls, *stages, extra=None, capture=False, hide=False, warn=False,
+                 env=None, cwd=None):
+        """
+        Stream data through a chain of command lines formatted with Makefile context
+        and Python generator stages.
+
+        See ``makevoke.pipeline`` for details.
+
+        Arguments:
+            *stages: Command lines with possible patterns for context variables and
+                Python callables which receive an iterator of lines and yield lines.
+
+        Keyword Arguments:
+            extra (dict): A dictionnary for extra variable to pass into
+                Makefile context. Default to an empty dict.
+            capture (boolean): If True, output of last stage is kept in result.
+            hide (boolean): If True, output of last stage is not printed.
+            warn (boolean): If True, a failure does not raise an
+                ``invoke.exceptions.UnexpectedExit`` exception.
+            env (dict): Environment variables to add for commands.
+            cwd (string): Working directory for commands.
+
+        Returns:
+            makevoke.pipeline.PipelineResult: Result with exit code of every stages.
+        """
+        from .pipeline import Pipeline
+
+        context = cls.get_context(extra=extra)
+
+        return Pipeline(
+            [
+                stage.format(**context) if isinstance(stage, str) else stage
+                for stage in stages
+            ],
+            env=env,
+            cwd=cwd,
+        ).run(capture=capture, hide=hide, warn=warn)
+
+    @classmethod
+    def profile_task(cls, func):
+        """
+        Decorator to profile a task body with profilers enabled from ``PROFILE``
+        attribute or ``MAKEVOKE_PROFILE`` environment variable. ::
+
+            @task
+            @Makefile.profile_task
+            def build(ctx):
+                ...
+
+        See ``makevoke.profiling`` for details.
+
+        Arguments:
+            func (callable): Task function, its name is the task name.
+
+        Returns:
+            callable: Wrapped function.
+        """
+        name = func.__name__.replace("_", "-")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiling.is_enabled(cls):
+                return func(*args, **kwargs)
+
+            return profiling.profile_call(cls, name, func, *args, **kwargs)
+
+        return wrapper
+
+    @classmethod
+    def record_task(cls, func):
+        """
+        Decorator to record task runs in history enabled from ``HISTORY``
+        attribute or ``MAKEVOKE_HISTORY`` environment variable. ::
+
+            @task
+            @Makefile.record_task
+            def build(ctx):
+                ...
+
+        See ``makevoke.history`` for details.
+
+        Arguments:
+            func (callable): Task function, its name is the task name.
+
+        Returns:
+            callable: Wrapped function.
+        """
+        name = func.__name__.replace("_", "-")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not history.is_enabled(cls):
+                return func(*args, **kwargs)
+
+            return history.record_call(cls, "task", name, name, func, *args, **kwargs)
+
+        return wrapper
@@ -0,0 +1,372 @@
+"""
+Cache
+=====
+
+Session scoped caches for filesystem lookups.
+
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+from collections import namedtuple
+
+from .exceptions import MakevokeCacheError
+
+
+# A directory entry as listed from ``StatCache.listdir()``
+CachedEntry = namedtuple(
+    "CachedEntry",
+    ["name", "path", "is_dir", "is_file", "is_symlink"],
+)
+
+
+class InotifyWatcher:
+    """
+    Watch directories for changes with the Linux ``inotify`` API.
+
+    Watcher is non blocking, pending events are only read when ``read_changes()`` is
+    called.
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+
+    WATCH_MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+        IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    )
+    EVENT_HEADER = struct.Struct("iIII")
+
+    _libc = None
+
+    def __init__(self):
+        libc = self.get_libc()
+        if libc is None:
+            raise MakevokeCacheError(
+                "Inotify is not available on this system"
+            )
+
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise MakevokeCacheError(
+                "Unable to initialize inotify: {}".format(
+                    os.strerror(ctypes.get_errno())
+                )
+            )
+
+        self._watches = {}
+        self._directories = {}
+
+    @classmethod
+    def get_libc(cls):
+        """
+        Load the C library if it implements inotify.
+
+        Returns:
+            ctypes.CDLL: The C library or None if inotify is not available.
+        """
+        if not sys.platform.startswith("linux"):
+            return None
+
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(
+                    ctypes.util.find_library("c") or None,
+                    use_errno=True,
+                )
+                libc.inotify_init1
+                libc.inotify_add_watch
+            except (OSError, AttributeError):
+                return None
+
+            cls._libc = libc
+
+        return cls._libc
+
+    @classmethod
+    def available(cls):
+        """
+        Returns:
+            boolean: True if inotify is available on this system.
+        """
+        return cls.get_libc() is not None
+
+    def watch(self, directory):
+        """
+        Start to watch a directory if not already watched.
+
+        Arguments:
+            directory (string): Absolute directory path.
+
+        Returns:
+            boolean: True if directory is watched, False if it could not be watched
+            (like when it does not exist or when watch limit is reached).
+        """
+        if directory in self._directories:
+            return True
+
+        wd = self._libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(directory),
+            self.WATCH_MASK,
+        )
+        if wd < 0:
+            return False
+
+        self._watches[wd] = directory
+        self._directories[directory] = wd
+
+        return True
+
+    def read_changes(self):
+        """
+        Read pending events.
+
+        Returns:
+            set: Absolute paths of changed entries and directories. None is returned
+            if the event queue has overflowed, in this case everything should be
+            considered as changed.
+        """
+        changes = set()
+
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+
+            if not data:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    return None
+
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+
+                changes.add(directory)
+                if name:
+                    changes.add(os.path.join(directory, os.fsdecode(name)))
+
+                if mask & (self.IN_IGNORED | self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    self._watches.pop(wd, None)
+                    self._directories.pop(directory, None)
+
+        return changes
+
+    def close(self):
+        """
+        Stop watching and release inotify file descriptor.
+        """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self._watches = {}
+            self._directories = {}
+
+
+class StatCache:
+    """
+    Cache for path status and directory listings.
+
+    It is meant to live during a session (like a command run) to avoid hitting the
+    filesystem again for the same paths. Missing paths are cached too. Paths are
+    cached on their absolute form.
+
+    Without watching, cache entries are kept until they are explicitely invalidated
+    with ``invalidate()``. With watching enabled, cache is automatically invalidated
+    from filesystem changes with inotify (Linux only).
+
+    Counters ``hits`` and ``misses`` record cache efficiency.
+
+    Keyword Arguments:
+        watch (boolean): If True, enable automatic invalidation with inotify. Default
+            to False.
+    """
+    def __init__(self, watch=False):
+        self.hits = 0
+        self.misses = 0
+
+        self._stats = {}
+        self._listings = {}
+        # Incremented on every invalidation, so a result computed meanwhile is not
+        # stored
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._watcher = InotifyWatcher() if watch else None
+
+    def _key(self, path):
+        return os.path.abspath(os.fspath(path))
+
+    def _sync(self):
+        """
+        Invalidate entries from pending watcher changes.
+        """
+        if self._watcher is None:
+            return
+
+        changes = self._watcher.read_changes()
+
+        if changes is None:
+            self.invalidate()
+            return
+
+        if changes:
+            self._generation += 1
+        for path in changes:
+            self._stats.pop(path, None)
+            self._listings.pop(path, None)
+
+    def _cacheable(self, directory):
+        """
+        Check if an entry depending on given directory can be cached.
+
+        With watching enabled, directory is watched from there, so it must be
+        called before reading the entry from filesystem, else a change happening
+        in between would never be reported.
+        """
+        if self._watcher is None:
+            return True
+
+        return self._watcher.watch(directory)
+
+    def stat(self, path):
+        """
+        Get status of a path.
+
+        Arguments:
+            path (string or Path): A filesystem path.
+
+        Returns:
+            os.stat_result: The path status or None if path does not exist or can
+            not be reached.
+        """
+        key = self._key(path)
+
+        with self._lock:
+            self._sync()
+            if key in self._stats:
+                self.hits += 1
+                return self._stats[key]
+            self.misses += 1
+            cacheable = self._cacheable(os.path.dirname(key))
+            generation = self._generation
+
+        try:
+            result = os.stat(key)
+        except OSError:
+            # Like a symbolic link loop, a denied access or a too long name
+            result = None
+
+        with self._lock:
+            self._sync()
+            if cacheable and generation == self._generation:
+                self._stats[key] = result
+
+        return result
+
+    def listdir(self, path):
+        """
+        List a directory content with ``os.scandir``.
+
+        Arguments:
+            path (string or Path): A directory path.
+
+        Returns:
+            tuple: ``CachedEntry`` items for every directory entries. Entries are
+            in the order returned by the filesystem.
+        """
+        key = self._key(path)
+
+        with self._lock:
+            self._sync()
+            if key in self._listings:
+                self.hits += 1
+                return self._listings[key]
+            self.misses += 1
+            cacheable = self._cacheable(key)
+            generation = self._generation
+
+        with os.scandir(key) as it:
+            result = tuple(
+                CachedEntry(
+                    entry.name,
+                    entry.path,
+                    entry.is_dir(),
+                    entry.is_file(),
+                    entry.is_symlink(),
+                )
+                for entry in it
+            )
+
+        with self._lock:
+            self._sync()
+            if cacheable and generation == self._generation:
+                self._listings[key] = result
+
+        return result
+
+    def invalidate(self, path=None, recursive=False):
+        """
+        Remove entries from cache.
+
+        Keyword Arguments:
+            path (string or Path): Path to invalidate, its parent directory listing
+                is invalidated too. If not given, the whole cache is invalidated.
+            recursive (boolean): If True, every entries under the given path are
+                invalidated too.
+        """
+        with self._lock:
+            self._generation += 1
+            if path is None:
+                self._stats.clear()
+                self._listings.clear()
+                return
+
+            key = self._key(path)
+
+            for cache in (self._stats, self._listings):
+                cache.pop(key, None)
+
+                if recursive:
+                    prefix = key.rstrip(os.sep) + os.sep
+                    for name in [name for name in cache if name.startswith(prefix)]:
+                        del cache[name]
+
+            self._listings.pop(os.path.dirname(key), None)
+
+    def counters(self):
+        """
+        Returns:
+            dict: Cache counters ``hits`` and ``misses``.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """
+        Clear cache and stop watching if enabled.
+        """
+        self.invalidate()
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
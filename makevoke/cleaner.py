@@ -0,0 +1,224 @@
+"""
+Cleaner
+=======
+
+Remove files and directories matching glob patterns.
+
+Tree is walked once with ``makevoke.finder.iter_entries()``, matching directories
+are not entered by the walk and every match is removed from a thread pool as soon as
+it is found.
+
+"""
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from .finder import DEFAULT_EXCLUDES, iter_entries
+from .utils import format_size
+
+
+# Common patterns for Python builds and caches
+PYTHON_CLEAN_PATTERNS = (
+    "__pycache__",
+    "*.pyc",
+    "*.pyo",
+    ".pytest_cache",
+    "*.egg-info",
+)
+
+
+class CleanReport:
+    """
+    Report of a cleaning.
+
+    Attributes:
+        paths (list): Relative paths of removed (or to remove for a dry run) matches,
+            with ``/`` as separator.
+        entries (integer): Number of removed filesystem entries, including every
+            entry inside removed directories.
+        size (integer): Size in bytes of removed files.
+        errors (list): List of tuples ``(path, error)`` for entries which could not
+            be removed.
+        dry_run (boolean): True if nothing has been removed.
+    """
+    def __init__(self, dry_run=False):
+        self.paths = []
+        self.entries = 0
+        self.size = 0
+        self.errors = []
+        self.dry_run = dry_run
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            boolean: True if there is no error.
+        """
+        return not self.errors
+
+    def update(self, result):
+        """
+        Add result from a single match removal.
+
+        Arguments:
+            result (tuple): A tuple ``(entries, size, errors)``.
+        """
+        entries, size, errors = result
+        self.entries += entries
+        self.size += size
+        self.errors.extend(errors)
+
+
+def remove_entry(path, dry_run=False):
+    """
+    Remove a file, a symbolic link or a directory with all its content.
+
+    Symbolic links are never followed.
+
+    Arguments:
+        path (string): Path to remove.
+
+    Keyword Arguments:
+        dry_run (boolean): If True, only count what would be removed.
+
+    Returns:
+        tuple: A tuple ``(entries, size, errors)`` with number of removed entries,
+        total size of removed files and a list of ``(path, error)`` tuples.
+    """
+    entries = 0
+    size = 0
+    errors = []
+
+    try:
+        status = os.lstat(path)
+    except OSError as error:
+        return 0, 0, [(path, error)]
+
+    if not stat.S_ISDIR(status.st_mode):
+        try:
+            if not dry_run:
+                os.unlink(path)
+        except OSError as error:
+            return 0, 0, [(path, error)]
+
+        return 1, status.st_size, []
+
+    try:
+        with os.scandir(path) as iterator:
+            children = [entry.path for entry in iterator]
+    except OSError as error:
+        return 0, 0, [(path, error)]
+
+    for child in children:
+        child_entries, child_size, child_errors = remove_entry(child, dry_run=dry_run)
+        entries += child_entries
+        size += child_size
+        errors.extend(child_errors)
+
+    if not errors:
+        try:
+            if not dry_run:
+                os.rmdir(path)
+            entries += 1
+        except OSError as error:
+            errors.append((path, error))
+
+    return entries, size, errors
+
+
+def clean(root, patterns=PYTHON_CLEAN_PATTERNS, exclude=DEFAULT_EXCLUDES,
+          dry_run=False, workers=None):
+    """
+    Remove every entries matching patterns from a directory tree.
+
+    Arguments:
+        root (string or Path): Directory to clean.
+
+    Keyword Arguments:
+        patterns (string or iterable): Glob patterns of entries to remove, see
+            ``makevoke.finder``. Default to ``PYTHON_CLEAN_PATTERNS``.
+        exclude (iterable): Glob patterns for directories to never enter. Default to
+            ``DEFAULT_EXCLUDES``.
+        dry_run (boolean): If True, nothing is removed and report describes what
+            would be removed.
+        workers (integer): Maximum number of threads for removals. Default to the
+            ``ThreadPoolExecutor`` default.
+
+    Returns:
+        CleanReport: Cleaning report.
+    """
+    report = CleanReport(dry_run=dry_run)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for entry, relative_path in iter_entries(
+            root, patterns, exclude=exclude, descend_matched=False
+        ):
+            report.paths.append(relative_path)
+            futures.append(executor.submit(remove_entry, entry.path, dry_run))
+
+        for future in futures:
+            report.update(future.result())
+
+    return report
+
+
+class CleanerAbstract:
+    """
+    This class implements a method to clean directory trees.
+
+    Depends on ``PrintOutAbstract`` alike since it prints its report with printout
+    methods.
+    """
+    CLEAN_PATTERNS = PYTHON_CLEAN_PATTERNS
+    CLEAN_EXCLUDE = DEFAULT_EXCLUDES
+
+    @classmethod
+    def clean(cls, root=".", patterns=None, exclude=None, dry_run=False,
+              workers=None, verbose=False):
+        """
+        Remove every entries matching patterns from a directory tree and print a
+        report.
+
+        Keyword Arguments:
+            root (string or Path): Directory to clean. Default to current directory.
+            patterns (string or iterable): Glob patterns of entries to remove.
+                Default to ``CLEAN_PATTERNS`` attribute.
+            exclude (iterable): Glob patterns for directories to never enter.
+                Default to ``CLEAN_EXCLUDE`` attribute.
+            dry_run (boolean): If True, only list what would be removed.
+            workers (integer): Maximum number of threads for removals.
+            verbose (boolean): If True, list matches sorted on their path. Dry run
+                always lists them.
+
+        Returns:
+            CleanReport: Cleaning report.
+        """
+        report = clean(
+            root,
+            patterns=cls.CLEAN_PATTERNS if patterns is None else patterns,
+            exclude=cls.CLEAN_EXCLUDE if exclude is None else exclude,
+            dry_run=dry_run,
+            workers=workers,
+        )
+
+        if verbose or dry_run:
+            for path in sorted(report.paths):
+                cls.dotitem(path)
+
+        for path, error in report.errors:
+            cls.error("Unable to remove '{}': {}".format(path, error))
+
+        cls.info(
+            "{action} {matches} match(es), {entries} entries for {size}".format(
+                action="Would remove" if dry_run else "Removed",
+                matches=len(report.paths),
+                entries=report.entries,
+                size=format_size(report.size),
+            )
+        )
+
+        return report
@@ -0,0 +1,6 @@
+"""
+Makevoke commandline frontend.
+
+This package must stay fast to import, heavy modules like ``invoke``, ``colorama`` or
+the project tasks are only imported when a command needs them.
+"""
@@ -0,0 +1,6 @@
+import sys
+
+from .entrypoint import cli_frontend
+
+
+sys.exit(cli_frontend())
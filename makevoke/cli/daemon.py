@@ -0,0 +1,533 @@
+"""
+Resident daemon.
+
+The daemon keeps a project tasks module (and so ``invoke``, ``colorama`` and the
+Makevoke classes) imported in a background process listening on a Unix socket. Each
+task run request is served from a forked child process which takes over the client
+standard file descriptors, current directory and environment, so output is written
+directly to the client terminal without any relay.
+
+The daemon reloads project modules when a source file has changed and it shuts down
+once idle for a while. It is only available on POSIX systems.
+
+Daemon is opt-in from the commandline with ``--daemon`` or with environment variable
+``MAKEVOKE_DAEMON=1``.
+"""
+import hashlib
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+from ..protocol import (
+    HEADER, STANDARD_FDS, recv_exactly, recv_message, send_message,
+)
+
+
+DAEMON_ENV_VAR = "MAKEVOKE_DAEMON"
+
+DEFAULT_IDLE_TIMEOUT = 900
+
+# Number of seconds a client has to send its request, the daemon serves requests
+# one after the other
+REQUEST_TIMEOUT = 5.0
+
+
+def is_available():
+    """
+    Returns:
+        boolean: True if daemon mode is supported on this system.
+    """
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def is_enabled(environ=None):
+    """
+    Check if daemon mode is enabled from environment.
+
+    Keyword Arguments:
+        environ (dict): Environment to check. Default to ``os.environ``.
+
+    Returns:
+        boolean: True if daemon mode is enabled.
+    """
+    environ = os.environ if environ is None else environ
+
+    return environ.get(DAEMON_ENV_VAR, "").lower() in ("1", "true", "yes", "on")
+
+
+def get_socket_path(tasks_path):
+    """
+    Get the daemon socket path for a tasks module.
+
+    Arguments:
+        tasks_path (string): Tasks module file path.
+
+    Returns:
+        string: Socket path in the user runtime directory if any, else in the
+        temporary directory.
+    """
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    key = hashlib.sha1(os.path.abspath(tasks_path).encode("utf-8")).hexdigest()[:16]
+
+    return os.path.join(directory, "makevoke-{}-{}.sock".format(os.getuid(), key))
+
+
+class DaemonServer:
+    """
+    Daemon server for a tasks module.
+
+    Arguments:
+        tasks_path (string): Tasks module file path.
+
+    Keyword Arguments:
+        socket_path (string): Socket path to listen on. Default to path from
+            ``get_socket_path()``.
+        idle_timeout (float): Number of seconds without any request before the
+            daemon shuts down. Default to ``DEFAULT_IDLE_TIMEOUT``.
+        poll_interval (float): Maximum number of seconds to wait for a request
+            before checking idle timeout and finished children.
+    """
+    def __init__(self, tasks_path, socket_path=None, idle_timeout=None,
+                 poll_interval=1.0):
+        self.tasks_path = os.path.abspath(tasks_path)
+        self.socket_path = socket_path or get_socket_path(self.tasks_path)
+        self.idle_timeout = (
+            DEFAULT_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        )
+        self.poll_interval = poll_interval
+
+        self.module = None
+        self.sources = {}
+        self.children = set()
+        self.reloads = 0
+        self._running = False
+
+    def load(self):
+        """
+        Import tasks module and record fingerprints of its source files.
+
+        Previously imported project modules are removed from ``sys.modules`` so they
+        are imported again from their current source. A loading error is not raised
+        since it will be reported to the client from the child process.
+        """
+        from .entrypoint import load_tasks_module
+        from .index import TaskIndex
+
+        index = TaskIndex(self.tasks_path)
+
+        if self.sources:
+            self.reloads += 1
+            sources = set(self.sources)
+            for name, module in list(sys.modules.items()):
+                filename = getattr(module, "__file__", None)
+                if filename and os.path.abspath(filename) in sources:
+                    del sys.modules[name]
+
+        self.module = None
+        try:
+            self.module = load_tasks_module(self.tasks_path)
+        except Exception:
+            pass
+
+        self.sources = {}
+        for path in index.get_sources():
+            self.sources[path] = self.fingerprint(path)
+
+    @staticmethod
+    def fingerprint(path):
+        """
+        Get a cheap fingerprint of a file.
+
+        Arguments:
+            path (string): File path.
+
+        Returns:
+            tuple: Modification time and size or None if file does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def has_changed(self):
+        """
+        Returns:
+            boolean: True if any source file has changed since loading.
+        """
+        return any(
+            self.fingerprint(path) != fingerprint
+            for path, fingerprint in self.sources.items()
+        )
+
+    def reap(self):
+        """
+        Collect finished child processes.
+        """
+        for pid in list(self.children):
+            try:
+                finished, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished = pid
+
+            if finished:
+                self.children.discard(pid)
+
+    def check_peer(self, conn):
+        """
+        Check the client runs with the same user, when the system allows it.
+
+        Arguments:
+            conn (socket.socket): Client connection.
+
+        Returns:
+            boolean: False if client is known to run with another user.
+        """
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+
+        credentials = conn.getsockopt(
+            socket.SOL_SOCKET,
+            socket.SO_PEERCRED,
+            struct.calcsize("3i"),
+        )
+        pid, uid, gid = struct.unpack("3i", credentials)
+
+        return uid == os.getuid()
+
+    def bind(self):
+        """
+        Create the listening socket, only readable by current user.
+
+        A lock file is held while binding so daemons started at once do not remove
+        the socket of each other, and a socket path where a daemon is still
+        listening is left as is.
+
+        Returns:
+            socket.socket: Listening socket or None if another daemon is already
+            listening on socket path.
+        """
+        import fcntl
+
+        lock_fd = os.open(self.socket_path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+
+            running = connect(self.socket_path)
+            if running is not None:
+                running.close()
+                return None
+
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            previous_umask = os.umask(0o077)
+            try:
+                server.bind(self.socket_path)
+            finally:
+                os.umask(previous_umask)
+            server.listen(16)
+            server.settimeout(self.poll_interval)
+        finally:
+            # Closing releases the lock
+            os.close(lock_fd)
+
+        return server
+
+    def serve(self):
+        """
+        Load tasks module and serve requests until stopped or idle timeout.
+
+        Nothing is served if another daemon is already listening on socket path.
+        """
+        server = self.bind()
+        if server is None:
+            return
+
+        self.load()
+        self._running = True
+        last_activity = time.monotonic()
+
+        try:
+            while self._running:
+                self.reap()
+
+                try:
+                    conn, address = server.accept()
+                except socket.timeout:
+                    if (
+                        not self.children and
+                        time.monotonic() - last_activity > self.idle_timeout
+                    ):
+                        break
+                    continue
+
+                last_activity = time.monotonic()
+                # A stalled client must not block the daemon forever
+                conn.settimeout(REQUEST_TIMEOUT)
+                with conn:
+                    self.dispatch(server, conn)
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def dispatch(self, server, conn):
+        """
+        Read a request and perform its action.
+
+        Arguments:
+            server (socket.socket): Listening socket, closed in child processes.
+            conn (socket.socket): Client connection.
+        """
+        fds = []
+        try:
+            if not self.check_peer(conn):
+                return
+
+            payload, fds = recv_message(conn)
+            conn.settimeout(None)
+            action = payload.get("action")
+
+            if action == "ping":
+                send_message(conn, {
+                    "pid": os.getpid(),
+                    "tasks_path": self.tasks_path,
+                    "reloads": self.reloads,
+                })
+            elif action == "stop":
+                self._running = False
+                send_message(conn, {"stopped": True})
+            elif action == "run" and len(fds) == len(STANDARD_FDS):
+                if self.has_changed():
+                    self.load()
+
+                pid = os.fork()
+                if pid == 0:
+                    server.close()
+                    code = 1
+                    try:
+                        code = self.run_child(conn, payload, fds)
+                    finally:
+                        os._exit(code)
+
+                self.children.add(pid)
+        except (OSError, ValueError):
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def run_child(self, conn, payload, fds):
+        """
+        Run a request in the forked child process, then send exit code to client.
+
+        Arguments:
+            conn (socket.socket): Client connection.
+            payload (dict): Request with ``argv``, ``env`` and ``cwd`` items.
+            fds (list): Client standard file descriptors.
+
+        Returns:
+            integer: Exit code.
+        """
+        for target, fd in zip(STANDARD_FDS, fds):
+            os.dup2(fd, target)
+
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False, buffering=1 if os.isatty(1) else -1)
+        sys.stderr = open(2, "w", closefd=False, buffering=1)
+
+        os.environ.clear()
+        os.environ.update(payload["env"])
+        os.chdir(payload["cwd"])
+        sys.argv = ["makevoke"] + payload["argv"]
+
+        code = 0
+        try:
+            from .entrypoint import load_tasks_module, run_task
+
+            module = self.module or load_tasks_module(self.tasks_path)
+            code = run_task(module, payload["argv"])
+        except SystemExit as exc:
+            if exc.code is None:
+                code = 0
+            elif isinstance(exc.code, int):
+                code = exc.code
+            else:
+                sys.stderr.write(str(exc.code) + "\n")
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except OSError:
+                pass
+
+        try:
+            conn.sendall(HEADER.pack(code))
+        except OSError:
+            pass
+
+        return code
+
+
+def connect(socket_path):
+    """
+    Connect to a daemon.
+
+    Arguments:
+        socket_path (string): Daemon socket path.
+
+    Returns:
+        socket.socket: Connected socket or None if there is no running daemon.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
+
+
+def request(socket_path, action):
+    """
+    Send a simple request to a daemon.
+
+    Arguments:
+        socket_path (string): Daemon socket path.
+        action (string): Either ``ping`` or ``stop``.
+
+    Returns:
+        dict: Daemon response or None if there is no running daemon.
+    """
+    sock = connect(socket_path)
+    if sock is None:
+        return None
+
+    with sock:
+        try:
+            send_message(sock, {"action": action})
+            payload, fds = recv_message(sock, maxfds=0)
+        except (OSError, ValueError):
+            return None
+
+    return payload
+
+
+def run_with_daemon(tasks_path, argv, socket_path=None):
+    """
+    Run tasks through a running daemon.
+
+    Standard file descriptors, current directory and environment are forwarded so
+    the daemon output goes directly to the current terminal.
+
+    Arguments:
+        tasks_path (string): Tasks module file path.
+        argv (list): Task names with their arguments.
+
+    Keyword Arguments:
+        socket_path (string): Daemon socket path. Default to path from
+            ``get_socket_path()``.
+
+    Returns:
+        integer: Exit code or None if there is no running daemon to connect to.
+    """
+    sock = connect(socket_path or get_socket_path(tasks_path))
+    if sock is None:
+        return None
+
+    with sock:
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+
+        try:
+            send_message(
+                sock,
+                {
+                    "action": "run",
+                    "argv": list(argv),
+                    "env": dict(os.environ),
+                    "cwd": os.getcwd(),
+                },
+                fds=STANDARD_FDS,
+            )
+        except OSError:
+            # Like when a standard file descriptor is closed
+            return None
+
+        try:
+            data = recv_exactly(sock, HEADER.size)
+        except (OSError, ConnectionError):
+            sys.stderr.write("Makevoke daemon connection has been lost\n")
+            return 1
+
+    return HEADER.unpack(data)[0]
+
+
+def start_daemon(tasks_path, socket_path=None, idle_timeout=None):
+    """
+    Start a daemon in background.
+
+    Arguments:
+        tasks_path (string): Tasks module file path.
+
+    Keyword Arguments:
+        socket_path (string): Socket path to listen on.
+        idle_timeout (float): Number of seconds before an idle daemon shuts down.
+
+    Returns:
+        subprocess.Popen: The daemon process.
+    """
+    command = [sys.executable, "-m", "makevoke.cli.daemon", tasks_path]
+    if socket_path:
+        command += ["--socket", socket_path]
+    if idle_timeout is not None:
+        command += ["--idle-timeout", str(idle_timeout)]
+
+    return subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        close_fds=True,
+        start_new_session=True,
+    )
+
+
+def main(argv=None):
+    """
+    Daemon process entrypoint.
+
+    Keyword Arguments:
+        argv (list): Commandline arguments. Default to ``sys.argv`` without the
+            program name.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="makevoke-daemon")
+    parser.add_argument("tasks_path")
+    parser.add_argument("--socket", default=None)
+    parser.add_argument("--idle-timeout", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    DaemonServer(
+        args.tasks_path,
+        socket_path=args.socket,
+        idle_timeout=args.idle_timeout,
+    ).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+Commandline entrypoint.
+
+It lists and runs tasks from a project tasks module (a ``tasks.py`` file like for
+Invoke) where tasks use Makevoke classes.
+
+Only lightweight modules are imported at module level, everything else is imported
+from the functions which need it, so ``makevoke --help`` never imports ``invoke``,
+``colorama`` or the project tasks. Task listing and shell completion are answered from
+a task index (see ``makevoke.cli.index``) which is rebuilt only when project sources
+have changed.
+"""
+import os
+import sys
+
+
+TASKS_FILENAME = "tasks.py"
+
+COMPLETION_SCRIPTS = {
+    "bash": (
+        "_makevoke_complete() {\n"
+        "    local candidates\n"
+        "    candidates=$(makevoke --complete "
+        "\"${COMP_WORDS[@]:1:COMP_CWORD}\" 2>/dev/null)\n"
+        "    COMPREPLY=( $(compgen -W \"${candidates}\" -- "
+        "\"${COMP_WORDS[COMP_CWORD]}\") )\n"
+        "}\n"
+        "complete -F _makevoke_complete makevoke\n"
+    ),
+    "zsh": (
+        "_makevoke_complete() {\n"
+        "    local -a candidates\n"
+        "    candidates=(${(f)\"$(makevoke --complete "
+        "\"${(@)words[2,$CURRENT]}\" 2>/dev/null)\"})\n"
+        "    compadd -- $candidates\n"
+        "}\n"
+        "compdef _makevoke_complete makevoke\n"
+    ),
+}
+
+MAKEVOKE_MODULES = (
+    ("makevoke.base", "MakevokeBase"),
+    ("makevoke.printout", "PrintOutAbstract"),
+    ("makevoke.validators", "ArgValidatorAbstract"),
+)
+
+
+def build_parser():
+    """
+    Build the commandline argument parser.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="makevoke",
+        description="List and run the Makevoke tasks of a project.",
+    )
+    parser.add_argument(
+        "--version",
+        action="store_true",
+        help="Print Makevoke version and exit.",
+    )
+    parser.add_argument(
+        "-f", "--file",
+        dest="tasks_file",
+        default=None,
+        help=(
+            "Path to the tasks module. Default to the first '{}' file found from "
+            "current directory and its parents."
+        ).format(TASKS_FILENAME),
+    )
+    parser.add_argument(
+        "-l", "--list",
+        action="store_true",
+        help="List available tasks and Makevoke classes.",
+    )
+    parser.add_argument(
+        "--complete",
+        action="store_true",
+        help=(
+            "Print shell completion candidates for the given words, last word is the "
+            "one to complete."
+        ),
+    )
+    parser.add_argument(
+        "--print-completion-script",
+        choices=sorted(COMPLETION_SCRIPTS),
+        default=None,
+        help="Print the completion script for a shell.",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help=(
+            "Run tasks through a resident daemon which is started if not running "
+            "yet. It can also be enabled with environment variable "
+            "MAKEVOKE_DAEMON=1."
+        ),
+    )
+    parser.add_argument(
+        "--daemon-status",
+        action="store_true",
+        help="Print the resident daemon status.",
+    )
+    parser.add_argument(
+        "--daemon-stop",
+        action="store_true",
+        help="Stop the resident daemon.",
+    )
+    parser.add_argument(
+        "task",
+        nargs=argparse.REMAINDER,
+        help="Task name to run followed by its arguments.",
+    )
+
+    return parser
+
+
+def find_tasks_file(filename=None, start=None):
+    """
+    Find the tasks module file.
+
+    Keyword Arguments:
+        filename (string): Explicit path to the tasks module file. If given, it is
+            returned if it exists.
+        start (string): Directory to start searching for ``TASKS_FILENAME`` when
+            ``filename`` is not given, then each parent directory is searched.
+            Default to current directory.
+
+    Returns:
+        string: Absolute path to the tasks module file or None if not found.
+    """
+    if filename:
+        return os.path.abspath(filename) if os.path.isfile(filename) else None
+
+    directory = os.path.abspath(start or os.getcwd())
+    while True:
+        candidate = os.path.join(directory, TASKS_FILENAME)
+        if os.path.isfile(candidate):
+            return candidate
+
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def load_tasks_module(path):
+    """
+    Import a tasks module from its file path.
+
+    The module directory is added to ``sys.path`` so the module can import its
+    neighbour modules.
+
+    Arguments:
+        path (string): Tasks module file path.
+
+    Returns:
+        module: The imported module.
+    """
+    import importlib.util
+
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def get_collection(module):
+    """
+    Get the Invoke task collection from a tasks module.
+
+    Arguments:
+        module (module): Tasks module.
+
+    Returns:
+        invoke.Collection: The task collection.
+    """
+    from invoke import Collection
+
+    return Collection.from_module(module)
+
+
+def discover_tasks(module):
+    """
+    Discover tasks from a tasks module.
+
+    Arguments:
+        module (module): Tasks module.
+
+    Returns:
+        list: Tuple ``(name, help)`` for each task, sorted on names. Help is the
+        first line of task docstring.
+    """
+    import inspect
+
+    collection = get_collection(module)
+
+    tasks = []
+    for name in sorted(collection.task_names):
+        doc = inspect.getdoc(collection[name].body) or ""
+        tasks.append((name, doc.strip().split("\n")[0]))
+
+    return tasks
+
+
+def discover_classes(module):
+    """
+    Discover Makevoke classes from a tasks module namespace.
+
+    A Makevoke abstract is only checked if it has already been imported, since if it
+    is not, the tasks module can not use it.
+
+    Arguments:
+        module (module): Tasks module.
+
+    Returns:
+        list: Tuple ``(name, class)`` for each class inheriting from a Makevoke
+        abstract, sorted on names. Makevoke abstracts themselves are ignored.
+    """
+    abstracts = tuple(
+        getattr(sys.modules[path], name)
+        for path, name in MAKEVOKE_MODULES
+        if path in sys.modules
+    )
+    if not abstracts:
+        return []
+
+    return sorted(
+        (
+            (name, value)
+            for name, value in vars(module).items()
+            if (
+                isinstance(value, type) and
+                issubclass(value, abstracts) and
+                value not in abstracts
+            )
+        ),
+        key=lambda item: item[0],
+    )
+
+
+def list_tasks(data, stream=None):
+    """
+    Print available tasks and Makevoke classes from task index data.
+
+    Arguments:
+        data (dict): Task index data.
+
+    Keyword Arguments:
+        stream (object): File object to write on. Default to ``sys.stdout``.
+    """
+    stream = stream or sys.stdout
+    tasks = data["tasks"]
+    classes = data["classes"]
+
+    lines = ["Available tasks:", ""]
+    width = max([len(task["name"]) for task in tasks] or [0])
+    for task in tasks:
+        lines.append("  " + (task["name"].ljust(width) + "  " + task["help"]).rstrip())
+    if not tasks:
+        lines.append("  No task found")
+
+    if classes:
+        lines += ["", "Makevoke classes:", ""]
+        for item in classes:
+            if item["context"]:
+                lines.append("  {} ({})".format(
+                    item["name"],
+                    ", ".join(item["context"]),
+                ))
+            else:
+                lines.append("  {}".format(item["name"]))
+
+    stream.write("\n".join(lines) + "\n")
+
+
+def complete(data, words):
+    """
+    Compute shell completion candidates from task index data.
+
+    Arguments:
+        data (dict): Task index data.
+        words (list): Commandline words after the program name, the last one is the
+            word to complete (it may be empty).
+
+    Returns:
+        list: Candidates starting with the word to complete.
+    """
+    current = words[-1] if words else ""
+
+    names = {}
+    for task in data["tasks"]:
+        names[task["name"]] = task
+        for alias in task["aliases"]:
+            names[alias] = task
+
+    # Arguments belong to the last task before the word to complete
+    task = None
+    for word in words[:-1]:
+        if word in names:
+            task = names[word]
+
+    if current.startswith("-"):
+        if task is None:
+            return []
+
+        candidates = []
+        for argument in task["arguments"]:
+            for name in argument["names"]:
+                candidates.append(("-" if len(name) == 1 else "--") + name)
+    else:
+        candidates = list(names)
+
+    return sorted(item for item in candidates if item.startswith(current))
+
+
+def run_task(module, argv):
+    """
+    Run tasks from a tasks module with Invoke.
+
+    Arguments:
+        module (module): Tasks module.
+        argv (list): Invoke arguments, like task names with their arguments.
+
+    Returns:
+        integer: Exit code, Invoke may also directly exit on error.
+    """
+    from invoke import Program
+
+    program = Program(
+        namespace=get_collection(module),
+        name="Makevoke",
+        binary="makevoke",
+    )
+    program.run(["makevoke"] + list(argv))
+
+    return 0
+
+
+def cli_frontend(argv=None):
+    """
+    Commandline frontend.
+
+    Keyword Arguments:
+        argv (list): Commandline arguments. Default to ``sys.argv`` without the
+            program name.
+
+    Returns:
+        integer: Exit code.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.version:
+        import makevoke
+
+        print("makevoke {}".format(makevoke.__version__))
+        return 0
+
+    if args.print_completion_script:
+        sys.stdout.write(COMPLETION_SCRIPTS[args.print_completion_script])
+        return 0
+
+    from .index import TaskIndex
+
+    path = find_tasks_file(args.tasks_file)
+    if path is None:
+        if args.complete:
+            return 0
+        parser.error("Unable to find tasks module '{}'".format(
+            args.tasks_file or TASKS_FILENAME
+        ))
+
+    if args.daemon_status or args.daemon_stop:
+        from . import daemon
+
+        response = daemon.request(
+            daemon.get_socket_path(path),
+            "stop" if args.daemon_stop else "ping",
+        )
+        if response is None:
+            print("No running daemon")
+        elif args.daemon_stop:
+            print("Daemon has been stopped")
+        else:
+            print("Daemon is running with PID {}".format(response["pid"]))
+        return 0
+
+    index = TaskIndex(path)
+
+    if args.complete:
+        data = index.get(lambda: load_tasks_module(path))
+        candidates = complete(data, args.task)
+        if candidates:
+            sys.stdout.write("\n".join(candidates) + "\n")
+        return 0
+
+    if args.list or not args.task:
+        list_tasks(index.get(lambda: load_tasks_module(path)))
+        return 0
+
+    if args.daemon or os.environ.get("MAKEVOKE_DAEMON"):
+        from . import daemon
+
+        if daemon.is_available() and (args.daemon or daemon.is_enabled()):
+            code = daemon.run_with_daemon(path, args.task)
+            if code is not None:
+                return code
+
+            # Daemon will be ready for next runs, this one is run locally
+            daemon.start_daemon(path)
+
+    module = load_tasks_module(path)
+
+    # Module is already imported so keeping index fresh is cheap
+    if index.load() is None:
+        index.save(index.build(module))
+
+    return run_task(module, args.task)
@@ -0,0 +1,276 @@
+"""
+Task index.
+
+Discovering tasks requires to import the project tasks module and everything it
+imports. The index stores discovered tasks, their arguments and the Makevoke classes
+context variables in a cache file, so listing and shell completion can be answered
+without importing any project code.
+
+Index is keyed on the source files which have been imported from the project: a
+source is unchanged if its modification time and size did not change, or else if its
+content hash did not change. Index is rebuilt only when a source file has changed.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from ..utils import file_digest, get_cache_dir
+
+
+def describe_source(path):
+    """
+    Build the fingerprint of a source file.
+
+    Arguments:
+        path (string): File path.
+
+    Returns:
+        dict: Source path, modification time, size and content digest.
+    """
+    stat = os.stat(path)
+
+    return {
+        "path": path,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": file_digest(path),
+    }
+
+
+class TaskIndex:
+    """
+    Cache file of discovered tasks for a tasks module.
+
+    Arguments:
+        tasks_path (string): Tasks module file path.
+
+    Keyword Arguments:
+        cache_dir (string): Directory where to store index file. Default to the
+            directory from ``get_cache_dir()``.
+    """
+    VERSION = 1
+
+    def __init__(self, tasks_path, cache_dir=None):
+        self.tasks_path = os.path.abspath(tasks_path)
+        self.cache_dir = cache_dir or get_cache_dir()
+
+        key = hashlib.sha1(self.tasks_path.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(self.cache_dir, "index-{}.json".format(key))
+
+    def read(self):
+        """
+        Read index file without any freshness check.
+
+        Returns:
+            dict: Index data or None if there is no valid index file.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        if (
+            not isinstance(data, dict) or
+            data.get("version") != self.VERSION or
+            data.get("tasks_path") != self.tasks_path
+        ):
+            return None
+
+        return data
+
+    def is_fresh(self, data):
+        """
+        Check every source files of an index are unchanged.
+
+        Sources whose modification time changed without any content change are
+        updated in place in given data.
+
+        Arguments:
+            data (dict): Index data.
+
+        Returns:
+            boolean: True if no source file has changed.
+        """
+        touched = False
+
+        for source in data.get("sources", []):
+            try:
+                stat = os.stat(source["path"])
+            except OSError:
+                return False
+
+            if (
+                stat.st_mtime_ns == source["mtime_ns"] and
+                stat.st_size == source["size"]
+            ):
+                continue
+
+            if stat.st_size != source["size"]:
+                return False
+
+            if file_digest(source["path"]) != source["sha256"]:
+                return False
+
+            source["mtime_ns"] = stat.st_mtime_ns
+            touched = True
+
+        if touched:
+            self.save(data)
+
+        return True
+
+    def load(self):
+        """
+        Load index if it exists and it is fresh.
+
+        Returns:
+            dict: Index data or None if there is no fresh index.
+        """
+        data = self.read()
+
+        if data is None or not self.is_fresh(data):
+            return None
+
+        return data
+
+    def get_sources(self):
+        """
+        List source files which have been imported from the tasks module directory.
+
+        Modules from the Python installation (like from a virtual environment inside
+        project directory) are ignored.
+
+        Returns:
+            list: Source file paths, tasks module first.
+        """
+        root = os.path.dirname(self.tasks_path) + os.sep
+        ignored = tuple(
+            os.path.abspath(path) + os.sep
+            for path in {sys.prefix, sys.exec_prefix, sys.base_prefix}
+        )
+
+        sources = [self.tasks_path]
+        for module in list(sys.modules.values()):
+            filename = getattr(module, "__file__", None)
+            if not filename or not filename.endswith(".py"):
+                continue
+
+            filename = os.path.abspath(filename)
+            if (
+                filename.startswith(root) and
+                not filename.startswith(ignored) and
+                "site-packages" not in filename and
+                filename not in sources
+            ):
+                sources.append(filename)
+
+        return sources
+
+    def build(self, module):
+        """
+        Build index data from an imported tasks module.
+
+        Arguments:
+            module (module): Tasks module.
+
+        Returns:
+            dict: Index data.
+        """
+        import inspect
+
+        from .entrypoint import discover_classes, get_collection
+
+        collection = get_collection(module)
+
+        tasks = []
+        for name in sorted(collection.task_names):
+            task = collection[name]
+            doc = inspect.getdoc(task.body) or ""
+            arguments = []
+            for argument in task.get_arguments():
+                arguments.append({
+                    "names": list(argument.names),
+                    "kind": getattr(argument.kind, "__name__", str(argument.kind)),
+                    "help": argument.help or "",
+                })
+
+            tasks.append({
+                "name": name,
+                "help": doc.strip().split("\n")[0],
+                "aliases": list(collection.task_names[name]),
+                "arguments": arguments,
+            })
+
+        classes = [
+            {
+                "name": name,
+                "context": list(getattr(klass, "ENABLED_CONTEXT_VARS", None) or []),
+            }
+            for name, klass in discover_classes(module)
+        ]
+
+        return {
+            "version": self.VERSION,
+            "tasks_path": self.tasks_path,
+            "sources": [describe_source(path) for path in self.get_sources()],
+            "tasks": tasks,
+            "classes": classes,
+        }
+
+    def write(self, data):
+        """
+        Write index data to the index file atomically.
+
+        Arguments:
+            data (dict): Index data.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(data, fp)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, loader):
+        """
+        Get index data, rebuilding it if needed.
+
+        Arguments:
+            loader (callable): Function without argument which imports and returns
+                the tasks module, it is called only when index has to be rebuilt.
+
+        Returns:
+            dict: Index data.
+        """
+        data = self.load()
+
+        if data is None:
+            data = self.build(loader())
+            self.save(data)
+
+        return data
+
+    def save(self, data):
+        """
+        Write index data like ``write()`` but ignoring any filesystem error since an
+        index is only a cache.
+
+        Arguments:
+            data (dict): Index data.
+
+        Returns:
+            boolean: True if index has been written.
+        """
+        try:
+            self.write(data)
+        except OSError:
+            return False
+
+        return True
@@ -0,0 +1,362 @@
+"""
+Digest
+======
+
+Content digests of file sets with a persistent index.
+
+Digests are computed from a thread pool (hash functions release the GIL on large
+buffers) and stored in an index file keyed on file device, inode, size and
+modification time. A digest is only computed again when a file has changed.
+
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .finder import DEFAULT_EXCLUDES, iter_entries, split_glob, translate_glob
+from .utils import get_cache_dir
+
+
+# Files from this size are hashed through memory mapping
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# Buffer size for files read in chunks
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def hash_file(path, algorithm="sha256"):
+    """
+    Compute the hexadecimal digest of a file content.
+
+    Large files are mapped in memory, other ones are read with a large buffer.
+
+    Arguments:
+        path (string or Path): File path.
+
+    Keyword Arguments:
+        algorithm (string): Any algorithm name from ``hashlib``. Default to
+            ``sha256``.
+
+    Returns:
+        string: Hexadecimal digest.
+    """
+    digest = hashlib.new(algorithm)
+
+    with open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            buffer = bytearray(min(max(size, 1), READ_BUFFER_SIZE))
+            view = memoryview(buffer)
+            while True:
+                read = fp.readinto(buffer)
+                if not read:
+                    break
+                digest.update(view[:read])
+
+    return digest.hexdigest()
+
+
+class DigestIndex:
+    """
+    Persistent index of file digests.
+
+    Index is loaded on first usage and must be saved with ``save()``, or it can be
+    used as a context manager which saves it on exit: ::
+
+        with DigestIndex() as index:
+            digests = index.digests("dist/*.whl")
+
+    Keyword Arguments:
+        path (string): Index file path. Default to a file for the algorithm in the
+            directory from ``makevoke.utils.get_cache_dir()``.
+        algorithm (string): Any algorithm name from ``hashlib``. Default to
+            ``sha256``.
+        workers (integer): Maximum number of hashing threads. Default to the
+            ``ThreadPoolExecutor`` default.
+
+    Attributes:
+        hits (integer): Number of digests taken from index.
+        misses (integer): Number of computed digests.
+    """
+    VERSION = 1
+
+    def __init__(self, path=None, algorithm="sha256", workers=None):
+        self.algorithm = algorithm
+        self.path = path or os.path.join(
+            get_cache_dir(), "digests-{}.json".format(algorithm)
+        )
+        self.workers = workers
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._dirty = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
+
+    @property
+    def entries(self):
+        """
+        Returns:
+            dict: Index entries as lists ``[device, inode, size, mtime_ns, digest]``
+            indexed on absolute file paths.
+        """
+        if self._entries is None:
+            self._entries = self.load()
+
+        return self._entries
+
+    def load(self):
+        """
+        Read index file.
+
+        Returns:
+            dict: Index entries, empty if there is no valid index file.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+        if (
+            not isinstance(data, dict) or
+            data.get("version") != self.VERSION or
+            data.get("algorithm") != self.algorithm
+        ):
+            return {}
+
+        return data.get("entries", {})
+
+    def save(self):
+        """
+        Write index file atomically if it has changed.
+
+        Filesystem errors are ignored since index is only a cache.
+
+        Returns:
+            boolean: True if index has been written.
+        """
+        if not self._dirty:
+            return False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump({
+                    "version": self.VERSION,
+                    "algorithm": self.algorithm,
+                    "entries": self.entries,
+                }, fp)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return False
+
+        self._dirty = False
+
+        return True
+
+    def prune(self):
+        """
+        Remove entries of files which do not exist anymore.
+
+        Returns:
+            integer: Number of removed entries.
+        """
+        missing = [path for path in self.entries if not os.path.isfile(path)]
+        for path in missing:
+            del self.entries[path]
+
+        if missing:
+            self._dirty = True
+
+        return len(missing)
+
+    @staticmethod
+    def get_key(status):
+        """
+        Returns:
+            list: Index key from a file status.
+        """
+        return [status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns]
+
+    def lookup(self, path, status=None):
+        """
+        Get digest of a file from index only.
+
+        Arguments:
+            path (string or Path): File path.
+
+        Keyword Arguments:
+            status (os.stat_result): File status if already known.
+
+        Returns:
+            string: Digest or None if file is not indexed or has changed.
+        """
+        path = os.path.abspath(path)
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+
+        if status is None:
+            status = os.stat(path)
+
+        if entry[:4] != self.get_key(status):
+            return None
+
+        return entry[4]
+
+    def _compute(self, path, status):
+        return path, status, hash_file(path, algorithm=self.algorithm)
+
+    def _record(self, path, status, digest):
+        self.entries[path] = self.get_key(status) + [digest]
+        self._dirty = True
+        self.misses += 1
+
+    def get(self, path):
+        """
+        Get digest of a single file, computing it if needed.
+
+        Arguments:
+            path (string or Path): File path.
+
+        Returns:
+            string: Digest.
+        """
+        path = os.path.abspath(path)
+        status = os.stat(path)
+
+        digest = self.lookup(path, status=status)
+        if digest is not None:
+            self.hits += 1
+            return digest
+
+        path, status, digest = self._compute(path, status)
+        self._record(path, status, digest)
+
+        return digest
+
+    @staticmethod
+    def iter_files(target, patterns=None, exclude=DEFAULT_EXCLUDES):
+        """
+        List files from a target.
+
+        Arguments:
+            target (string or Path): A file, a directory or a glob pattern like
+                ``dist/*.whl``. A glob pattern is matched against paths relative to
+                its static directory part, so ``dist/*.whl`` does not match
+                ``dist/old/foo.whl`` unless ``dist/**/*.whl`` is used.
+
+        Keyword Arguments:
+            patterns (string or iterable): Glob patterns of files to include when
+                target is a directory. Default to every files.
+            exclude (iterable): Glob patterns for directories to never enter.
+
+        Returns:
+            generator: Yield file paths.
+        """
+        target = os.fspath(target)
+
+        if os.path.isfile(target):
+            yield target
+            return
+
+        max_depth = path_matcher = None
+        if not os.path.isdir(target):
+            target, glob_pattern = split_glob(target)
+            if glob_pattern is None:
+                return
+            path_matcher = re.compile(
+                "{}\\Z".format(translate_glob(glob_pattern)), re.DOTALL
+            )
+            if "**" not in glob_pattern:
+                max_depth = glob_pattern.count("/")
+            patterns = "**"
+
+        for entry, relative_path in iter_entries(
+            target, patterns or "**", exclude=exclude, dirs=False,
+            max_depth=max_depth,
+        ):
+            if path_matcher is not None and not path_matcher.match(relative_path):
+                continue
+            if entry.is_file():
+                yield entry.path
+
+    def iter_digests(self, target, patterns=None, exclude=DEFAULT_EXCLUDES):
+        """
+        Lazily compute digests of files from a target.
+
+        Indexed digests are yielded immediately, other ones are yielded as soon as
+        they are computed so order does not follow walk order. A bounded number of
+        files are hashed at once.
+
+        Arguments:
+            target (string or Path): A file, a directory or a glob pattern, see
+                ``iter_files()``.
+
+        Keyword Arguments:
+            patterns (string or iterable): Glob patterns of files to include when
+                target is a directory. Default to every files.
+            exclude (iterable): Glob patterns for directories to never enter.
+
+        Returns:
+            generator: Yield tuples ``(path, digest)`` with absolute file paths.
+        """
+        workers = self.workers or min(32, (os.cpu_count() or 1) + 4)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            limit = workers * 4
+            pending = set()
+
+            def collect(when):
+                nonlocal pending
+                done, pending = wait(pending, return_when=when)
+                for future in done:
+                    path, status, digest = future.result()
+                    self._record(path, status, digest)
+                    yield path, digest
+
+            for path in self.iter_files(target, patterns=patterns, exclude=exclude):
+                path = os.path.abspath(path)
+                status = os.stat(path)
+
+                digest = self.lookup(path, status=status)
+                if digest is not None:
+                    self.hits += 1
+                    yield path, digest
+                    continue
+
+                pending.add(executor.submit(self._compute, path, status))
+                if len(pending) >= limit:
+                    yield from collect(FIRST_COMPLETED)
+
+            while pending:
+                yield from collect(FIRST_COMPLETED)
+
+    def digests(self, target, patterns=None, exclude=DEFAULT_EXCLUDES):
+        """
+        Compute digests of files from a target.
+
+        Arguments and keyword arguments are the same than ``iter_digests()``.
+
+        Returns:
+            dict: Digests indexed on absolute file paths, sorted on paths.
+        """
+        return dict(sorted(self.iter_digests(
+            target, patterns=patterns, exclude=exclude
+        )))
@@ -0,0 +1,919 @@
+"""
+Distributed
+===========
+
+Run command lines on worker agents from other hosts.
+
+A worker agent is a process listening on a TCP port which runs commands it receives
+and streams their outputs back. It is started on each worker host with: ::
+
+    MAKEVOKE_AGENT_TOKEN=secret python -m makevoke.distributed --host 0.0.0.0 \\
+        --port 8765 --capacity 8
+
+``DistributedExecutor`` is an opt-in executor for ``MakevokeBase.run()`` which
+sends commands to agents: ::
+
+    from makevoke.distributed import DistributedExecutor
+
+    class Makefile(MakevokeBase):
+        EXECUTORS = [
+            DistributedExecutor(
+                ["build1:8765", "build2:8765"],
+                programs=["gcc"],
+            ),
+        ]
+
+    Makefile.run(inv, "gcc -c src/foo.c", inputs=["src/foo.c", "include"])
+
+Each command runs from a new job directory on the agent, where declared input files
+and directories are recreated with the same paths relative to the executor root.
+Files are sent by content digest and agents keep a cache of received contents, so
+an input is only transferred once to each agent. Outputs are streamed back and
+files written by commands are not.
+
+Agents advertise their capacity (the number of commands they run at once) and the
+executor sends each command to the least loaded agent, waiting when every agent is
+full. An agent which can not be reached is not used anymore.
+
+Agents run any command they receive, they should only listen on a trusted network.
+They require a non empty shared token, given with environment variable
+``MAKEVOKE_AGENT_TOKEN``. When started from commandline on a local address without
+this variable, an agent generates a random token and prints it.
+
+"""
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+
+from invoke.exceptions import UnexpectedExit
+from invoke.runners import Result
+
+from .protocol import HEADER
+from .digest import hash_file
+from .exceptions import MakevokeAgentError
+
+
+TOKEN_ENV_VAR = "MAKEVOKE_AGENT_TOKEN"
+
+PROTOCOL_VERSION = 1
+
+DEFAULT_PORT = 8765
+
+# Protection against garbage data or memory exhaustion, headers are small JSON
+# objects and only input contents may be big
+MAX_HEADER_SIZE = 16 * 1024 * 1024
+
+# Header size limit before a client has authenticated
+MAX_HELLO_SIZE = 4096
+
+# Data size limit for frames read in memory
+MAX_DATA_SIZE = 1024 * 1024
+
+# Size limit for an input content, which is streamed to disk
+MAX_BLOB_SIZE = 4 * 1024 * 1024 * 1024
+
+CHUNK_SIZE = 65536
+
+# Number of seconds a client has to authenticate
+HELLO_TIMEOUT = 10.0
+
+# Options from 'invoke' runner supported by executor
+SUPPORTED_OPTIONS = ("hide", "warn", "echo", "env", "inputs")
+
+
+def write_frame(sock, header, data=b""):
+    """
+    Send a frame made of a JSON header and optional binary data.
+
+    Arguments:
+        sock (socket.socket): Connected socket.
+        header (dict): Frame header, key ``size`` is set to data size.
+
+    Keyword Arguments:
+        data (bytes): Binary data.
+    """
+    header = dict(header, size=len(data))
+    content = json.dumps(header).encode("utf-8")
+
+    sock.sendall(HEADER.pack(len(content)) + content + data)
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise ConnectionError("Connection closed before end of frame")
+
+    return data
+
+
+def write_file_frame(sock, header, path):
+    """
+    Send a frame whose data is the content of a file, without reading it in
+    memory.
+
+    Arguments:
+        sock (socket.socket): Connected socket.
+        header (dict): Frame header, key ``size`` is set to file size.
+        path (string): File path.
+    """
+    with open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        content = json.dumps(dict(header, size=size)).encode("utf-8")
+        sock.sendall(HEADER.pack(len(content)) + content)
+
+        sent = sock.sendfile(fp, count=size) if size else 0
+        if sent != size:
+            raise ConnectionError("File has changed while being sent: {}".format(path))
+
+
+def read_header(stream, max_header_size=MAX_HEADER_SIZE, max_size=MAX_DATA_SIZE):
+    """
+    Receive a frame header and check its data size, without reading data.
+
+    Arguments:
+        stream (file object): Buffered binary reader from a connected socket.
+
+    Keyword Arguments:
+        max_header_size (integer): Maximum header size in bytes.
+        max_size (integer): Maximum data size in bytes.
+
+    Returns:
+        tuple: Frame header and data size.
+    """
+    length = HEADER.unpack(_read_exactly(stream, HEADER.size))[0]
+    if not 0 < length <= max_header_size:
+        raise ConnectionError("Invalid frame header size: {}".format(length))
+
+    try:
+        header = json.loads(_read_exactly(stream, length).decode("utf-8"))
+    except ValueError:
+        raise ConnectionError("Invalid frame header")
+    if not isinstance(header, dict):
+        raise ConnectionError("Invalid frame header")
+
+    size = header.get("size", 0)
+    if type(size) is not int or not 0 <= size <= max_size:
+        raise ConnectionError("Invalid frame data size: {!r}".format(size))
+
+    return header, size
+
+
+def read_frame(stream, max_header_size=MAX_HEADER_SIZE, max_size=MAX_DATA_SIZE):
+    """
+    Receive a frame made of a JSON header and optional binary data.
+
+    Arguments:
+        stream (file object): Buffered binary reader from a connected socket.
+
+    Keyword Arguments:
+        max_header_size (integer): Maximum header size in bytes.
+        max_size (integer): Maximum data size in bytes, data is read in memory.
+
+    Returns:
+        tuple: Frame header and data.
+    """
+    header, size = read_header(
+        stream, max_header_size=max_header_size, max_size=max_size
+    )
+
+    return header, _read_exactly(stream, size)
+
+
+def check_relative_path(path):
+    """
+    Check a path sent to an agent stays inside job directory.
+
+    Arguments:
+        path (string): Relative path with ``/`` as separator.
+
+    Returns:
+        string: Path with system separator.
+    """
+    parts = path.split("/")
+    if (
+        not path or
+        path.startswith("/") or
+        any(part in ("", ".", "..") for part in parts) or
+        "\\" in path or
+        ":" in parts[0]
+    ):
+        raise ValueError("Invalid input path: {}".format(path))
+
+    return os.path.join(*parts)
+
+
+def parse_address(address):
+    """
+    Parse an agent address.
+
+    Arguments:
+        address (string or tuple): Either ``host:port``, ``host`` for default port
+            or a tuple ``(host, port)``.
+
+    Returns:
+        tuple: Host and port.
+    """
+    if isinstance(address, (tuple, list)):
+        return address[0], int(address[1])
+
+    host, separator, port = address.rpartition(":")
+    if not separator:
+        return address, DEFAULT_PORT
+
+    return host.strip("[]"), int(port)
+
+
+class _AgentServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _AgentHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.agent.handle(self.request)
+
+
+class WorkerAgent:
+    """
+    Worker agent which runs commands received over TCP.
+
+    Keyword Arguments:
+        host (string): Address to listen on. Default to localhost.
+        port (integer): Port to listen on, 0 to pick any free port.
+        capacity (integer): Maximum number of commands run at once. Default to the
+            number of CPUs.
+        workdir (string): Directory for input cache and job directories. Default
+            to a new temporary directory.
+        token (string): Shared token clients must give. Default to the value of
+            environment variable ``MAKEVOKE_AGENT_TOKEN``. An empty token is
+            refused.
+
+    Attributes:
+        served (integer): Number of commands run.
+        running (integer): Number of commands currently running.
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, capacity=None,
+                 workdir=None, token=None):
+        self.token = os.environ.get(TOKEN_ENV_VAR, "") if token is None else token
+        if not self.token:
+            raise MakevokeAgentError(
+                "A worker agent requires a non empty token, given as argument or "
+                "with environment variable {}".format(TOKEN_ENV_VAR)
+            )
+
+        self.capacity = capacity or os.cpu_count() or 1
+        self.workdir = workdir or tempfile.mkdtemp(prefix="makevoke-agent-")
+        self.blobs_dir = os.path.join(self.workdir, "blobs")
+        self.jobs_dir = os.path.join(self.workdir, "jobs")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self.served = 0
+        self.running = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._thread = None
+
+        self._server = _AgentServer((host, port), _AgentHandler)
+        self._server.agent = self
+
+    @property
+    def address(self):
+        """
+        Returns:
+            tuple: Host and port agent listens on.
+        """
+        return self._server.server_address[:2]
+
+    def serve_forever(self, poll_interval=0.5):
+        """
+        Serve requests until shut down.
+
+        Keyword Arguments:
+            poll_interval (float): Delay in seconds to check for shutdown.
+        """
+        self._server.serve_forever(poll_interval=poll_interval)
+
+    def start(self):
+        """
+        Serve requests from a background thread.
+
+        Returns:
+            WorkerAgent: The agent itself.
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.1,), daemon=True,
+        )
+        self._thread.start()
+
+        return self
+
+    def shutdown(self):
+        """
+        Stop serving requests and close listening socket.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def get_blob_path(self, digest):
+        """
+        Arguments:
+            digest (string): Content digest.
+
+        Returns:
+            string: Path of cached content.
+        """
+        if not digest.isalnum():
+            raise ValueError("Invalid digest: {}".format(digest))
+
+        return os.path.join(self.blobs_dir, digest)
+
+    def store_blob(self, digest, stream, size):
+        """
+        Stream a content to cache, checking its digest.
+
+        Arguments:
+            digest (string): Expected content digest.
+            stream (file object): Buffered binary reader to read content from.
+            size (integer): Content size.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.blobs_dir)
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, "wb") as fp:
+                remaining = size
+                while remaining:
+                    chunk = _read_exactly(stream, min(remaining, CHUNK_SIZE))
+                    hasher.update(chunk)
+                    fp.write(chunk)
+                    remaining -= len(chunk)
+
+            if hasher.hexdigest() != digest:
+                raise ValueError("Content does not match digest: {}".format(digest))
+
+            os.replace(temp_path, self.get_blob_path(digest))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def handle(self, sock):
+        """
+        Serve a client connection.
+
+        Client must first send a ``hello`` frame with the shared token, agent
+        replies with its capacity. Then client may send ``run`` frames.
+
+        Arguments:
+            sock (socket.socket): Client socket.
+        """
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Unauthenticated clients must not hold a handler thread forever
+        sock.settimeout(HELLO_TIMEOUT)
+        reader = sock.makefile("rb")
+
+        try:
+            header, data = read_frame(
+                reader, max_header_size=MAX_HELLO_SIZE, max_size=0
+            )
+            token = header.get("token")
+            if (
+                header.get("type") != "hello" or
+                not isinstance(token, str) or
+                not token or
+                not hmac.compare_digest(
+                    token.encode("utf-8"), self.token.encode("utf-8")
+                )
+            ):
+                write_frame(sock, {"type": "error", "message": "Unauthorized"})
+                return
+
+            sock.settimeout(None)
+            with self._lock:
+                running = self.running
+            write_frame(sock, {
+                "type": "hello",
+                "version": PROTOCOL_VERSION,
+                "capacity": self.capacity,
+                "running": running,
+            })
+
+            while True:
+                try:
+                    header, data = read_frame(reader, max_size=0)
+                except ConnectionError:
+                    return
+
+                if header.get("type") == "run":
+                    self.run_job(sock, reader, header)
+                else:
+                    write_frame(sock, {
+                        "type": "error",
+                        "message": "Unknown frame type: {}".format(header.get("type")),
+                    })
+                    return
+        except (ConnectionError, OSError, ValueError):
+            return
+        finally:
+            reader.close()
+
+    def run_job(self, sock, reader, header):
+        """
+        Receive inputs of a command, run it and stream its outputs.
+
+        Arguments:
+            sock (socket.socket): Client socket.
+            reader (file object): Buffered reader from client socket.
+            header (dict): The ``run`` frame header.
+        """
+        files = header.get("files", [])
+        try:
+            paths = [check_relative_path(item["path"]) for item in files]
+            blobs = [self.get_blob_path(item["digest"]) for item in files]
+            modes = [item.get("mode", 0o644) for item in files]
+            if any(type(mode) is not int for mode in modes):
+                raise ValueError("File modes must be integers")
+        except (KeyError, TypeError, AttributeError, ValueError) as error:
+            write_frame(sock, {"type": "error", "message": str(error)})
+            return
+
+        missing = sorted({
+            item["digest"]
+            for item, blob in zip(files, blobs)
+            if not os.path.exists(blob)
+        })
+        write_frame(sock, {"type": "need", "digests": missing})
+        for digest in missing:
+            blob_header, size = read_header(reader, max_size=MAX_BLOB_SIZE)
+            if blob_header.get("type") != "blob" or blob_header.get("digest") != digest:
+                raise ConnectionError("Unexpected frame instead of input content")
+            self.store_blob(digest, reader, size)
+
+        job_dir = tempfile.mkdtemp(dir=self.jobs_dir)
+        try:
+            for path, blob, mode in zip(paths, blobs, modes):
+                target = os.path.join(job_dir, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(blob, target)
+                os.chmod(target, mode & 0o777)
+
+            with self._slots:
+                with self._lock:
+                    self.running += 1
+                try:
+                    exited = self._execute(sock, header, job_dir)
+                finally:
+                    with self._lock:
+                        self.running -= 1
+                        self.served += 1
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+        write_frame(sock, {"type": "exit", "code": exited})
+
+    def _execute(self, sock, header, job_dir):
+        environ = dict(os.environ)
+        environ.update(header.get("env") or {})
+
+        process = subprocess.Popen(
+            header["command"],
+            shell=True,
+            cwd=job_dir,
+            env=environ,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        send_lock = threading.Lock()
+
+        def pump(stream, name):
+            with stream:
+                while True:
+                    chunk = stream.read1(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    with send_lock:
+                        write_frame(sock, {"type": "output", "stream": name}, chunk)
+
+        pumps = [
+            threading.Thread(target=pump, args=(process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, "stderr"), daemon=True),
+        ]
+        for thread in pumps:
+            thread.start()
+        for thread in pumps:
+            thread.join()
+
+        return process.wait()
+
+
+class AgentState:
+    """
+    State of an agent known by an executor.
+
+    Arguments:
+        address (tuple): Agent host and port.
+
+    Attributes:
+        capacity (integer): Capacity advertised by agent, None until probed.
+        running (integer): Number of commands sent by executor which are running.
+        down (boolean): True if agent could not be reached.
+        served (integer): Number of commands sent by executor.
+    """
+    def __init__(self, address):
+        self.address = address
+        self.capacity = None
+        self.running = 0
+        self.down = False
+        self.served = 0
+
+    def __repr__(self):
+        return "<AgentState {}:{} {}/{}>".format(
+            self.address[0], self.address[1], self.running, self.capacity
+        )
+
+    @property
+    def load(self):
+        return self.running / self.capacity
+
+
+class DistributedExecutor:
+    """
+    Executor for ``MakevokeBase.run()`` which runs commands on worker agents.
+
+    Arguments:
+        agents (iterable): Agent addresses, see ``parse_address()``.
+
+    Keyword Arguments:
+        programs (iterable): Program names to accept. Default to accept every
+            command.
+        root (string): Directory input paths are relative to. Default to current
+            directory at run time.
+        token (string): Shared token for agents. Default to the value of
+            environment variable ``MAKEVOKE_AGENT_TOKEN``.
+        timeout (float): Timeout in seconds to connect to an agent.
+    """
+    def __init__(self, agents, programs=None, root=None, token=None, timeout=10):
+        self.agents = [AgentState(parse_address(item)) for item in agents]
+        self.programs = None if programs is None else set(programs)
+        self.root = root
+        self.token = os.environ.get(TOKEN_ENV_VAR, "") if token is None else token
+        self.timeout = timeout
+
+        self.sent = 0
+        self._probed = False
+        self._condition = threading.Condition()
+        self._digests = {}
+
+    def _connect(self, agent):
+        sock = socket.create_connection(agent.address, timeout=self.timeout)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = sock.makefile("rb")
+
+        try:
+            write_frame(sock, {"type": "hello", "token": self.token})
+            header, data = read_frame(reader)
+            if header.get("type") != "hello":
+                raise ConnectionError("Agent refused connection: {}".format(
+                    header.get("message")
+                ))
+        except BaseException:
+            reader.close()
+            sock.close()
+            raise
+
+        return sock, reader, header
+
+    def probe(self):
+        """
+        Connect to every agent to get their capacity, unreachable agents are
+        marked as down.
+
+        Returns:
+            list: Available agents.
+        """
+        for agent in self.agents:
+            try:
+                sock, reader, header = self._connect(agent)
+            except OSError:
+                agent.down = True
+                continue
+
+            reader.close()
+            sock.close()
+            agent.capacity = max(1, int(header.get("capacity", 1)))
+            agent.down = False
+
+        self._probed = True
+
+        return [agent for agent in self.agents if not agent.down]
+
+    def acquire(self):
+        """
+        Reserve a slot on the least loaded available agent, waiting for a free slot
+        if every agent is full.
+
+        Returns:
+            AgentState: Reserved agent.
+        """
+        with self._condition:
+            if not self._probed:
+                self.probe()
+
+            while True:
+                available = [agent for agent in self.agents if not agent.down]
+                if not available:
+                    raise ConnectionError("No worker agent is available")
+
+                free = [
+                    agent for agent in available if agent.running < agent.capacity
+                ]
+                if free:
+                    agent = min(free, key=lambda item: (item.load, item.running))
+                    agent.running += 1
+                    return agent
+
+                self._condition.wait()
+
+    def release(self, agent, down=False):
+        """
+        Release a slot reserved on an agent.
+
+        Arguments:
+            agent (AgentState): Reserved agent.
+
+        Keyword Arguments:
+            down (boolean): If True, agent is marked as down.
+        """
+        with self._condition:
+            agent.running -= 1
+            if down:
+                agent.down = True
+            self._condition.notify_all()
+
+    def accepts(self, command, **kwargs):
+        """
+        Check if executor can run a command.
+
+        Arguments:
+            command (string): Command line.
+            **kwargs: Run options for ``invoke``, only ``hide``, ``warn``,
+                ``echo`` and ``env`` are supported, with ``inputs`` for input files.
+
+        Returns:
+            boolean: True if command is accepted.
+        """
+        if any(key not in SUPPORTED_OPTIONS for key in kwargs):
+            return False
+
+        if self.programs is None:
+            return True
+
+        program = command.split(None, 1)[0] if command.strip() else ""
+
+        return os.path.basename(program) in self.programs
+
+    def get_digest(self, path):
+        """
+        Get content digest of a file, cached on its size and modification time.
+
+        Arguments:
+            path (string): File path.
+
+        Returns:
+            string: Hexadecimal SHA256 digest.
+        """
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns)
+
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        digest = hash_file(path)
+        self._digests[path] = (key, digest)
+
+        return digest
+
+    def collect_inputs(self, inputs, root):
+        """
+        Collect declared input files.
+
+        Arguments:
+            inputs (iterable): File or directory paths, relative to root or
+                absolute inside root.
+            root (string): Root directory.
+
+        Returns:
+            list: For each file a tuple ``(relative_path, absolute_path, mode)``
+            sorted on relative paths.
+        """
+        root = os.path.abspath(root)
+        found = {}
+
+        def add(path):
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            if relative == ".." or relative.startswith("../"):
+                raise ValueError("Input is outside of root directory: {}".format(path))
+            found[relative] = (relative, path, os.stat(path).st_mode)
+
+        for item in inputs or []:
+            path = os.path.join(root, str(item))
+            if os.path.isdir(path):
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames.sort()
+                    for filename in filenames:
+                        add(os.path.join(dirpath, filename))
+            else:
+                add(path)
+
+        return [found[key] for key in sorted(found)]
+
+    def run(self, inv, command, hide=None, warn=False, echo=False, env=None,
+            inputs=None):
+        """
+        Run an accepted command on an agent like ``invoke`` would.
+
+        Arguments:
+            inv (invoke): Invoke instance, only used for its configuration.
+            command (string): Command line.
+
+        Keyword Arguments:
+            hide (boolean or string): Same as ``invoke`` option to hide outputs:
+                ``out``, ``err``, ``both`` or True.
+            warn (boolean): If True, a failure does not raise an exception.
+            echo (boolean): If True, print command before running it.
+            env (dict): Environment variables to add.
+            inputs (iterable): Paths of files and directories the command needs.
+
+        Returns:
+            invoke.runners.Result: Result with outputs and exit code.
+        """
+        if hide in (True, "both"):
+            hidden = ("stdout", "stderr")
+        elif hide in ("out", "stdout"):
+            hidden = ("stdout",)
+        elif hide in ("err", "stderr"):
+            hidden = ("stderr",)
+        else:
+            hidden = ()
+
+        if echo:
+            print("\033[1;37m{}\033[0m".format(command))
+
+        root = self.root or os.getcwd()
+        files = [
+            (relative, path, mode, self.get_digest(path))
+            for relative, path, mode in self.collect_inputs(inputs, root)
+        ]
+
+        while True:
+            agent = self.acquire()
+            try:
+                sock, reader, header = self._connect(agent)
+            except OSError:
+                self.release(agent, down=True)
+                continue
+
+            try:
+                exited, captured = self._run_job(
+                    sock, reader, command, env, files, hidden
+                )
+            except BaseException:
+                self.release(agent)
+                raise
+            finally:
+                reader.close()
+                sock.close()
+
+            with self._condition:
+                agent.served += 1
+            self.release(agent)
+            break
+
+        result = Result(
+            stdout=captured["stdout"],
+            stderr=captured["stderr"],
+            command=command,
+            exited=exited,
+            hide=hidden,
+        )
+
+        if not result.ok and not warn:
+            raise UnexpectedExit(result)
+
+        return result
+
+    def _run_job(self, sock, reader, command, env, files, hidden):
+        write_frame(sock, {
+            "type": "run",
+            "command": command,
+            "env": env or {},
+            "files": [
+                {"path": relative, "mode": mode, "digest": digest}
+                for relative, path, mode, digest in files
+            ],
+        })
+
+        header, data = read_frame(reader)
+        if header.get("type") != "need":
+            raise ConnectionError("Agent refused command: {}".format(
+                header.get("message")
+            ))
+
+        paths = {digest: path for relative, path, mode, digest in files}
+        for digest in header["digests"]:
+            write_file_frame(sock, {"type": "blob", "digest": digest}, paths[digest])
+            self.sent += 1
+
+        streams = {"stdout": sys.stdout, "stderr": sys.stderr}
+        chunks = {"stdout": [], "stderr": []}
+        while True:
+            header, data = read_frame(reader)
+            kind = header.get("type")
+            if kind == "output":
+                name = header["stream"]
+                chunks[name].append(data)
+                if name not in hidden:
+                    streams[name].write(data.decode("utf-8", errors="replace"))
+                    streams[name].flush()
+            elif kind == "exit":
+                break
+            else:
+                raise ConnectionError("Agent failed: {}".format(header.get("message")))
+
+        captured = {
+            name: b"".join(items).decode("utf-8", errors="replace")
+            for name, items in chunks.items()
+        }
+
+        return header["code"], captured
+
+
+def main(argv=None):
+    """
+    Worker agent entrypoint.
+
+    Keyword Arguments:
+        argv (list): Commandline arguments. Default to ``sys.argv`` without the
+            program name.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m makevoke.distributed",
+        description="Start a worker agent which runs commands from Makevoke "
+                    "distributed executors.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--capacity", type=int, default=None)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args(argv)
+
+    token = os.environ.get(TOKEN_ENV_VAR)
+    if not token:
+        if args.host not in ("127.0.0.1", "::1", "localhost"):
+            parser.error(
+                "Environment variable {} is required to listen on a non local "
+                "address".format(TOKEN_ENV_VAR)
+            )
+
+        import secrets
+
+        token = secrets.token_urlsafe(32)
+        print("Generated token: {}".format(token), flush=True)
+
+    agent = WorkerAgent(
+        host=args.host,
+        port=args.port,
+        capacity=args.capacity,
+        workdir=args.workdir,
+        token=token,
+    )
+    print("Agent listening on {}:{} with capacity {}".format(
+        agent.address[0], agent.address[1], agent.capacity
+    ), flush=True)
+
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,3 +21,24 @@ class MakevokeContextError(MakevokeBaseException):
     An exception related to set/get context
     """
     pass
+
+
+class MakevokeCacheError(MakevokeBaseException):
+    """
+    An exception related to a cache
+    """
+    pass
+
+
+class MakevokeTemplateError(MakevokeBaseException):
+    """
+    An exception related to a template
+    """
+    pass
+
+
+class MakevokeAgentError(MakevokeBaseException):
+    """
+    An exception related to a worker agent
+    """
+    pass
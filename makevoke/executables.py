@@ -0,0 +1,200 @@
+"""
+Executables
+===========
+
+Resolution of executables from ``PATH`` with a per session cache.
+
+"""
+import os
+import shlex
+import sys
+
+
+class ExecutableResolver:
+    """
+    Resolve executables from ``PATH`` directories.
+
+    Each ``PATH`` directory is listed at most once and only when needed, then every
+    lookup is answered from these listings. Resolved names are cached too, so a
+    resolver is meant to live during a session.
+
+    Keyword Arguments:
+        path (string): Search path with directories separated by ``os.pathsep``.
+            Default to the ``PATH`` environment variable.
+        pathext (string): Executable extensions separated by ``os.pathsep``, it is
+            only used on Windows. Default to the ``PATHEXT`` environment variable.
+    """
+    def __init__(self, path=None, pathext=None):
+        if path is None:
+            path = os.environ.get("PATH", os.defpath)
+        self.path = path
+
+        self.extensions = [""]
+        if sys.platform == "win32":
+            if pathext is None:
+                pathext = os.environ.get("PATHEXT", ".COM;.EXE;.BAT;.CMD")
+            self.extensions += [
+                ext.lower() for ext in pathext.split(os.pathsep) if ext
+            ]
+
+        self.directories = []
+        for directory in path.split(os.pathsep):
+            if directory and directory not in self.directories:
+                self.directories.append(directory)
+
+        self.scanned = 0
+        self._listings = {}
+        self._resolved = {}
+
+    def _listing(self, directory):
+        """
+        List file names of a directory, only once.
+
+        Arguments:
+            directory (string): Directory path.
+
+        Returns:
+            dict: File paths indexed on their name (lowercase on Windows).
+        """
+        if directory not in self._listings:
+            listing = {}
+            try:
+                with os.scandir(directory) as iterator:
+                    for entry in iterator:
+                        name = entry.name
+                        if sys.platform == "win32":
+                            name = name.lower()
+                        listing[name] = entry.path
+            except OSError:
+                pass
+
+            self.scanned += 1
+            self._listings[directory] = listing
+
+        return self._listings[directory]
+
+    @staticmethod
+    def is_executable(path):
+        """
+        Check a path is an executable file.
+
+        Arguments:
+            path (string): File path.
+
+        Returns:
+            boolean: True if path is a file with execution permission.
+        """
+        return os.path.isfile(path) and os.access(path, os.X_OK)
+
+    @staticmethod
+    def get_program(command):
+        """
+        Get the program part from a command line.
+
+        Arguments:
+            command (string): A program name or path, possibly followed with
+                arguments like ``python docs/sphinx_reload.py``.
+
+        Returns:
+            string: Program name or path.
+        """
+        command = str(command)
+        try:
+            parts = shlex.split(command, posix=(sys.platform != "win32"))
+        except ValueError:
+            parts = command.split()
+
+        return parts[0] if parts else ""
+
+    def resolve_names(self, names):
+        """
+        Resolve bare program names from ``PATH`` in a single pass over directories.
+
+        Arguments:
+            names (iterable): Bare program names.
+
+        Returns:
+            dict: Resolved path for each name, or None if not found.
+        """
+        names = list(names)
+        pending = [name for name in dict.fromkeys(names) if name not in self._resolved]
+
+        for directory in self.directories:
+            if not pending:
+                break
+
+            listing = self._listing(directory)
+            remaining = []
+            for name in pending:
+                key = name.lower() if sys.platform == "win32" else name
+                for extension in self.extensions:
+                    path = listing.get(key + extension)
+                    if path and self.is_executable(path):
+                        self._resolved[name] = path
+                        break
+                else:
+                    remaining.append(name)
+
+            pending = remaining
+
+        for name in pending:
+            self._resolved[name] = None
+
+        return {name: self._resolved[name] for name in names}
+
+    def resolve(self, commands, base_dir=None):
+        """
+        Resolve programs from command lines.
+
+        A program given as a path (with a directory part) is checked directly,
+        relatively to ``base_dir`` if not absolute. A bare program name is searched
+        in ``PATH``.
+
+        Arguments:
+            commands (iterable): Command lines.
+
+        Keyword Arguments:
+            base_dir (string or Path): Directory to resolve relative program paths.
+                Default to the current directory.
+
+        Returns:
+            dict: Resolved executable path for each command, or None if not found.
+        """
+        commands = list(commands)
+        programs = {command: self.get_program(command) for command in commands}
+
+        bare = [
+            program for program in programs.values()
+            if program and os.path.dirname(program) == ""
+        ]
+        resolved = self.resolve_names(bare)
+
+        results = {}
+        for command, program in programs.items():
+            if not program:
+                results[command] = None
+            elif program in resolved:
+                results[command] = resolved[program]
+            else:
+                path = os.path.join(os.fspath(base_dir or ""), program)
+                results[command] = path if self.is_executable(path) else None
+
+        return results
+
+
+_RESOLVERS = {}
+
+
+def get_resolver():
+    """
+    Get a resolver shared during the session for the current ``PATH``.
+
+    Returns:
+        ExecutableResolver: The shared resolver.
+    """
+    path = os.environ.get("PATH", os.defpath)
+
+    if path not in _RESOLVERS:
+        _RESOLVERS[path] = ExecutableResolver(path=path)
+
+    return _RESOLVERS[path]
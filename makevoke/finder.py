@@ -0,0 +1,279 @@
+"""
+Finder
+======
+
+Compiled glob patterns and pruned directory tree walks.
+
+Patterns follow the usual glob syntax:
+
+* ``*`` matches anything except a path separator;
+* ``**`` matches anything including path separators, so ``docs/**/*.rst`` matches
+  every ``.rst`` files at any depth under ``docs/``;
+* ``?`` matches any single character except a path separator;
+* ``[seq]`` and ``[!seq]`` match any character in or not in a sequence.
+
+A pattern without any ``/`` is matched against entry names only (like ``*.pyc`` or
+``__pycache__``), else it is matched against the entry path relative to the walked
+directory, always with ``/`` as separator.
+
+"""
+import functools
+import os
+import re
+from pathlib import Path
+
+
+# Directory patterns excluded from walks by default
+DEFAULT_EXCLUDES = (".git", ".hg", ".svn", ".tox", ".venv", "node_modules")
+
+
+def translate_glob(pattern):
+    """
+    Translate a glob pattern to a regular expression.
+
+    Arguments:
+        pattern (string): Glob pattern.
+
+    Returns:
+        string: Regular expression without anchors.
+    """
+    output = []
+    i = 0
+    size = len(pattern)
+
+    while i < size:
+        char = pattern[i]
+
+        if pattern.startswith("**/", i):
+            output.append("(?:.*/)?")
+            i += 3
+            continue
+        elif pattern.startswith("**", i):
+            output.append(".*")
+            i += 2
+            continue
+        elif char == "*":
+            output.append("[^/]*")
+        elif char == "?":
+            output.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) else i + 1)
+            if end == -1:
+                output.append(re.escape(char))
+            else:
+                sequence = pattern[i + 1:end]
+                if sequence.startswith("!"):
+                    sequence = "^" + sequence[1:]
+                output.append("[" + sequence.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            output.append(re.escape(char))
+
+        i += 1
+
+    return "".join(output)
+
+
+def split_glob(pattern):
+    """
+    Split a glob pattern into its static directory part and its pattern part.
+
+    Arguments:
+        pattern (string): Glob pattern like ``docs/**/*.rst``.
+
+    Returns:
+        tuple: A tuple ``(directory, pattern)`` like ``("docs", "**/*.rst")``. If
+        there is no static directory part, directory is ``.``. If there is no
+        pattern part, pattern is None.
+    """
+    parts = pattern.replace(os.sep, "/").split("/")
+
+    for index, part in enumerate(parts):
+        if any(char in part for char in "*?["):
+            directory = "/".join(parts[:index])
+            if not directory and pattern.startswith("/"):
+                directory = "/"
+            return directory or ".", "/".join(parts[index:])
+
+    return pattern, None
+
+
+class PatternMatcher:
+    """
+    A set of glob patterns compiled to at most two regular expressions, one for
+    patterns matched against names and one for patterns matched against paths.
+
+    You should get matchers from ``compile_patterns()`` which caches them.
+
+    Arguments:
+        patterns (tuple): Glob patterns.
+    """
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+
+        names = [
+            translate_glob(pattern)
+            for pattern in self.patterns
+            if "/" not in pattern.rstrip("/")
+        ]
+        paths = [
+            translate_glob(pattern.strip("/"))
+            for pattern in self.patterns
+            if "/" in pattern.rstrip("/")
+        ]
+
+        self._names = self._compile([name.rstrip("/") for name in names])
+        self._paths = self._compile(paths)
+
+    def _compile(self, expressions):
+        if not expressions:
+            return None
+
+        return re.compile("(?:{})\\Z".format("|".join(expressions)), re.DOTALL)
+
+    def match(self, relative_path, name=None):
+        """
+        Check if an entry matches any pattern.
+
+        Arguments:
+            relative_path (string): Entry path relative to the walked directory with
+                ``/`` as separator.
+
+        Keyword Arguments:
+            name (string): Entry name. If not given, it is taken from the relative
+                path.
+
+        Returns:
+            boolean: True if entry matches any pattern.
+        """
+        if self._names is not None:
+            if name is None:
+                name = relative_path.rsplit("/", 1)[-1]
+            if self._names.match(name):
+                return True
+
+        if self._paths is not None and self._paths.match(relative_path):
+            return True
+
+        return False
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_patterns(patterns):
+    return PatternMatcher(patterns)
+
+
+def compile_patterns(patterns):
+    """
+    Compile glob patterns once.
+
+    Arguments:
+        patterns (string or iterable): A single glob pattern or many ones.
+
+    Returns:
+        PatternMatcher: Matcher for given patterns, the same matcher is returned for
+        the same patterns.
+    """
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+
+    return _compile_patterns(tuple(patterns))
+
+
+def iter_entries(root, patterns, exclude=DEFAULT_EXCLUDES, files=True, dirs=True,
+                 descend_matched=True, follow_symlinks=False, max_depth=None):
+    """
+    Lazily walk a directory tree and yield entries matching patterns.
+
+    Tree is walked with ``os.scandir`` and excluded directories are never entered.
+    Entries are yielded as soon as they are found so a consumer can stop the walk at
+    the first match.
+
+    Arguments:
+        root (string or Path): Directory to walk.
+        patterns (string or iterable): Glob patterns to match.
+
+    Keyword Arguments:
+        exclude (iterable): Glob patterns for directories to prune from walk. Default
+            to ``DEFAULT_EXCLUDES``.
+        files (boolean): If False, non directory entries are not yielded. Default to
+            True.
+        dirs (boolean): If False, directory entries are not yielded. Default to True.
+        descend_matched (boolean): If False, matching directories are not entered.
+            Default to True.
+        follow_symlinks (boolean): If True, symbolic links to directories are
+            entered. Default to False.
+        max_depth (integer): If given, directories deeper than this number of
+            levels under root are not entered, ``0`` only lists root entries.
+            Default to no limit.
+
+    Returns:
+        generator: Yield a tuple ``(entry, relative_path)`` for each matching entry
+        where ``entry`` is a ``os.DirEntry``.
+    """
+    matcher = compile_patterns(patterns)
+    excluder = compile_patterns(exclude) if exclude else None
+
+    stack = [(os.fspath(root), "", 0)]
+    while stack:
+        directory, relative, depth = stack.pop()
+
+        try:
+            iterator = os.scandir(directory)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+        subdirs = []
+        with iterator:
+            for entry in iterator:
+                relative_path = relative + entry.name
+                is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+
+                if (
+                    is_dir and excluder is not None and
+                    excluder.match(relative_path, entry.name)
+                ):
+                    continue
+
+                matched = matcher.match(relative_path, entry.name)
+                if matched and (dirs if is_dir else files):
+                    yield entry, relative_path
+
+                if (
+                    is_dir and (descend_matched or not matched) and
+                    (max_depth is None or depth < max_depth)
+                ):
+                    subdirs.append((entry.path, relative_path + "/", depth + 1))
+
+        stack.extend(reversed(subdirs))
+
+
+def iter_matches(root, patterns, **kwargs):
+    """
+    Lazily walk a directory tree and yield paths matching patterns.
+
+    Arguments:
+        root (string or Path): Directory to walk.
+        patterns (string or iterable): Glob patterns to match.
+        **kwargs: Any other keyword arguments are passed to ``iter_entries()``.
+
+    Returns:
+        generator: Yield ``Path`` objects.
+    """
+    for entry, relative_path in iter_entries(root, patterns, **kwargs):
+        yield Path(entry.path)
+
+
+def first_match(root, patterns, **kwargs):
+    """
+    Walk a directory tree until the first path matching patterns.
+
+    Arguments:
+        root (string or Path): Directory to walk.
+        patterns (string or iterable): Glob patterns to match.
+        **kwargs: Any other keyword arguments are passed to ``iter_entries()``.
+
+    Returns:
+        Path: First found path or None if there is no match.
+    """
+    return next(iter_matches(root, patterns, **kwargs), None)
@@ -0,0 +1,755 @@
+"""
+Forkserver
+==========
+
+Run Python tools command lines from forks of a warm process instead of new
+interpreters.
+
+A fork server is a background process forked from the current one which imports
+the tools modules once. Each accepted command is then run from a fork of this server
+which calls the tool console script entry point, so it does not pay for
+interpreter startup and imports anymore. Output is relayed through pipes and exit
+code is the one the tool would have exited with.
+
+This is an opt-in executor for ``MakevokeBase.run()``, only available on POSIX
+systems: ::
+
+    from makevoke.forkserver import ForkServerExecutor
+
+    class Makefile(MakevokeBase):
+        EXECUTORS = [ForkServerExecutor(programs=["flake8", "pytest"])]
+
+Commands are only accepted when their program is a console script of the current
+Python environment (or ``python -m`` with an interpreter of the current
+environment), without any shell syntax. Any other command is run by ``invoke`` as
+usual. Commands run from the fork server read their standard input from
+``/dev/null``, so commands which need an input must not be accepted.
+
+A benchmark comparing both ways can be run with: ::
+
+    python -m makevoke.forkserver "flake8 makevoke" "pytest -q tests"
+
+"""
+import atexit
+import importlib
+import os
+import re
+import shlex
+import socket
+import sys
+import sysconfig
+import threading
+import traceback
+import weakref
+
+from invoke.exceptions import UnexpectedExit
+from invoke.runners import Result
+
+from .protocol import HEADER, STANDARD_FDS, recv_message, send_message
+
+
+# Default programs with their console script entry point
+DEFAULT_PROGRAMS = ("flake8", "pytest", "twine")
+
+# Command lines with any of these characters require a shell
+SHELL_SYNTAX = re.compile(r"[|&;<>()$`*?\[\]#~\n]")
+
+# File descriptors of pipes from executor runs and servers of current process,
+# which a forked server must not hold. Lock is held while forking so a server never
+# gets a pipe end which is not registered yet.
+_PIPE_FDS = set()
+_SERVERS = weakref.WeakSet()
+_FORK_LOCK = threading.Lock()
+
+# Run options from 'invoke' which are supported by executor
+SUPPORTED_OPTIONS = ("hide", "warn", "echo", "env")
+
+
+def _open_pipe():
+    with _FORK_LOCK:
+        fds = os.pipe()
+        _PIPE_FDS.update(fds)
+
+    return fds
+
+
+def _close_pipe_end(fd):
+    with _FORK_LOCK:
+        _PIPE_FDS.discard(fd)
+        os.close(fd)
+
+
+def is_available():
+    """
+    Returns:
+        boolean: True if fork server is supported on this system.
+    """
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def get_console_scripts(names):
+    """
+    Get entry points of console scripts.
+
+    Arguments:
+        names (iterable): Console script names.
+
+    Returns:
+        dict: Entry point values like ``module:function`` indexed on names, only
+        for installed ones.
+    """
+    from importlib.metadata import entry_points
+
+    names = set(names)
+    available = entry_points()
+    if hasattr(available, "select"):
+        scripts = available.select(group="console_scripts")
+    else:
+        scripts = available.get("console_scripts", [])
+
+    found = {}
+    for entry in scripts:
+        if entry.name in names and entry.name not in found:
+            found[entry.name] = entry.value
+
+    return found
+
+
+def load_entry_point(value):
+    """
+    Import the callable of an entry point.
+
+    Arguments:
+        value (string): Entry point value like ``package.module:object.attribute``.
+
+    Returns:
+        callable: The entry point callable.
+    """
+    module_name, _, attributes = value.partition(":")
+    target = importlib.import_module(module_name.strip())
+
+    for attribute in attributes.split("[", 1)[0].strip().split("."):
+        if attribute:
+            target = getattr(target, attribute)
+
+    return target
+
+
+def get_exit_code(status):
+    """
+    Convert a process wait status to an exit code.
+
+    Arguments:
+        status (integer): Wait status from ``os.waitpid()``.
+
+    Returns:
+        integer: Exit code or negative signal number if process has been killed.
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+
+    return os.WEXITSTATUS(status)
+
+
+class ForkServer:
+    """
+    A background process which imports modules then forks a child for each run
+    request.
+
+    Server communicates through a socket pair so only its parent process can talk to
+    it. Requests are served one after the other.
+
+    Keyword Arguments:
+        preload (iterable): Module names to import in server.
+    """
+    def __init__(self, preload=None):
+        self.preload = list(preload or [])
+        self.pid = None
+        self.sock = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        """
+        Returns:
+            boolean: True if server has been started and has not stopped or died.
+        """
+        if self.pid is None:
+            return False
+
+        try:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+        except ChildProcessError:
+            pid = self.pid
+
+        if pid:
+            # Server has died, it is reaped so it can be started again
+            self.sock.close()
+            self.sock = None
+            self.pid = None
+            return False
+
+        return True
+
+    def start(self):
+        """
+        Fork the server process.
+        """
+        if self.running:
+            return
+
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+
+        with _FORK_LOCK:
+            pid = os.fork()
+            if pid == 0:
+                parent.close()
+                # Do not hold pipe ends of running commands or sockets of other
+                # servers, their readers would wait forever for their end
+                for fd in _PIPE_FDS:
+                    os.close(fd)
+                for server in list(_SERVERS):
+                    if server.sock is not None:
+                        server.sock.close()
+                code = 1
+                try:
+                    code = self.serve(child)
+                finally:
+                    os._exit(code)
+
+            child.close()
+            self.pid = pid
+            self.sock = parent
+            _SERVERS.add(self)
+
+    def stop(self):
+        """
+        Stop the server process.
+        """
+        if self.pid is None:
+            return
+
+        self.sock.close()
+        try:
+            os.waitpid(self.pid, 0)
+        except ChildProcessError:
+            pass
+
+        self.sock = None
+        self.pid = None
+
+    def serve(self, sock):
+        """
+        Import modules then serve requests until socket is closed.
+
+        Arguments:
+            sock (socket.socket): Server side of the socket pair.
+
+        Returns:
+            integer: Server exit code.
+        """
+        for name in self.preload:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+
+        while True:
+            fds = []
+            try:
+                payload, fds = recv_message(sock)
+            except (OSError, ConnectionError, ValueError):
+                return 0
+
+            try:
+                pid = os.fork()
+                if pid == 0:
+                    sock.close()
+                    code = 1
+                    try:
+                        code = self.run_child(payload, fds)
+                    finally:
+                        os._exit(code)
+
+                for fd in fds:
+                    os.close(fd)
+                fds = []
+
+                pid, status = os.waitpid(pid, 0)
+                sock.sendall(HEADER.pack(get_exit_code(status)))
+            except OSError:
+                return 1
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+    def run_child(self, payload, fds):
+        """
+        Run a request in a forked child process.
+
+        Arguments:
+            payload (dict): Request with ``argv``, ``entry_point``, ``module``,
+                ``env`` and ``cwd`` items.
+            fds (list): Standard file descriptors to use.
+
+        Returns:
+            integer: Exit code.
+        """
+        for target, fd in zip(STANDARD_FDS, fds):
+            if fd != target:
+                os.dup2(fd, target)
+                os.close(fd)
+
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False, buffering=1)
+
+        os.environ.clear()
+        os.environ.update(payload["env"])
+        os.chdir(payload["cwd"])
+        sys.argv = list(payload["argv"])
+
+        code = 0
+        try:
+            if payload.get("module"):
+                import runpy
+
+                # A module imported from server preload would be executed from
+                # its already imported copy
+                name = payload["module"]
+                if not hasattr(sys.modules.get(name), "__path__"):
+                    sys.modules.pop(name, None)
+
+                sys.argv[0] = name
+                runpy.run_module(payload["module"], run_name="__main__", alter_sys=True)
+            else:
+                result = load_entry_point(payload["entry_point"])()
+                code = result if isinstance(result, int) else (0 if not result else 1)
+                if result and not isinstance(result, int):
+                    sys.stderr.write(str(result) + "\n")
+        except SystemExit as exc:
+            if exc.code is None:
+                code = 0
+            elif isinstance(exc.code, int):
+                code = exc.code
+            else:
+                sys.stderr.write(str(exc.code) + "\n")
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                # Like when a tool has closed its standard output
+                pass
+
+        return code
+
+    def run(self, argv, entry_point=None, module=None, env=None, cwd=None,
+            stdin=0, stdout=1, stderr=2):
+        """
+        Run a command from a fork of the server.
+
+        Arguments:
+            argv (list): Command arguments, including program.
+
+        Keyword Arguments:
+            entry_point (string): Entry point to call like ``module:function``.
+            module (string): Module to run as ``__main__``, used instead of entry
+                point.
+            env (dict): Environment variables. Default to ``os.environ``.
+            cwd (string): Working directory. Default to current directory.
+            stdin (integer): File descriptor for standard input.
+            stdout (integer): File descriptor for standard output.
+            stderr (integer): File descriptor for standard error.
+
+        Returns:
+            integer: Exit code.
+        """
+        payload = {
+            "argv": list(argv),
+            "entry_point": entry_point,
+            "module": module,
+            "env": dict(os.environ if env is None else env),
+            "cwd": cwd or os.getcwd(),
+        }
+
+        with self._lock:
+            self.start()
+
+            try:
+                send_message(self.sock, payload, fds=(stdin, stdout, stderr))
+            except OSError:
+                # Server has died since last check, request has not been sent so
+                # it is safe to send it again to a new server
+                self.stop()
+                self.start()
+                send_message(self.sock, payload, fds=(stdin, stdout, stderr))
+
+            data = b""
+            while len(data) < HEADER.size:
+                chunk = self.sock.recv(HEADER.size - len(data))
+                if not chunk:
+                    self.stop()
+                    raise ConnectionError("Fork server connection has been lost")
+                data += chunk
+
+        return HEADER.unpack(data)[0]
+
+
+class ForkServerExecutor:
+    """
+    Executor for ``MakevokeBase.run()`` which runs Python tools from a fork server.
+
+    Keyword Arguments:
+        programs (iterable): Console script names to accept. Default to
+            ``DEFAULT_PROGRAMS``.
+        modules (iterable): Module names to accept with ``python -m``. Default to
+            the same as programs.
+        preload (iterable): Module names to import in server. Default to modules of
+            accepted entry points and modules.
+        scripts_dir (string): Directory of console scripts for current environment.
+            Default to the ``scripts`` directory from ``sysconfig``.
+    """
+    def __init__(self, programs=None, modules=None, preload=None, scripts_dir=None):
+        self.programs = list(DEFAULT_PROGRAMS if programs is None else programs)
+        self.modules = list(self.programs if modules is None else modules)
+        self.preload = preload
+        self.scripts_dir = os.path.realpath(
+            scripts_dir or sysconfig.get_path("scripts")
+        )
+        self.interpreter = sys.executable
+
+        self._entry_points = None
+        self._server = None
+
+    @property
+    def entry_points(self):
+        """
+        Returns:
+            dict: Entry points of accepted installed programs, resolved once.
+        """
+        if self._entry_points is None:
+            self._entry_points = get_console_scripts(self.programs)
+
+        return self._entry_points
+
+    @property
+    def server(self):
+        """
+        Returns:
+            ForkServer: Server, created on first access.
+        """
+        if self._server is None:
+            preload = self.preload
+            if preload is None:
+                preload = [
+                    value.partition(":")[0].strip()
+                    for value in self.entry_points.values()
+                ] + [name.partition(".")[0] for name in self.modules]
+            self._server = ForkServer(preload=preload)
+            atexit.register(self._server.stop)
+
+        return self._server
+
+    def close(self):
+        """
+        Stop server if it has been started.
+        """
+        if self._server is not None:
+            self._server.stop()
+
+    def resolve_program(self, program):
+        """
+        Resolve a program to its path.
+
+        Arguments:
+            program (string): Program name or path.
+
+        Returns:
+            string: Absolute path, symbolic links are not resolved since the
+            environment of an interpreter depends on the path it is run from. None
+            if program is not found.
+        """
+        if os.path.dirname(program):
+            path = program
+        else:
+            from .executables import get_resolver
+
+            path = get_resolver().resolve_names([program])[program]
+
+        return os.path.abspath(path) if path else None
+
+    def is_interpreter(self, path):
+        """
+        Check if a path runs the current interpreter in the current environment.
+
+        A virtual environment interpreter is usually a symbolic link to a base
+        interpreter which runs with other packages, so it is the same one only when
+        it is also from the directory of current interpreter.
+
+        Arguments:
+            path (string): Absolute interpreter path.
+
+        Returns:
+            boolean: True if path runs current interpreter.
+        """
+        return (
+            os.path.realpath(os.path.dirname(path)) ==
+            os.path.realpath(os.path.dirname(self.interpreter)) and
+            os.path.realpath(path) == os.path.realpath(self.interpreter)
+        )
+
+    def parse(self, command):
+        """
+        Parse a command line to find how to run it.
+
+        Arguments:
+            command (string): Command line.
+
+        Returns:
+            dict: Keyword arguments for ``ForkServer.run()`` or None if command is
+            not accepted.
+        """
+        if not is_available() or SHELL_SYNTAX.search(command):
+            return None
+
+        argv = shlex.split(command)
+        if not argv:
+            return None
+
+        name = os.path.basename(argv[0])
+        path = self.resolve_program(argv[0])
+        if path is None:
+            return None
+
+        if (
+            name in self.entry_points and
+            os.path.realpath(os.path.dirname(path)) == self.scripts_dir
+        ):
+            return {"argv": argv, "entry_point": self.entry_points[name]}
+
+        if (
+            self.is_interpreter(path) and
+            len(argv) >= 3 and
+            argv[1] == "-m" and
+            argv[2] in self.modules
+        ):
+            return {"argv": [argv[2]] + argv[3:], "module": argv[2]}
+
+        return None
+
+    def accepts(self, command, **kwargs):
+        """
+        Check if executor can run a command.
+
+        Arguments:
+            command (string): Command line.
+            **kwargs: Run options for ``invoke``, only ``hide``, ``warn``,
+                ``echo`` and ``env`` are supported.
+
+        Returns:
+            boolean: True if command is accepted.
+        """
+        if any(key not in SUPPORTED_OPTIONS for key in kwargs):
+            return False
+
+        return self.parse(command) is not None
+
+    def run(self, inv, command, hide=None, warn=False, echo=False, env=None):
+        """
+        Run an accepted command like ``invoke`` would.
+
+        Unlike ``invoke``, standard input is not forwarded, command reads it from
+        ``/dev/null``.
+
+        Arguments:
+            inv (invoke): Invoke instance, only used for its configuration.
+            command (string): Command line.
+
+        Keyword Arguments:
+            hide (boolean or string): Same as ``invoke`` option to hide outputs:
+                ``out``, ``err``, ``both`` or True.
+            warn (boolean): If True, a failure does not raise an exception.
+            echo (boolean): If True, print command before running it.
+            env (dict): Environment variables to add.
+
+        Returns:
+            invoke.runners.Result: Result with captured outputs and exit code.
+        """
+        options = self.parse(command)
+
+        if hide in (True, "both"):
+            hidden = ("stdout", "stderr")
+        elif hide in ("out", "stdout"):
+            hidden = ("stdout",)
+        elif hide in ("err", "stderr"):
+            hidden = ("stderr",)
+        else:
+            hidden = ()
+
+        if echo:
+            print("\033[1;37m{}\033[0m".format(command))
+
+        environ = dict(os.environ)
+        environ.update(env or {})
+
+        # Server must be forked before pipes are created so it does not hold them
+        self.server.start()
+
+        captured = {}
+        readers = []
+        fds = []
+        for name, stream in (("stdout", sys.stdout), ("stderr", sys.stderr)):
+            read_fd, write_fd = _open_pipe()
+            fds.append(write_fd)
+            readers.append(threading.Thread(
+                target=self._relay,
+                args=(read_fd, name, None if name in hidden else stream, captured),
+                daemon=True,
+            ))
+
+        for reader in readers:
+            reader.start()
+
+        stdin = os.open(os.devnull, os.O_RDONLY)
+        try:
+            exited = self.server.run(
+                stdin=stdin, stdout=fds[0], stderr=fds[1], env=environ, **options
+            )
+        finally:
+            os.close(stdin)
+            for fd in fds:
+                _close_pipe_end(fd)
+            for reader in readers:
+                reader.join()
+
+        result = Result(
+            stdout=captured.get("stdout", ""),
+            stderr=captured.get("stderr", ""),
+            command=command,
+            exited=exited,
+            hide=hidden,
+        )
+
+        if not result.ok and not warn:
+            raise UnexpectedExit(result)
+
+        return result
+
+    @staticmethod
+    def _relay(fd, name, stream, captured):
+        chunks = []
+        try:
+            with open(fd, "rb", closefd=False) as source:
+                while True:
+                    chunk = source.read1(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    if stream is not None:
+                        stream.write(chunk.decode("utf-8", errors="replace"))
+                        stream.flush()
+        finally:
+            _close_pipe_end(fd)
+
+        captured[name] = b"".join(chunks).decode("utf-8", errors="replace")
+
+
+def benchmark(commands, repeat=5, executor=None):
+    """
+    Compare run durations of commands from new processes and from a fork server.
+
+    Arguments:
+        commands (iterable): Command lines to benchmark.
+
+    Keyword Arguments:
+        repeat (integer): Number of runs for each command and way.
+        executor (ForkServerExecutor): Executor to use. Default to a new executor
+            accepting programs from commands.
+
+    Returns:
+        list: For each command, a tuple ``(command, process, forkserver)`` with
+        best durations in seconds, ``forkserver`` is None if command is not
+        accepted.
+    """
+    import subprocess
+    import time
+
+    commands = list(commands)
+    if executor is None:
+        executor = ForkServerExecutor(
+            programs=[os.path.basename(shlex.split(item)[0]) for item in commands]
+        )
+
+    results = []
+    try:
+        for command in commands:
+            durations = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                subprocess.run(
+                    command, shell=True, stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                durations.append(time.perf_counter() - start)
+            process = min(durations)
+
+            forked = None
+            if executor.accepts(command, hide=True, warn=True):
+                # Warm up server before timing
+                executor.run(None, command, hide=True, warn=True)
+                durations = []
+                for i in range(repeat):
+                    start = time.perf_counter()
+                    executor.run(None, command, hide=True, warn=True)
+                    durations.append(time.perf_counter() - start)
+                forked = min(durations)
+
+            results.append((command, process, forked))
+    finally:
+        executor.close()
+
+    return results
+
+
+def main(argv=None):
+    """
+    Benchmark entrypoint.
+
+    Keyword Arguments:
+        argv (list): Commandline arguments. Default to ``sys.argv`` without the
+            program name.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m makevoke.forkserver",
+        description="Compare durations of command runs from new processes and from "
+                    "a fork server.",
+    )
+    parser.add_argument(
+        "commands",
+        nargs="*",
+        default=["flake8 makevoke", "pytest -q tests"],
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for command, process, forked in benchmark(args.commands, repeat=args.repeat):
+        print("{}\n    process:    {:8.1f}ms\n    forkserver: {}".format(
+            command,
+            process * 1000,
+            "{:8.1f}ms".format(forked * 1000) if forked is not None
+            else "  not accepted",
+        ))
+
+
+if __name__ == "__main__":
+    main()
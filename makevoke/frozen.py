@@ -0,0 +1,486 @@
+"""
+Frozen requirements
+===================
+
+Collect installed versions of package requirements, entirely in process with
+``importlib.metadata``.
+
+Installed distributions are found from a scan of ``sys.path`` directories which is
+cached in a file and only done again when a directory modification time has changed
+(like when a package has been installed or removed).
+
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from importlib import metadata
+from pathlib import Path
+
+from .utils import get_cache_dir
+
+try:
+    from packaging.markers import InvalidMarker, Marker
+except ImportError:
+    Marker = None
+
+
+REQUIREMENT_PATTERN = re.compile(
+    r"^\s*(?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*"
+    r"(?:\[(?P<extras>[^\]]*)\])?"
+    r"[^;]*(?:;(?P<marker>.*))?$"
+)
+EXTRA_MARKER_PATTERN = re.compile(r"""extra\s*==\s*["']([^"']+)["']""")
+DISTRIBUTION_PATTERN = re.compile(
+    r"^(?P<name>.+?)(?:-(?P<version>[^-]+?))?(?:-py[\d.]+)?\.(?:dist|egg)-info$"
+)
+
+
+def normalize_name(name):
+    """
+    Normalize a project name as described in PEP 503.
+
+    Arguments:
+        name (string): Project name.
+
+    Returns:
+        string: Normalized name.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def parse_requirement(requirement):
+    """
+    Parse a requirement string.
+
+    Arguments:
+        requirement (string): Requirement like ``sphinx>=4.3.0; extra == "doc"``.
+
+    Returns:
+        tuple: Normalized project name, set of requested extras and environment
+        marker string (or None). Returns None if requirement can not be parsed.
+    """
+    match = REQUIREMENT_PATTERN.match(requirement)
+    if match is None:
+        return None
+
+    extras = {
+        normalize_name(item.strip())
+        for item in (match.group("extras") or "").split(",")
+        if item.strip()
+    }
+    marker = (match.group("marker") or "").strip() or None
+
+    return normalize_name(match.group("name")), extras, marker
+
+
+def evaluate_marker(marker, extras=()):
+    """
+    Evaluate a requirement environment marker.
+
+    If ``packaging`` is installed, markers are fully evaluated. Else only the
+    ``extra`` conditions are evaluated and any other condition is assumed to be true.
+
+    Arguments:
+        marker (string): Environment marker.
+
+    Keyword Arguments:
+        extras (iterable): Enabled extra names.
+
+    Returns:
+        boolean: True if requirement applies.
+    """
+    if not marker:
+        return True
+
+    extras = set(extras)
+
+    if Marker is not None:
+        try:
+            compiled = Marker(marker)
+        except InvalidMarker:
+            return False
+
+        return any(
+            compiled.evaluate({"extra": extra})
+            for extra in sorted(extras) + [""]
+        )
+
+    required = {normalize_name(item) for item in EXTRA_MARKER_PATTERN.findall(marker)}
+
+    return not required or bool(required & extras)
+
+
+def get_distribution(name, index=None):
+    """
+    Get an installed distribution.
+
+    Arguments:
+        name (string): Project name.
+
+    Keyword Arguments:
+        index (InstalledIndex): Index of installed packages used to locate
+            distribution metadata directly. If not given or if name is not in index,
+            distribution is searched with ``importlib.metadata``.
+
+    Returns:
+        importlib.metadata.Distribution: Distribution or None if not installed.
+    """
+    if index is not None:
+        package = index.get_packages().get(normalize_name(name))
+        if package is not None:
+            return metadata.PathDistribution(Path(package["path"]))
+
+    try:
+        return metadata.distribution(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def get_requires(name, index=None):
+    """
+    Get requirement strings of an installed distribution.
+
+    Arguments:
+        name (string): Project name.
+
+    Keyword Arguments:
+        index (InstalledIndex): Index of installed packages.
+
+    Returns:
+        list: Requirement strings or None if distribution is not installed.
+    """
+    distribution = get_distribution(name, index=index)
+    if distribution is None:
+        return None
+
+    return distribution.requires or []
+
+
+def get_extras(name, index=None):
+    """
+    Get extra names declared from an installed distribution.
+
+    Arguments:
+        name (string): Project name.
+
+    Keyword Arguments:
+        index (InstalledIndex): Index of installed packages.
+
+    Returns:
+        list: Normalized extra names.
+    """
+    distribution = get_distribution(name, index=index)
+    if distribution is None:
+        return []
+
+    return [
+        normalize_name(item)
+        for item in distribution.metadata.get_all("Provides-Extra") or []
+    ]
+
+
+def resolve_requirements(package_name, extras=None, transitive=True, index=None):
+    """
+    Resolve requirements of an installed package.
+
+    Arguments:
+        package_name (string): Package name.
+
+    Keyword Arguments:
+        extras (iterable): Extra names to include requirements from. Default to None
+            to include every extras.
+        transitive (boolean): If True, requirements of requirements are resolved
+            too, with their own requested extras. Default to True.
+        index (InstalledIndex): Index of installed packages.
+
+    Returns:
+        dict: Requested extras (as a set) indexed on normalized requirement names,
+        package itself is not included.
+    """
+    if extras is None:
+        extras = get_extras(package_name, index=index)
+
+    root = normalize_name(package_name)
+    resolved = {}
+    queue = [(package_name, {normalize_name(item) for item in extras})]
+    visited = set()
+
+    while queue:
+        name, enabled = queue.pop(0)
+        key = (normalize_name(name), frozenset(enabled))
+        if key in visited:
+            continue
+        visited.add(key)
+
+        for requirement in get_requires(name, index=index) or []:
+            parsed = parse_requirement(requirement)
+            if parsed is None:
+                continue
+
+            requirement_name, requested, marker = parsed
+            if requirement_name == root or not evaluate_marker(marker, enabled):
+                continue
+
+            known = resolved.setdefault(requirement_name, set())
+            known.update(requested)
+
+            if transitive:
+                queue.append((requirement_name, requested))
+
+    return resolved
+
+
+class InstalledIndex:
+    """
+    Index of installed distributions from a scan of directories.
+
+    Scan results are cached in a file, each directory is scanned again only if its
+    modification time has changed.
+
+    Keyword Arguments:
+        paths (list): Directories to scan. Default to ``sys.path``.
+        cache_dir (string): Directory where to store cache file. Default to directory
+            from ``makevoke.utils.get_cache_dir()``.
+    """
+    VERSION = 2
+
+    def __init__(self, paths=None, cache_dir=None):
+        self.paths = [
+            os.path.abspath(path or os.curdir)
+            for path in (sys.path if paths is None else paths)
+        ]
+        self.cache_dir = cache_dir or get_cache_dir()
+
+        key = hashlib.sha1(
+            "\n".join([sys.executable] + self.paths).encode("utf-8")
+        ).hexdigest()[:16]
+        self.cache_path = os.path.join(
+            self.cache_dir,
+            "installed-{}.json".format(key),
+        )
+
+        self.scanned = 0
+        self._packages = None
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+
+        return data.get("directories", {})
+
+    def _write_cache(self, directories):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump({"version": self.VERSION, "directories": directories}, fp)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def read_version(path):
+        """
+        Read version from a distribution metadata directory.
+
+        Arguments:
+            path (string): Path to a ``.dist-info`` or ``.egg-info`` directory.
+
+        Returns:
+            string: Version or None if not found.
+        """
+        for filename in ("METADATA", "PKG-INFO"):
+            try:
+                with open(os.path.join(path, filename), encoding="utf-8") as fp:
+                    for line in fp:
+                        if line.startswith("Version:"):
+                            return line.split(":", 1)[1].strip()
+                        if not line.strip():
+                            break
+            except OSError:
+                continue
+
+        return None
+
+    def scan_directory(self, directory):
+        """
+        Scan a directory for distribution metadata directories.
+
+        Arguments:
+            directory (string): Directory path.
+
+        Returns:
+            dict: Package informations (``name``, ``version`` and metadata
+            ``path``) indexed on normalized project names.
+        """
+        self.scanned += 1
+        packages = {}
+
+        try:
+            iterator = os.scandir(directory)
+        except OSError:
+            return packages
+
+        with iterator:
+            for entry in iterator:
+                if not entry.name.endswith((".dist-info", ".egg-info")):
+                    continue
+
+                match = DISTRIBUTION_PATTERN.match(entry.name)
+                if match is None:
+                    continue
+
+                version = match.group("version")
+                if not version or entry.name.endswith(".egg-info"):
+                    version = self.read_version(entry.path) or version
+
+                name = match.group("name")
+                key = normalize_name(name)
+                if version and key not in packages:
+                    packages[key] = {
+                        "name": name,
+                        "version": version,
+                        "path": entry.path,
+                    }
+
+        return packages
+
+    def get_packages(self):
+        """
+        Get installed packages, following ``sys.path`` precedence.
+
+        Returns:
+            dict: Package informations indexed on normalized project names, see
+            ``scan_directory()``.
+        """
+        if self._packages is not None:
+            return self._packages
+
+        cached = self._read_cache()
+        directories = {}
+        changed = False
+
+        for path in self.paths:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            entry = cached.get(path)
+            if entry is None or entry.get("mtime_ns") != mtime_ns:
+                entry = {"mtime_ns": mtime_ns, "packages": self.scan_directory(path)}
+                changed = True
+
+            directories[path] = entry
+
+        if changed or set(directories) != set(cached):
+            self._write_cache(directories)
+
+        packages = {}
+        for path in self.paths:
+            for name, package in directories.get(path, {}).get("packages", {}).items():
+                packages.setdefault(name, package)
+
+        self._packages = packages
+
+        return packages
+
+
+def get_canonical_name(package):
+    """
+    Get project name as declared in distribution metadata, like ``pip freeze``
+    does, since wheels normalize the name of their metadata directory.
+
+    Arguments:
+        package (dict): Package informations from ``InstalledIndex``.
+
+    Returns:
+        string: Project name from metadata, or from metadata directory name if
+        metadata can not be read.
+    """
+    try:
+        name = metadata.PathDistribution(Path(package["path"])).metadata.get("Name")
+    except (OSError, TypeError):
+        name = None
+
+    return name or package["name"]
+
+
+def get_frozen_requirements(package_name, extras=None, transitive=True,
+                            ignore=None, index=None):
+    """
+    Get pinned versions of installed requirements for a package.
+
+    Arguments:
+        package_name (string): Package name.
+
+    Keyword Arguments:
+        extras (iterable): Extra names to include requirements from. Default to None
+            to include every extras.
+        transitive (boolean): If True, requirements of requirements are included
+            too. Default to True.
+        ignore (iterable): Project names to ignore.
+        index (InstalledIndex): Index of installed packages. Default to a new index
+            for ``sys.path``.
+
+    Returns:
+        list: Pinned requirements like ``Name==version`` sorted on names, with names
+        from distribution metadata. Requirements which are not installed are
+        ignored.
+    """
+    index = index or InstalledIndex()
+    installed = index.get_packages()
+    ignore = {normalize_name(item) for item in (ignore or [])}
+
+    requirements = resolve_requirements(
+        package_name,
+        extras=extras,
+        transitive=transitive,
+        index=index,
+    )
+
+    pinned = [
+        "{}=={}".format(
+            get_canonical_name(installed[name]), installed[name]["version"]
+        )
+        for name in requirements
+        if name not in ignore and name in installed
+    ]
+
+    return sorted(pinned, key=str.lower)
+
+
+def write_frozen_requirements(package_name, filename="frozen.txt", **kwargs):
+    """
+    Write a file of frozen requirement versions for current version of a package.
+
+    Arguments:
+        package_name (string): Package name.
+
+    Keyword Arguments:
+        filename (string): Destination file path. Default to ``frozen.txt``.
+        **kwargs: Any other keyword arguments are passed to
+            ``get_frozen_requirements()``.
+
+    Returns:
+        string: Destination file path.
+    """
+    version = metadata.version(package_name)
+
+    lines = [
+        "# Frozen requirement versions from '{}' installation".format(version)
+    ] + get_frozen_requirements(package_name, **kwargs)
+
+    with open(filename, "w") as fp:
+        fp.write("\n".join(lines))
+
+    return filename
@@ -0,0 +1,770 @@
+"""
+History
+=======
+
+Persistent history of command and task runs in a SQLite database, with latency
+statistics and slowdown detection.
+
+History is opt-in, enabled with class attribute ``HISTORY`` or environment variable
+``MAKEVOKE_HISTORY`` (which takes precedence). Value is either True (or ``1`` from
+environment) to use the default database in Makevoke cache directory, or a database
+path.
+
+Once enabled, every ``MakevokeBase.run()`` is recorded and so is every task
+decorated with ``MakevokeBase.record_task()``. A record holds the rendered command
+(or task name), the command template and its identifier, duration, CPU time, exit
+code and Git revision of current directory.
+
+CPU time is the one from current process and its children during run, it is only
+accurate when runs are not concurrent.
+
+Statistics and regressions can be reported with: ::
+
+    python -m makevoke.history stats
+    python -m makevoke.history regressions
+
+Records older than a retention delay are compacted into daily summaries, at most
+once a day when a database is opened, so database stays small.
+
+"""
+import datetime
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+HISTORY_ENV_VAR = "MAKEVOKE_HISTORY"
+
+HISTORY_FILENAME = "history.sqlite3"
+
+# Delay in seconds before records are compacted into daily summaries
+RETENTION = 30 * 86400
+
+# Minimum delay in seconds between automatic compactions
+COMPACT_INTERVAL = 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    template TEXT NOT NULL,
+    template_id TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    cpu_time REAL NOT NULL,
+    exited INTEGER NOT NULL,
+    revision TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_template ON runs (template_id, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE TABLE IF NOT EXISTS daily (
+    template_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    template TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    p50 REAL NOT NULL,
+    p95 REAL NOT NULL,
+    p99 REAL NOT NULL,
+    cpu_time REAL NOT NULL,
+    PRIMARY KEY (template_id, day)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def get_template_id(template):
+    """
+    Arguments:
+        template (string): Command template or task name.
+
+    Returns:
+        string: Short identifier for template.
+    """
+    return hashlib.sha1(template.encode("utf-8")).hexdigest()[:16]
+
+
+def percentile(values, q):
+    """
+    Compute a percentile with linear interpolation.
+
+    Arguments:
+        values (list): Sorted values.
+        q (float): Percentile from 0 to 100.
+
+    Returns:
+        float: Percentile value, None for empty values.
+    """
+    if not values:
+        return None
+
+    position = (len(values) - 1) * q / 100.0
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def mann_whitney(baseline, recent):
+    """
+    One sided Mann-Whitney U test that recent values are greater than baseline ones,
+    with normal approximation and ties correction.
+
+    Arguments:
+        baseline (list): Baseline values.
+        recent (list): Recent values.
+
+    Returns:
+        float: p-value, 1.0 when it can not be computed.
+    """
+    n1, n2 = len(recent), len(baseline)
+    if not n1 or not n2:
+        return 1.0
+
+    merged = sorted(
+        [(value, 1) for value in recent] + [(value, 0) for value in baseline]
+    )
+
+    # Average ranks on ties
+    ranks = [0.0] * len(merged)
+    ties = 0.0
+    i = 0
+    while i < len(merged):
+        j = i
+        while j + 1 < len(merged) and merged[j + 1][0] == merged[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2.0 + 1
+        size = j - i + 1
+        ties += size ** 3 - size
+        i = j + 1
+
+    rank_sum = sum(rank for rank, item in zip(ranks, merged) if item[1])
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    total = n1 + n2
+    variance = n1 * n2 / 12.0 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+
+    z = (u - n1 * n2 / 2.0) / math.sqrt(variance)
+
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def find_git_dir(start):
+    """
+    Find Git directory of a working tree.
+
+    Arguments:
+        start (string): Directory to search from, then in its parents.
+
+    Returns:
+        string: Git directory path or None if not found.
+    """
+    current = os.path.abspath(start)
+    while True:
+        candidate = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return candidate
+        if os.path.isfile(candidate):
+            # Worktrees and submodules have a file pointing to Git directory
+            with open(candidate) as fp:
+                content = fp.read().strip()
+            if content.startswith("gitdir:"):
+                return os.path.join(current, content[len("gitdir:"):].strip())
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def get_revision(start="."):
+    """
+    Get current Git revision by reading references, without running Git.
+
+    Keyword Arguments:
+        start (string): Directory in working tree.
+
+    Returns:
+        string: Commit identifier or None if unknown.
+    """
+    git_dir = find_git_dir(start)
+    if git_dir is None:
+        return None
+
+    try:
+        with open(os.path.join(git_dir, "HEAD")) as fp:
+            head = fp.read().strip()
+    except OSError:
+        return None
+
+    if not head.startswith("ref:"):
+        return head or None
+
+    ref = head[len("ref:"):].strip()
+    # Linked worktrees keep their references in common directory
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir")) as fp:
+            common_dir = os.path.join(git_dir, fp.read().strip())
+    except OSError:
+        pass
+
+    for directory in (git_dir, common_dir):
+        try:
+            with open(os.path.join(directory, *ref.split("/"))) as fp:
+                return fp.read().strip() or None
+        except OSError:
+            continue
+
+    try:
+        with open(os.path.join(common_dir, "packed-refs")) as fp:
+            for line in fp:
+                parts = line.strip().split(" ", 1)
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except OSError:
+        pass
+
+    return None
+
+
+def get_default_path():
+    """
+    Returns:
+        string: Default database path in Makevoke cache directory.
+    """
+    from .utils import get_cache_dir
+
+    return os.path.join(get_cache_dir(), HISTORY_FILENAME)
+
+
+def get_history_path(klass):
+    """
+    Get history database path enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+
+    Returns:
+        string: Database path or None if history is disabled.
+    """
+    value = os.environ.get(HISTORY_ENV_VAR)
+    if value is None:
+        value = getattr(klass, "HISTORY", None)
+    elif value.lower() in ("", "0", "false", "no", "off"):
+        value = None
+    elif value.lower() in ("1", "true", "yes", "on"):
+        value = True
+
+    if not value:
+        return None
+
+    if value is True:
+        return get_default_path()
+
+    return str(value)
+
+
+def is_enabled(klass):
+    """
+    Check quickly if history may be enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+
+    Returns:
+        boolean: True if history may be enabled.
+    """
+    return bool(os.environ.get(HISTORY_ENV_VAR) or getattr(klass, "HISTORY", None))
+
+
+class Regression:
+    """
+    A significant slowdown of a command.
+
+    Attributes:
+        template (string): Command template or task name.
+        template_id (string): Template identifier.
+        baseline (float): Median duration from baseline.
+        recent (float): Median duration from recent runs.
+        ratio (float): Recent median divided by baseline median.
+        p_value (float): Probability the slowdown is only noise.
+    """
+    def __init__(self, template, template_id, baseline, recent, p_value):
+        self.template = template
+        self.template_id = template_id
+        self.baseline = baseline
+        self.recent = recent
+        self.ratio = recent / baseline if baseline else float("inf")
+        self.p_value = p_value
+
+    def __repr__(self):
+        return "<Regression {!r} x{:.2f} p={:.4f}>".format(
+            self.template, self.ratio, self.p_value
+        )
+
+
+class RunHistory:
+    """
+    Run history database.
+
+    Database is created if it does not exist yet and old records are compacted if
+    last compaction is older than ``COMPACT_INTERVAL``.
+
+    Arguments:
+        path (string): Database file path.
+
+    Keyword Arguments:
+        retention (float): Delay in seconds before records are compacted.
+        auto_compact (boolean): If False, records are never compacted on open.
+    """
+    def __init__(self, path, retention=RETENTION, auto_compact=True):
+        self.path = str(path)
+        self.retention = retention
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False, isolation_level=None,
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        if auto_compact:
+            self.maybe_compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, kind, name, template, duration, cpu_time, exited,
+               revision=None, started=None):
+        """
+        Append a run record.
+
+        Arguments:
+            kind (string): ``command`` or ``task``.
+            name (string): Rendered command or task name.
+            template (string): Command template or task name.
+            duration (float): Wall clock duration in seconds.
+            cpu_time (float): CPU time in seconds.
+            exited (integer): Exit code.
+
+        Keyword Arguments:
+            revision (string): Git revision.
+            started (float): Start timestamp. Default to now minus duration.
+        """
+        if started is None:
+            started = time.time() - duration
+
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO runs (kind, name, template, template_id, started, "
+                "duration, cpu_time, exited, revision) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind, name, template, get_template_id(template), started,
+                    duration, cpu_time, exited, revision,
+                ),
+            )
+
+    def get_durations(self, since=None):
+        """
+        Get durations of records, grouped on template.
+
+        Keyword Arguments:
+            since (float): Only use records started from this timestamp.
+
+        Returns:
+            dict: Tuple ``(template, durations)`` indexed on template identifiers,
+            with durations in chronological order.
+        """
+        query = "SELECT template_id, template, duration FROM runs"
+        params = ()
+        if since is not None:
+            query += " WHERE started >= ?"
+            params = (since,)
+        query += " ORDER BY template_id, started, id"
+
+        groups = {}
+        with self._lock:
+            for template_id, template, duration in self.connection.execute(
+                query, params
+            ):
+                if template_id not in groups:
+                    groups[template_id] = (template, [])
+                groups[template_id][1].append(duration)
+
+        return groups
+
+    def stats(self, since=None):
+        """
+        Compute duration statistics of each command.
+
+        Keyword Arguments:
+            since (float): Only use records started from this timestamp.
+
+        Returns:
+            list: A dict for each template with items ``template``,
+            ``template_id``, ``count``, ``p50``, ``p95`` and ``p99``, sorted on
+            templates.
+        """
+        results = []
+        for template_id, (template, durations) in self.get_durations(since).items():
+            durations = sorted(durations)
+            results.append({
+                "template": template,
+                "template_id": template_id,
+                "count": len(durations),
+                "p50": percentile(durations, 50),
+                "p95": percentile(durations, 95),
+                "p99": percentile(durations, 99),
+            })
+
+        return sorted(results, key=lambda item: item["template"])
+
+    def regressions(self, window=10, baseline=50, min_samples=5, alpha=0.01,
+                    min_ratio=1.1):
+        """
+        Find commands whose recent runs are significantly slower than the ones
+        before.
+
+        Recent runs are compared to a rolling baseline made of runs just before
+        them with a one sided Mann-Whitney U test, which does not assume durations
+        are normally distributed.
+
+        Keyword Arguments:
+            window (integer): Number of recent runs.
+            baseline (integer): Maximum number of runs before recent ones for the
+                baseline.
+            min_samples (integer): Minimum number of runs in both recent runs and
+                baseline.
+            alpha (float): Significance level.
+            min_ratio (float): Minimum ratio of medians to report, so tiny
+                significant slowdowns are ignored.
+
+        Returns:
+            list: ``Regression`` objects sorted from the worst ratio.
+        """
+        found = []
+        for template_id, (template, durations) in self.get_durations().items():
+            recent = durations[-window:]
+            reference = durations[-window - baseline:-window]
+            if len(recent) < min_samples or len(reference) < min_samples:
+                continue
+
+            p_value = mann_whitney(reference, recent)
+            regression = Regression(
+                template,
+                template_id,
+                percentile(sorted(reference), 50),
+                percentile(sorted(recent), 50),
+                p_value,
+            )
+            if p_value < alpha and regression.ratio >= min_ratio:
+                found.append(regression)
+
+        return sorted(found, key=lambda item: item.ratio, reverse=True)
+
+    def compact(self, now=None):
+        """
+        Replace records older than retention delay with daily summaries.
+
+        Keyword Arguments:
+            now (float): Current timestamp. Default to now.
+
+        Returns:
+            integer: Number of removed records.
+        """
+        now = time.time() if now is None else now
+        limit = now - self.retention
+
+        with self._lock:
+            # Records are read in the same transaction as they are removed, so
+            # records added meanwhile by another process are not removed without
+            # being summarized
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.connection.execute(
+                    "SELECT template_id, kind, template, started, duration, cpu_time, "
+                    "exited FROM runs WHERE started < ? ORDER BY started",
+                    (limit,),
+                ).fetchall()
+
+                groups = {}
+                for template_id, kind, template, started, duration, cpu, exited in rows:
+                    day = datetime.datetime.fromtimestamp(
+                        started, datetime.timezone.utc
+                    ).strftime("%Y-%m-%d")
+                    group = groups.setdefault(
+                        (template_id, day),
+                        {"kind": kind, "template": template, "durations": [],
+                         "cpu_time": 0.0, "failures": 0},
+                    )
+                    group["durations"].append(duration)
+                    group["cpu_time"] += cpu
+                    group["failures"] += 1 if exited else 0
+
+                for (template_id, day), group in groups.items():
+                    durations = sorted(group["durations"])
+                    # A day may have already been compacted with some of its
+                    # records, summaries are merged from previous ones
+                    previous = self.connection.execute(
+                        "SELECT count, failures, mean, p50, p95, p99, cpu_time "
+                        "FROM daily WHERE template_id = ? AND day = ?",
+                        (template_id, day),
+                    ).fetchone()
+                    count = len(durations)
+                    summary = [
+                        count,
+                        group["failures"],
+                        sum(durations) / count,
+                        percentile(durations, 50),
+                        percentile(durations, 95),
+                        percentile(durations, 99),
+                        group["cpu_time"],
+                    ]
+                    if previous is not None:
+                        total = previous[0] + count
+                        summary = [
+                            total,
+                            previous[1] + summary[1],
+                        ] + [
+                            (previous[i] * previous[0] + summary[i] * count) / total
+                            for i in range(2, 6)
+                        ] + [previous[6] + summary[6]]
+
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO daily (template_id, day, kind, "
+                        "template, count, failures, mean, p50, p95, p99, cpu_time) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [template_id, day, group["kind"], group["template"]] + summary,
+                    )
+
+                self.connection.execute("DELETE FROM runs WHERE started < ?", (limit,))
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    ("compacted", repr(now)),
+                )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+            if rows:
+                self.connection.execute("VACUUM")
+
+        return len(rows)
+
+    def maybe_compact(self, now=None):
+        """
+        Compact records if last compaction is older than ``COMPACT_INTERVAL``.
+
+        Keyword Arguments:
+            now (float): Current timestamp. Default to now.
+
+        Returns:
+            integer: Number of removed records, None if compaction was not due.
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'compacted'"
+            ).fetchone()
+
+        if row is not None and now - float(row[0]) < COMPACT_INTERVAL:
+            return None
+
+        return self.compact(now=now)
+
+    def daily(self, template_id=None):
+        """
+        Get daily summaries of compacted records.
+
+        Keyword Arguments:
+            template_id (string): Only get summaries for this template.
+
+        Returns:
+            list: A dict for each summary, sorted on day.
+        """
+        query = (
+            "SELECT template_id, day, kind, template, count, failures, mean, p50, "
+            "p95, p99, cpu_time FROM daily"
+        )
+        params = ()
+        if template_id is not None:
+            query += " WHERE template_id = ?"
+            params = (template_id,)
+        query += " ORDER BY day, template"
+
+        with self._lock:
+            cursor = self.connection.execute(query, params)
+            columns = [item[0] for item in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+
+def get_history(path):
+    """
+    Get a database opened once for the session.
+
+    Arguments:
+        path (string): Database file path.
+
+    Returns:
+        RunHistory: Opened database.
+    """
+    with _DATABASES_LOCK:
+        if path not in _DATABASES:
+            _DATABASES[path] = RunHistory(path)
+
+        return _DATABASES[path]
+
+
+def get_cpu_time():
+    """
+    Returns:
+        float: CPU time of current process and its terminated children.
+    """
+    times = os.times()
+
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def get_exit_code(error):
+    """
+    Get the exit code a run failed with.
+
+    Arguments:
+        error (Exception): Exception raised from run.
+
+    Returns:
+        integer: Exit code from result or exit exception, else 1.
+    """
+    result = getattr(error, "result", None)
+    if result is not None and getattr(result, "exited", None) is not None:
+        return result.exited
+
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+
+    return 1
+
+
+def record_call(klass, kind, name, template, func, *args, **kwargs):
+    """
+    Call a function and record its run in history enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+        kind (string): ``command`` or ``task``.
+        name (string): Rendered command or task name.
+        template (string): Command template or task name.
+        func (callable): Function to call.
+        *args: Any positional arguments are passed to function.
+        **kwargs: Any keyword arguments are passed to function.
+
+    Returns:
+        object: Function return value.
+    """
+    path = get_history_path(klass)
+    if path is None:
+        return func(*args, **kwargs)
+
+    started = time.time()
+    start = time.perf_counter()
+    cpu_start = get_cpu_time()
+    exited = 0
+    try:
+        value = func(*args, **kwargs)
+        if getattr(value, "exited", None) is not None:
+            exited = value.exited
+        return value
+    except BaseException as error:
+        exited = get_exit_code(error)
+        raise
+    finally:
+        get_history(path).record(
+            kind,
+            name,
+            template,
+            time.perf_counter() - start,
+            get_cpu_time() - cpu_start,
+            exited,
+            revision=get_revision(),
+            started=started,
+        )
+
+
+def main(argv=None):
+    """
+    History report entrypoint.
+
+    Keyword Arguments:
+        argv (list): Commandline arguments. Default to ``sys.argv`` without the
+            program name.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m makevoke.history",
+        description="Report statistics and slowdowns from Makevoke run history.",
+    )
+    parser.add_argument("action", choices=["stats", "regressions", "compact"])
+    parser.add_argument(
+        "--database",
+        default=None,
+        help="Database path. Default to the one enabled from environment.",
+    )
+    parser.add_argument("--days", type=float, default=None,
+                        help="Only use records from these last days for stats.")
+    args = parser.parse_args(argv)
+
+    path = args.database or get_history_path(None) or get_default_path()
+
+    with RunHistory(path, auto_compact=False) as history:
+        if args.action == "stats":
+            since = None
+            if args.days is not None:
+                since = time.time() - args.days * 86400
+            for item in history.stats(since=since):
+                print("{:>8.3f}s {:>8.3f}s {:>8.3f}s {:>6}  {}".format(
+                    item["p50"], item["p95"], item["p99"], item["count"],
+                    item["template"],
+                ))
+        elif args.action == "regressions":
+            for item in history.regressions():
+                print("x{:.2f} {:>8.3f}s -> {:>8.3f}s p={:.4f}  {}".format(
+                    item.ratio, item.baseline, item.recent, item.p_value,
+                    item.template,
+                ))
+        else:
+            print("Compacted {} record(s)".format(history.compact()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""
+Installer
+=========
+
+Install package requirements with Pip only when their declarations have changed.
+
+Dependency declaration files and the interpreter version are fingerprinted and
+recorded in a state file inside the virtual environment once an install succeeded.
+Next installs are skipped while the fingerprint does not change. When it changes,
+only the new or changed requirements are installed from a local wheel cache if
+possible, else a full install is done.
+
+A partial install only builds wheels for requirement lines which are not in the
+recorded state, a changed version pin being a new line. Removed requirements are
+not uninstalled and unchanged lines with a loose specifier like ``foo>=1.0`` are not
+upgraded, use a forced install for that.
+
+"""
+import configparser
+import hashlib
+import json
+import os
+import platform
+import shlex
+import tempfile
+from pathlib import Path
+
+from .utils import file_digest, get_cache_dir
+
+
+# Files which are always fingerprinted if they exist
+DEFAULT_INSTALL_SOURCES = ("setup.cfg", "setup.py", "pyproject.toml")
+
+
+def read_requirements_file(path):
+    """
+    Read requirement lines from a Pip requirements file.
+
+    Arguments:
+        path (string or Path): Requirements file path.
+
+    Returns:
+        tuple: A tuple ``(requirements, options)`` of lists where requirements are
+        the plain requirement lines and options are every other lines (like ``-r``
+        or ``--index-url``).
+    """
+    requirements = []
+    options = []
+
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            line = line.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+
+            (options if line.startswith("-") else requirements).append(line)
+
+    return requirements, options
+
+
+def read_setup_requirements(path, extras=None):
+    """
+    Read requirements declared in a ``setup.cfg`` file.
+
+    Arguments:
+        path (string or Path): Setup configuration file path.
+
+    Keyword Arguments:
+        extras (iterable): Extra names to include requirements from.
+
+    Returns:
+        list: Requirement lines from ``install_requires`` and given extras.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(path, encoding="utf-8")
+
+    def lines(section, option):
+        value = parser.get(section, option, fallback="")
+        return [
+            line.strip() for line in value.splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]
+
+    requirements = lines("options", "install_requires")
+    for extra in extras or []:
+        requirements += lines("options.extras_require", extra)
+
+    return requirements
+
+
+def get_interpreter_version(venv_dir):
+    """
+    Get Python version of a virtual environment.
+
+    Arguments:
+        venv_dir (string or Path): Virtual environment directory.
+
+    Returns:
+        string: Version from the ``pyvenv.cfg`` file of virtual environment if any,
+        else the version of current interpreter.
+    """
+    try:
+        with open(os.path.join(venv_dir, "pyvenv.cfg"), encoding="utf-8") as fp:
+            for line in fp:
+                key, _, value = line.partition("=")
+                if key.strip() in ("version", "version_info"):
+                    return value.strip()
+    except OSError:
+        pass
+
+    return platform.python_version()
+
+
+class InstallPlan:
+    """
+    What an install has to do.
+
+    Attributes:
+        action (string): Either ``skip`` when nothing changed, ``partial`` to only
+            install some requirements or ``full`` to install everything.
+        requirements (list): Requirements to install for a partial install, only
+            the lines which are not in recorded state.
+        editable (boolean): If True, package has to be installed again without its
+            dependencies for a partial install.
+        reason (string): Human readable reason of plan.
+        state (dict): State to record once install succeeded.
+    """
+    def __init__(self, action, state, reason, requirements=None, editable=False):
+        self.action = action
+        self.state = state
+        self.reason = reason
+        self.requirements = requirements or []
+        self.editable = editable
+
+    def __repr__(self):
+        return "<InstallPlan {} {}>".format(self.action, self.requirements)
+
+
+class InstallState:
+    """
+    Fingerprint of dependency declarations and its recorded state file.
+
+    Arguments:
+        venv_dir (string or Path): Virtual environment directory, the state file is
+            stored inside so removing environment removes its state.
+
+    Keyword Arguments:
+        base_dir (string or Path): Directory of package to install. Default to
+            current directory.
+        sources (iterable): Dependency declaration files relative to base directory.
+            Default to ``DEFAULT_INSTALL_SOURCES``.
+        requirements_files (iterable): Pip requirements files relative to base
+            directory.
+        extras (iterable): Package extra names to install.
+    """
+    FILENAME = ".makevoke-install.json"
+    VERSION = 1
+
+    def __init__(self, venv_dir, base_dir=None, sources=None, requirements_files=None,
+                 extras=None):
+        self.venv_dir = Path(venv_dir)
+        self.base_dir = Path(base_dir or ".")
+        self.sources = list(DEFAULT_INSTALL_SOURCES if sources is None else sources)
+        self.requirements_files = list(requirements_files or [])
+        self.extras = sorted(extras or [])
+        self.path = self.venv_dir / self.FILENAME
+
+    def read(self):
+        """
+        Read recorded state.
+
+        Returns:
+            dict: Recorded state or None if there is no valid state file.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return None
+
+        return data
+
+    def write(self, data):
+        """
+        Write state atomically.
+
+        Arguments:
+            data (dict): State to record.
+        """
+        self.venv_dir.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.venv_dir), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(data, fp, indent=4)
+            os.replace(tmp_path, str(self.path))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def collect(self):
+        """
+        Collect current fingerprint and declared requirements.
+
+        Returns:
+            dict: State data.
+        """
+        digests = {}
+        for name in dict.fromkeys(self.sources + self.requirements_files):
+            path = self.base_dir / name
+            digests[name] = file_digest(path) if path.is_file() else None
+
+        requirements = []
+        options = []
+
+        setup_cfg = self.base_dir / "setup.cfg"
+        if setup_cfg.is_file():
+            requirements += read_setup_requirements(setup_cfg, extras=self.extras)
+
+        for name in self.requirements_files:
+            path = self.base_dir / name
+            if path.is_file():
+                file_requirements, file_options = read_requirements_file(path)
+                requirements += file_requirements
+                options += file_options
+
+        state = {
+            "version": self.VERSION,
+            "interpreter": get_interpreter_version(self.venv_dir),
+            "extras": self.extras,
+            "sources": digests,
+            "requirements": list(dict.fromkeys(requirements)),
+            "options": options,
+        }
+        state["fingerprint"] = hashlib.sha256(
+            json.dumps(state, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+        return state
+
+    def plan(self, force=False):
+        """
+        Compare current fingerprint to the recorded one to plan an install.
+
+        Keyword Arguments:
+            force (boolean): If True, always plan a full install.
+
+        Returns:
+            InstallPlan: Install plan.
+        """
+        current = self.collect()
+        recorded = self.read()
+
+        if force:
+            return InstallPlan("full", current, "forced")
+
+        if recorded is None:
+            return InstallPlan("full", current, "no previous install")
+
+        if recorded.get("fingerprint") == current["fingerprint"]:
+            return InstallPlan("skip", current, "requirements are unchanged")
+
+        if recorded.get("interpreter") != current["interpreter"]:
+            return InstallPlan("full", current, "interpreter has changed")
+
+        if recorded.get("extras") != current["extras"]:
+            return InstallPlan("full", current, "extras have changed")
+
+        if recorded.get("options") != current["options"]:
+            return InstallPlan("full", current, "requirement options have changed")
+
+        changed = [
+            name for name, digest in current["sources"].items()
+            if recorded.get("sources", {}).get(name) != digest
+        ]
+        opaque = [name for name in changed if name in ("setup.py", "pyproject.toml")]
+        if opaque:
+            return InstallPlan(
+                "full", current, "{} has changed".format(", ".join(opaque))
+            )
+
+        known = set(recorded.get("requirements", []))
+        requirements = [item for item in current["requirements"] if item not in known]
+
+        return InstallPlan(
+            "partial",
+            current,
+            "{} changed requirement(s)".format(len(requirements)),
+            requirements=requirements,
+            editable="setup.cfg" in changed,
+        )
+
+
+class InstallerAbstract:
+    """
+    This class implements an install method which only runs Pip when dependency
+    declarations have changed.
+
+    Depends on ``MakevokeBase`` and ``PrintOutAbstract`` alike, since commands are
+    run with ``run()`` and messages are printed with printout methods.
+
+    Example: ::
+
+        class Makefile(InstallerAbstract, PrintOutAbstract, MakevokeBase):
+            PIP_BIN = ".venv/bin/pip"
+            ENABLED_CONTEXT_VARS = ["BASE_DIR", "PIP_BIN"]
+
+        @task
+        def install_backend(ctx, force=False):
+            Makefile.install_requirements(
+                ctx, extras=["dev", "quality", "doc"], force=force
+            )
+    """
+    INSTALL_VENV_DIR = Path(".venv")
+    INSTALL_PIP = "{PIP_BIN}"
+    INSTALL_WHEELHOUSE = None
+
+    @classmethod
+    def get_wheelhouse(cls):
+        """
+        Get directory for the local wheel cache.
+
+        Returns:
+            string: Path from ``INSTALL_WHEELHOUSE`` attribute if set, else the
+            ``wheels`` directory from Makevoke cache directory.
+        """
+        if cls.INSTALL_WHEELHOUSE:
+            return str(cls.INSTALL_WHEELHOUSE)
+
+        return os.path.join(get_cache_dir(), "wheels")
+
+    @classmethod
+    def get_install_commands(cls, plan, target=".", requirements_files=None,
+                             pip=None):
+        """
+        Build Pip command lines for an install plan.
+
+        Command lines are meant to be run with ``run()``: Pip command may contain
+        context variable patterns and braces from every other parts (like
+        requirements or paths) are escaped.
+
+        Arguments:
+            plan (InstallPlan): Install plan.
+
+        Keyword Arguments:
+            target (string): Path of package to install in editable mode. Default to
+                current directory.
+            requirements_files (iterable): Pip requirements files relative to target
+                to install for a full install.
+            pip (string): Pip command, it may contain context variable patterns.
+                Default to ``INSTALL_PIP`` attribute.
+
+        Returns:
+            list: Command lines.
+        """
+        pip = pip or cls.INSTALL_PIP
+        wheelhouse = shlex.quote(cls.get_wheelhouse())
+        extras = plan.state["extras"]
+        package = "{}[{}]".format(target, ",".join(extras)) if extras else target
+
+        def command(arguments):
+            return "{} {}".format(
+                pip, arguments.replace("{", "{{").replace("}", "}}")
+            )
+
+        if plan.action == "skip":
+            return []
+
+        if plan.action == "full":
+            arguments = "install --find-links {} -e {}".format(
+                wheelhouse, shlex.quote(package)
+            )
+            for path in requirements_files or []:
+                arguments += " -r {}".format(shlex.quote(os.path.join(target, path)))
+
+            return [command(arguments)]
+
+        commands = []
+        if plan.requirements:
+            requirements = " ".join(shlex.quote(item) for item in plan.requirements)
+            commands.append(command(
+                "wheel --wheel-dir {wh} --find-links {wh} {reqs}".format(
+                    wh=wheelhouse, reqs=requirements
+                )
+            ))
+            commands.append(command(
+                "install --no-index --find-links {wh} {reqs}".format(
+                    wh=wheelhouse, reqs=requirements
+                )
+            ))
+
+        if plan.editable:
+            commands.append(
+                command("install --no-deps -e {}".format(shlex.quote(target)))
+            )
+
+        return commands
+
+    @classmethod
+    def install_requirements(cls, inv, extras=None, target=".", requirements_files=None,
+                             sources=None, venv_dir=None, pip=None, force=False):
+        """
+        Install package and its requirements only if their declarations changed.
+
+        Arguments:
+            inv (invoke): Invoke instance.
+
+        Keyword Arguments:
+            extras (iterable): Package extra names to install.
+            target (string): Path of package to install in editable mode. Default to
+                current directory.
+            requirements_files (iterable): Pip requirements files relative to target
+                to install.
+            sources (iterable): Dependency declaration files relative to target to
+                fingerprint. Default to ``DEFAULT_INSTALL_SOURCES``.
+            venv_dir (string or Path): Virtual environment directory where to record
+                install state. Default to ``INSTALL_VENV_DIR`` attribute.
+            pip (string): Pip command, it may contain context variable patterns.
+                Default to ``INSTALL_PIP`` attribute.
+            force (boolean): If True, always do a full install.
+
+        Returns:
+            InstallPlan: The executed install plan.
+        """
+        state = InstallState(
+            venv_dir or cls.INSTALL_VENV_DIR,
+            base_dir=target,
+            sources=sources,
+            requirements_files=requirements_files,
+            extras=extras,
+        )
+        plan = state.plan(force=force)
+
+        if plan.action == "skip":
+            cls.info("Install skipped, {}".format(plan.reason))
+            return plan
+
+        cls.info("Installing ({}): {}".format(plan.action, plan.reason))
+
+        for command in cls.get_install_commands(
+            plan,
+            target=target,
+            requirements_files=requirements_files,
+            pip=pip,
+        ):
+            cls.run(inv, command)
+
+        state.write(plan.state)
+
+        return plan
@@ -0,0 +1,618 @@
+"""
+Log archive
+===========
+
+Compressed and rotated archive of command outputs.
+
+Archive is opt-in, enabled with class attribute ``LOG_ARCHIVE`` or environment
+variable ``MAKEVOKE_LOG_ARCHIVE`` (which takes precedence) with the archive
+directory path. Once enabled, standard output and error of every
+``MakevokeBase.run()`` are written to the archive.
+
+Outputs are compressed with ``gzip`` (default) or ``lzma`` as they arrive into spool
+files. Once a command has ended, its compressed outputs are appended as independent
+compressed members to the current segment file, so no data is compressed twice. A
+segment is rotated once it is bigger than a maximum size and only the last segments
+are kept.
+
+An index file records for each command its segment and the offset and length of
+its outputs, so the output of a single command is read back by only decompressing
+its own members: ::
+
+    archive = LogArchive(".makevoke-logs")
+    entry = archive.find(command="pytest*")[-1]
+    print(archive.read(entry))
+
+Commands run from an executor (see ``MakevokeBase.EXECUTORS``) are archived from
+their captured outputs once they have ended.
+
+"""
+import contextlib
+import fnmatch
+import gzip
+import io
+import itertools
+import json
+import lzma
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from invoke.exceptions import UnexpectedExit
+
+
+LOG_ARCHIVE_ENV_VAR = "MAKEVOKE_LOG_ARCHIVE"
+
+INDEX_FILENAME = "index.jsonl"
+
+LOCK_FILENAME = ".lock"
+
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{6})\.log\.(gz|xz)$")
+
+STREAMS = ("stdout", "stderr")
+
+# 'invoke' runner options for output streams
+STREAM_OPTIONS = {"stdout": "out_stream", "stderr": "err_stream"}
+
+CODECS = {
+    "gzip": {
+        "extension": "gz",
+        # Window bits from 16 to make a gzip member
+        "compressor": lambda: zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS),
+        "decompress": gzip.decompress,
+    },
+    "lzma": {
+        "extension": "xz",
+        "compressor": lambda: lzma.LZMACompressor(format=lzma.FORMAT_XZ),
+        "decompress": lzma.decompress,
+    },
+}
+
+_COUNTER = itertools.count(1)
+
+
+def is_enabled(klass):
+    """
+    Check quickly if archive may be enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+
+    Returns:
+        boolean: True if archive may be enabled.
+    """
+    return bool(
+        os.environ.get(LOG_ARCHIVE_ENV_VAR) or getattr(klass, "LOG_ARCHIVE", None)
+    )
+
+
+def get_archive_path(klass):
+    """
+    Get archive directory enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+
+    Returns:
+        string: Directory path or None if archive is disabled.
+    """
+    value = os.environ.get(LOG_ARCHIVE_ENV_VAR)
+    if value is None:
+        value = getattr(klass, "LOG_ARCHIVE", None)
+
+    return str(value) if value else None
+
+
+class MemberWriter:
+    """
+    Compress a stream into a spool file as data arrives.
+
+    Arguments:
+        directory (string): Directory for spool file.
+        codec (dict): Codec from ``CODECS``.
+
+    Attributes:
+        size (integer): Size of uncompressed data.
+    """
+    def __init__(self, directory, codec):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix=".spool-")
+        self._file = os.fdopen(fd, "wb")
+        self._compressor = codec["compressor"]()
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def write(self, data):
+        """
+        Arguments:
+            data (string or bytes): Data to add, strings are encoded to UTF-8.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8", errors="replace")
+
+        with self._lock:
+            self.size += len(data)
+            compressed = self._compressor.compress(data)
+            if compressed:
+                self._file.write(compressed)
+
+    def finish(self):
+        """
+        Flush compressor and close spool file.
+        """
+        with self._lock:
+            self._file.write(self._compressor.flush())
+            self._file.close()
+
+    def discard(self):
+        with contextlib.suppress(OSError):
+            self._file.close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.path)
+
+
+class TeeStream:
+    """
+    Text stream writing to an archive member and possibly to another stream.
+
+    Arguments:
+        member (MemberWriter): Archive member.
+
+    Keyword Arguments:
+        stream (file object): Stream to also write to, like ``sys.stdout``.
+    """
+    def __init__(self, member, stream=None):
+        self.member = member
+        self.stream = stream
+
+    def write(self, data):
+        self.member.write(data)
+        if self.stream is not None:
+            self.stream.write(data)
+
+        return len(data)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+
+class ArchiveWriter:
+    """
+    Writer for outputs of a command, to get from ``LogArchive.open()``.
+
+    Arguments:
+        archive (LogArchive): Archive.
+        command (string): Command line.
+
+    Attributes:
+        stdout (MemberWriter): Standard output member.
+        stderr (MemberWriter): Standard error member.
+    """
+    def __init__(self, archive, command):
+        self.archive = archive
+        self.command = command
+        self.started = time.time()
+        self._start = time.perf_counter()
+
+        self.stdout = MemberWriter(archive.directory, archive.codec)
+        self.stderr = MemberWriter(archive.directory, archive.codec)
+
+    def close(self, exited=None):
+        """
+        Append compressed outputs to archive.
+
+        Keyword Arguments:
+            exited (integer): Command exit code.
+
+        Returns:
+            dict: Index entry.
+        """
+        duration = time.perf_counter() - self._start
+        try:
+            self.stdout.finish()
+            self.stderr.finish()
+
+            return self.archive.append(self, exited=exited, duration=duration)
+        finally:
+            self.stdout.discard()
+            self.stderr.discard()
+
+
+class LogArchive:
+    """
+    Archive of command outputs.
+
+    Arguments:
+        directory (string): Archive directory, created if it does not exist.
+
+    Keyword Arguments:
+        compression (string): ``gzip`` or ``lzma``, only used for new segments.
+        max_segment_size (integer): Size in bytes after which a segment is
+            rotated.
+        max_segments (integer): Number of segments to keep, older ones are removed
+            with their index entries.
+    """
+    def __init__(self, directory, compression="gzip",
+                 max_segment_size=64 * 1024 * 1024, max_segments=10):
+        if compression not in CODECS:
+            raise ValueError("Unknown compression: {}".format(compression))
+
+        self.directory = str(directory)
+        self.compression = compression
+        self.codec = CODECS[compression]
+        self.max_segment_size = max_segment_size
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Context manager to lock archive against other threads and, where
+        available, other processes.
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+
+            with open(os.path.join(self.directory, LOCK_FILENAME), "a") as fp:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+    def get_segments(self):
+        """
+        Returns:
+            list: Segment filenames from the oldest.
+        """
+        found = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), name))
+
+        return [name for number, name in sorted(found)]
+
+    def get_segment(self, segments):
+        """
+        Get segment to append to, rotating the current one if needed.
+
+        Arguments:
+            segments (list): Existing segment filenames.
+
+        Returns:
+            string: Segment filename.
+        """
+        number = 0
+        if segments:
+            current = segments[-1]
+            path = os.path.join(self.directory, current)
+            if (
+                current.endswith("." + self.codec["extension"]) and
+                os.path.getsize(path) < self.max_segment_size
+            ):
+                return current
+            number = int(SEGMENT_PATTERN.match(current).group(1)) + 1
+
+        return "segment-{:06d}.log.{}".format(number, self.codec["extension"])
+
+    def open(self, command):
+        """
+        Open a writer for outputs of a command.
+
+        Arguments:
+            command (string): Command line.
+
+        Returns:
+            ArchiveWriter: Writer, to close once command has ended.
+        """
+        return ArchiveWriter(self, command)
+
+    def append(self, writer, exited=None, duration=0.0):
+        """
+        Append compressed outputs from a writer to current segment and index them.
+
+        Arguments:
+            writer (ArchiveWriter): Writer with finished members.
+
+        Keyword Arguments:
+            exited (integer): Command exit code.
+            duration (float): Command duration in seconds.
+
+        Returns:
+            dict: Index entry.
+        """
+        with self.locked():
+            segments = self.get_segments()
+            segment = self.get_segment(segments)
+            if segment not in segments:
+                segments.append(segment)
+
+            entry = {
+                "id": "{}-{}-{}".format(
+                    int(writer.started * 1000), os.getpid(), next(_COUNTER)
+                ),
+                "command": writer.command,
+                "started": writer.started,
+                "duration": duration,
+                "exited": exited,
+                "segment": segment,
+            }
+
+            with open(os.path.join(self.directory, segment), "ab") as target:
+                offset = target.seek(0, io.SEEK_END)
+                for name in STREAMS:
+                    member = getattr(writer, name)
+                    with open(member.path, "rb") as source:
+                        shutil.copyfileobj(source, target)
+                    length = target.tell() - offset
+                    entry[name] = [offset, length, member.size]
+                    offset += length
+
+            with open(self.index_path, "a") as fp:
+                fp.write(json.dumps(entry) + "\n")
+
+            if len(segments) > self.max_segments:
+                self._remove_segments(segments[:len(segments) - self.max_segments])
+
+        return entry
+
+    def _remove_segments(self, names):
+        names = set(names)
+        entries = [
+            entry for entry in self.iter_entries() if entry["segment"] not in names
+        ]
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".index-")
+        try:
+            with os.fdopen(fd, "w") as fp:
+                for entry in entries:
+                    fp.write(json.dumps(entry) + "\n")
+            os.replace(temp_path, self.index_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        for name in names:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(self.directory, name))
+
+    def iter_entries(self):
+        """
+        Returns:
+            generator: Yield index entries from the oldest.
+        """
+        try:
+            fp = open(self.index_path)
+        except FileNotFoundError:
+            return
+
+        with fp:
+            for line in fp:
+                # A line may be partial if a writer has been killed while writing
+                with contextlib.suppress(ValueError):
+                    yield json.loads(line)
+
+    def find(self, command=None, since=None, until=None):
+        """
+        Find indexed commands.
+
+        Keyword Arguments:
+            command (string): Glob pattern for command lines.
+            since (float): Only commands started from this timestamp.
+            until (float): Only commands started before this timestamp.
+
+        Returns:
+            list: Index entries from the oldest.
+        """
+        return [
+            entry for entry in self.iter_entries()
+            if (command is None or fnmatch.fnmatchcase(entry["command"], command))
+            and (since is None or entry["started"] >= since)
+            and (until is None or entry["started"] < until)
+        ]
+
+    def get(self, entry_id):
+        """
+        Arguments:
+            entry_id (string): Index entry identifier.
+
+        Returns:
+            dict: Index entry or None if not found.
+        """
+        for entry in self.iter_entries():
+            if entry["id"] == entry_id:
+                return entry
+
+        return None
+
+    def read(self, entry, stream="stdout"):
+        """
+        Read an output of a command, only decompressing its own data.
+
+        Arguments:
+            entry (dict): Index entry.
+
+        Keyword Arguments:
+            stream (string): ``stdout`` or ``stderr``.
+
+        Returns:
+            string: Output.
+        """
+        offset, length, size = entry[stream]
+        extension = entry["segment"].rsplit(".", 1)[-1]
+        codec = next(
+            item for item in CODECS.values() if item["extension"] == extension
+        )
+
+        with open(os.path.join(self.directory, entry["segment"]), "rb") as fp:
+            fp.seek(offset)
+            data = fp.read(length)
+
+        return codec["decompress"](data).decode("utf-8", errors="replace")
+
+
+_ARCHIVES = {}
+_ARCHIVES_LOCK = threading.Lock()
+
+
+def get_archive(path):
+    """
+    Get an archive object shared during the session.
+
+    Arguments:
+        path (string): Archive directory.
+
+    Returns:
+        LogArchive: Archive.
+    """
+    with _ARCHIVES_LOCK:
+        if path not in _ARCHIVES:
+            _ARCHIVES[path] = LogArchive(path)
+
+        return _ARCHIVES[path]
+
+
+def archive_run(klass, runner, command, streaming=True, config=None, **kwargs):
+    """
+    Run a command and write its outputs to archive enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+        runner (callable): Runner called with command and keyword arguments, like
+            ``inv.run``.
+        command (string): Command line.
+
+    Keyword Arguments:
+        streaming (boolean): If True, runner supports ``out_stream`` and
+            ``err_stream`` options like ``invoke`` so outputs are archived as they
+            arrive, else they are archived from result.
+        config (invoke.Config): Configuration of runner, its ``run.hide`` value is
+            used when ``hide`` option is not given.
+        **kwargs: Any other keyword arguments are passed to runner.
+
+    Returns:
+        invoke.runners.Result: Result from runner.
+    """
+    path = get_archive_path(klass)
+    if path is None:
+        return runner(command, **kwargs)
+
+    writer = get_archive(path).open(command)
+
+    if streaming:
+        hide = kwargs.pop("hide", None)
+        if hide is None and config is not None:
+            hide = config.run.hide
+        if hide in (True, "both"):
+            hidden = STREAMS
+        elif hide in ("out", "stdout"):
+            hidden = ("stdout",)
+        elif hide in ("err", "stderr"):
+            hidden = ("stderr",)
+        else:
+            hidden = ()
+
+        # Outputs are hidden from stream wrappers since 'invoke' does not write
+        # hidden outputs to streams at all
+        kwargs["hide"] = False
+        for name, option in STREAM_OPTIONS.items():
+            stream = kwargs.pop(option, None) or getattr(sys, name)
+            kwargs[option] = TeeStream(
+                getattr(writer, name), None if name in hidden else stream
+            )
+
+    exited = None
+    try:
+        result = runner(command, **kwargs)
+        exited = result.exited
+    except UnexpectedExit as error:
+        result = error.result
+        exited = result.exited
+        raise
+    finally:
+        if not streaming and exited is not None:
+            writer.stdout.write(result.stdout or "")
+            writer.stderr.write(result.stderr or "")
+        writer.close(exited=exited)
+
+    return result
+
+
+def main(argv=None):
+    """
+    Archive reader entrypoint.
+
+    Keyword Arguments:
+        argv (list): Commandline arguments. Default to ``sys.argv`` without the
+            program name.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m makevoke.logarchive",
+        description="List archived commands or print their outputs.",
+    )
+    parser.add_argument(
+        "--archive",
+        default=os.environ.get(LOG_ARCHIVE_ENV_VAR),
+        help="Archive directory. Default to the one from environment.",
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    listing = subparsers.add_parser("list")
+    listing.add_argument("--command", default=None, help="Glob pattern.")
+    listing.add_argument("--since", type=float, default=None,
+                         help="Only commands from these last hours.")
+    show = subparsers.add_parser("show")
+    show.add_argument("id")
+    show.add_argument("--stderr", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.archive:
+        parser.error("An archive directory is required")
+
+    archive = LogArchive(args.archive)
+
+    if args.action == "list":
+        since = None
+        if args.since is not None:
+            since = time.time() - args.since * 3600
+        for entry in archive.find(command=args.command, since=since):
+            print("{}  {}  {:>4}  {:>8.2f}s  {}".format(
+                entry["id"],
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["started"])),
+                "" if entry["exited"] is None else entry["exited"],
+                entry["duration"],
+                entry["command"],
+            ))
+        return 0
+
+    entry = archive.get(args.id)
+    if entry is None:
+        parser.error("No archived command with id: {}".format(args.id))
+
+    sys.stdout.write(archive.read(entry, "stderr" if args.stderr else "stdout"))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
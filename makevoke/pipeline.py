@@ -0,0 +1,254 @@
+"""
+Pipeline
+========
+
+Stream data through a chain of commands and Python generator stages.
+
+A command stage is a command line run with the shell. A Python stage is a callable
+which receives an iterator of input lines (as strings with their line ending) and
+yields output lines, like: ::
+
+    def only_errors(lines):
+        for line in lines:
+            if "ERROR" in line:
+                yield line
+
+Consecutive commands are connected directly with an OS pipe so data goes from one
+process to the other without ever being copied through Python. Python stages run
+in their own thread, reading from the previous stage and writing to the next one
+through pipes. Since pipes have a limited buffer, a stage which does not consume
+its input blocks its producer, so memory usage does not depend on data size.
+
+Exit status of every stage is collected, a pipeline fails if any stage failed.
+
+"""
+import codecs
+import os
+import subprocess
+import sys
+import threading
+import traceback
+
+from invoke.exceptions import UnexpectedExit
+from invoke.runners import Result
+
+
+class StageResult:
+    """
+    Result of a pipeline stage.
+
+    Attributes:
+        name (string): Command line or Python callable name.
+        exited (integer): Exit code, a Python stage exits with 1 on any exception.
+    """
+    def __init__(self, name, exited=None):
+        self.name = name
+        self.exited = exited
+
+    def __repr__(self):
+        return "<StageResult {!r} exited={}>".format(self.name, self.exited)
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            boolean: True if stage succeeded.
+        """
+        return self.exited == 0
+
+
+class PipelineResult(Result):
+    """
+    Result of a pipeline.
+
+    Exit code is the one from the last failed stage, or 0 if every stage succeeded.
+
+    Attributes:
+        stages (list): ``StageResult`` objects for every stages.
+    """
+    def __init__(self, stages=None, **kwargs):
+        super().__init__(**kwargs)
+        self.stages = stages or []
+
+
+def get_stage_name(stage):
+    """
+    Get a readable name for a stage.
+
+    Arguments:
+        stage (string or callable): Command line or Python callable.
+
+    Returns:
+        string: Stage name.
+    """
+    if isinstance(stage, str):
+        return stage
+
+    return getattr(stage, "__qualname__", None) or repr(stage)
+
+
+def iter_lines(stream, encoding="utf-8"):
+    """
+    Lazily read decoded lines from a binary stream.
+
+    Arguments:
+        stream (file object): Binary stream.
+
+    Keyword Arguments:
+        encoding (string): Encoding to decode lines.
+
+    Returns:
+        generator: Yield lines with their line ending.
+    """
+    for line in stream:
+        yield line.decode(encoding, errors="replace")
+
+
+class Pipeline:
+    """
+    A chain of stages.
+
+    Arguments:
+        stages (iterable): Command lines and Python callables.
+
+    Keyword Arguments:
+        encoding (string): Encoding of data given to and produced from Python
+            stages.
+        env (dict): Environment variables to add for commands.
+        cwd (string): Working directory for commands.
+    """
+    def __init__(self, stages, encoding="utf-8", env=None, cwd=None):
+        self.stages = list(stages)
+        self.encoding = encoding
+        self.env = env
+        self.cwd = cwd
+
+        if not self.stages:
+            raise ValueError("A pipeline requires at least one stage")
+
+    def _start_command(self, command, source, result):
+        environ = None
+        if self.env:
+            environ = dict(os.environ)
+            environ.update(self.env)
+
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdin=subprocess.DEVNULL if source is None else source,
+            stdout=subprocess.PIPE,
+            env=environ,
+            cwd=self.cwd,
+        )
+
+        # Only the process must hold the read end for it to get any broken pipe
+        if source is not None:
+            source.close()
+
+        def wait():
+            result.exited = process.wait()
+
+        return process.stdout, wait
+
+    def _start_function(self, func, source, result):
+        read_fd, write_fd = os.pipe()
+
+        def work():
+            lines = iter(())
+            if source is not None:
+                lines = iter_lines(source, self.encoding)
+            output = os.fdopen(write_fd, "wb")
+            produced = None
+            try:
+                produced = func(lines)
+                for item in produced or ():
+                    item = str(item)
+                    if not item.endswith("\n"):
+                        item += "\n"
+                    output.write(item.encode(self.encoding))
+                result.exited = 0
+            except BrokenPipeError:
+                # Next stage has stopped reading, like 'head' would
+                result.exited = 0
+            except Exception:
+                traceback.print_exc()
+                result.exited = 1
+            finally:
+                if hasattr(produced, "close"):
+                    produced.close()
+                try:
+                    output.close()
+                except BrokenPipeError:
+                    pass
+                if source is not None:
+                    source.close()
+
+        thread = threading.Thread(target=work, daemon=True)
+        thread.start()
+
+        return os.fdopen(read_fd, "rb"), thread.join
+
+    def run(self, capture=False, hide=False, warn=False):
+        """
+        Run pipeline and stream its output.
+
+        Keyword Arguments:
+            capture (boolean): If True, output of last stage is kept in result
+                ``stdout``. Default to False so memory does not depend on output
+                size.
+            hide (boolean): If True, output of last stage is not printed.
+            warn (boolean): If True, a failure does not raise an
+                ``invoke.exceptions.UnexpectedExit`` exception.
+
+        Returns:
+            PipelineResult: Pipeline result.
+        """
+        results = []
+        waiters = []
+        source = None
+
+        for stage in self.stages:
+            result = StageResult(get_stage_name(stage))
+            results.append(result)
+
+            if isinstance(stage, str):
+                source, waiter = self._start_command(stage, source, result)
+            else:
+                source, waiter = self._start_function(stage, source, result)
+
+            waiters.append(waiter)
+
+        captured = []
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        with source:
+            while True:
+                chunk = source.read1(65536)
+                text = decoder.decode(chunk, final=not chunk)
+                if not chunk and not text:
+                    break
+                if capture:
+                    captured.append(text)
+                if not hide:
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+
+        for waiter in waiters:
+            waiter()
+
+        exited = 0
+        for result in results:
+            if result.exited:
+                exited = result.exited
+
+        pipeline_result = PipelineResult(
+            stages=results,
+            stdout="".join(captured),
+            command=" | ".join(result.name for result in results),
+            exited=exited,
+            hide=("stdout",) if hide else (),
+        )
+
+        if not pipeline_result.ok and not warn:
+            raise UnexpectedExit(pipeline_result)
+
+        return pipeline_result
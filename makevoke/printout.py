@@ -1,7 +1,14 @@
+import itertools
+import sys
+from collections.abc import Iterable
+
 from invoke.exceptions import Exit
 
 from colorama import Fore, Back, Style
 
+from .progress import ProgressDisplay
+from .utils import display_width, lookahead
+
 
 class PrintOutAbstract:
     """
@@ -30,6 +37,14 @@ class PrintOutAbstract:
     BLOCK_SURROUND = ("  ", "  ")
     INDENT_STRING = "    "
 
+    TREE_BRANCH = "├── "
+    TREE_END = "└── "
+    TREE_CONTINUE = "│   "
+    TREE_BLANK = "    "
+    TABLE_SEPARATOR = "  "
+    TABLE_RULE = "─"
+    WRITE_BUFFER_LINES = 1000
+
     UnderlineAnsiCode = "\u001b[4m"
     BoldAnsiCode = "\u001b[1m"
 
@@ -245,25 +260,249 @@ class PrintOutAbstract:
                 attribute ``INDENT_STRING``. Default to 0, there won't be any
                 indentation.
         """
-        char = "├── " if not ends else "└── "
+        char = cls.TREE_BRANCH if not ends else cls.TREE_END
         print(Fore.BLUE + cls.get_indent(indent) + char + Style.RESET_ALL + str(msg))
 
     @classmethod
     def treelist(cls, items, indent=0):
         """
-        Convenient method to use treeitem on each item of a list.
+        Convenient method to print items as a tree.
 
         Arguments:
-            items (list): A list of strings to print out as tree items.
+            items (iterable): Any iterable of strings to print out as tree items,
+                including generators. Items may also be nested like described in
+                ``tree()``.
 
         Keyword Arguments:
             indent (integer): Indentation level to give to Makefile method
                 ``treeitem``. Default to 0, there won't be any indentation.
         """
-        total = len(items)
+        cls.tree(items, indent=indent)
+
+    @classmethod
+    def tree(cls, items, indent=0, stream=None):
+        """
+        Print a possibly nested tree of items.
+
+        Items are consumed lazily with a lookahead of a single item and output is
+        written by chunks of ``WRITE_BUFFER_LINES`` lines, so huge trees and
+        generators start to print immediately with a constant memory usage.
+
+        An item is either a simple string or a tuple ``(label, children)`` where
+        ``children`` is an iterable of items alike (but not a string). Any other item
+        is printed as a string. Usage sample to print a directory
+        tree: ::
+
+            from makevoke.utils import scandir_tree
+
+            PrintOutAbstract.tree(scandir_tree("docs/"))
+
+        Arguments:
+            items (iterable): Any iterable of items, including generators.
+
+        Keyword Arguments:
+            indent (integer): Indentation level to apply at start of each line.
+                Default to 0, there won't be any indentation.
+            stream (object): File object to write on. Default to ``sys.stdout``.
+        """
+        cls.write_lines(cls._tree_lines(items, indent=indent), stream=stream)
+
+    @classmethod
+    def _tree_lines(cls, items, indent=0):
+        """
+        Lazily build tree lines from items.
+
+        Arguments:
+            items (iterable): Any iterable of items as described in ``tree()``.
+
+        Keyword Arguments:
+            indent (integer): Indentation level to apply at start of each line.
+
+        Returns:
+            generator: Yield each line to print out without ending line break.
+        """
+        base = cls.get_indent(indent)
+
+        stack = [(lookahead(items), "")]
+        while stack:
+            iterator, prefix = stack[-1]
+
+            try:
+                item, last = next(iterator)
+            except StopIteration:
+                stack.pop()
+                continue
+
+            label, children = item, None
+            if (
+                isinstance(item, tuple) and len(item) == 2 and
+                isinstance(item[1], Iterable) and
+                not isinstance(item[1], (str, bytes))
+            ):
+                label, children = item
+
+            yield (
+                Fore.BLUE + base + prefix +
+                (cls.TREE_END if last else cls.TREE_BRANCH) +
+                Style.RESET_ALL + str(label)
+            )
+
+            if children is not None:
+                stack.append((
+                    lookahead(children),
+                    prefix + (cls.TREE_BLANK if last else cls.TREE_CONTINUE),
+                ))
+
+    @classmethod
+    def table(cls, rows, headers=None, widths=None, align=None, sample=100,
+              indent=0, stream=None):
+        """
+        Print rows as an aligned table.
+
+        Column widths are computed from visible widths, ignoring ANSI codes and
+        counting wide Unicode characters. When ``widths`` is not given, they are
+        computed from headers and the first ``sample`` rows only, then every other
+        row is streamed with the same layout so rows are never all held in memory.
+        A cell larger than its column width is not truncated.
+
+        Usage sample: ::
+
+            PrintOutAbstract.table(
+                ((name, cls.yes_or_no(ok)) for name, ok in checks),
+                headers=["Check", "Status"],
+            )
+
+        Arguments:
+            rows (iterable): Any iterable of rows, including generators. A row is a
+                sequence of cells, a cell is any object which will be turned to a
+                string.
+
+        Keyword Arguments:
+            headers (list): Optional list of column titles.
+            widths (list): Fixed column widths. Default to None to compute them from
+                a sample.
+            align (string or list): Alignment for each column, either ``<`` for left
+                or ``>`` for right. Missing columns are aligned to left. Default to
+                None to align every columns to left.
+            sample (integer): Number of first rows to use to compute column widths.
+                Default to 100.
+            indent (integer): Indentation level to apply at start of each line.
+                Default to 0, there won't be any indentation.
+            stream (object): File object to write on. Default to ``sys.stdout``.
+        """
+        cls.write_lines(
+            cls._table_lines(
+                rows,
+                headers=headers,
+                widths=widths,
+                align=align,
+                sample=sample,
+                indent=indent,
+            ),
+            stream=stream,
+        )
+
+    @classmethod
+    def _table_lines(cls, rows, headers=None, widths=None, align=None, sample=100,
+                     indent=0):
+        """
+        Lazily build table lines from rows.
+
+        Arguments:
+            rows (iterable): Any iterable of rows as described in ``table()``.
+
+        Keyword Arguments:
+            headers (list): Optional list of column titles.
+            widths (list): Fixed column widths.
+            align (string or list): Alignment for each column.
+            sample (integer): Number of first rows to use to compute column widths.
+            indent (integer): Indentation level to apply at start of each line.
+
+        Returns:
+            generator: Yield each line to print out without ending line break.
+        """
+        rows = iter(rows)
+        sampled = []
+
+        if widths is None:
+            sampled = [
+                [str(cell) for cell in row]
+                for row in itertools.islice(rows, sample)
+            ]
+            widths = []
+            for row in ([headers] if headers else []) + sampled:
+                for position, cell in enumerate(row):
+                    width = display_width(str(cell))
+                    if position < len(widths):
+                        widths[position] = max(widths[position], width)
+                    else:
+                        widths.append(width)
+
+        align = align or ""
+        base = cls.get_indent(indent)
+
+        def format_row(row):
+            cells = []
+            for position, cell in enumerate(row):
+                cell = str(cell)
+                width = widths[position] if position < len(widths) else 0
+                padding = " " * max(width - display_width(cell), 0)
+                if position < len(align) and align[position] == ">":
+                    cells.append(padding + cell)
+                else:
+                    cells.append(cell + padding)
+
+            return (base + cls.TABLE_SEPARATOR.join(cells)).rstrip()
+
+        if headers:
+            yield (
+                cls.BoldAnsiCode + format_row(headers) + Style.RESET_ALL
+            )
+            yield base + cls.TABLE_SEPARATOR.join(
+                cls.TABLE_RULE * width for width in widths
+            )
+
+        for row in itertools.chain(sampled, rows):
+            yield format_row(row)
+
+    @classmethod
+    def write_lines(cls, lines, stream=None):
+        """
+        Write lines by chunks of ``WRITE_BUFFER_LINES`` lines.
 
-        for i, item in enumerate(items, start=1):
-            cls.treeitem(item, ends=(i == total), indent=indent)
+        Arguments:
+            lines (iterable): Any iterable of lines without ending line break.
+
+        Keyword Arguments:
+            stream (object): File object to write on. Default to ``sys.stdout``.
+        """
+        stream = stream or sys.stdout
+        buffer = []
+
+        for line in lines:
+            buffer.append(line + "\n")
+            if len(buffer) >= cls.WRITE_BUFFER_LINES:
+                stream.write("".join(buffer))
+                buffer = []
+
+        if buffer:
+            stream.write("".join(buffer))
+        stream.flush()
+
+    @classmethod
+    def progress(cls, total=None, **kwargs):
+        """
+        Create a live progress display which uses this class to print log messages.
+
+        Keyword Arguments:
+            total (integer): Expected total of jobs.
+            **kwargs: Any other keyword arguments are passed to ``ProgressDisplay``.
+
+        Returns:
+            makevoke.progress.ProgressDisplay: The progress display, it is not opened
+            yet so either use it as a context manager or call its ``open()`` method.
+        """
+        return ProgressDisplay(total=total, printer=cls, **kwargs)
 
     @classmethod
     def yes_or_no(cls, value, colored=True):
@@ -355,3 +594,15 @@ class PrintOutAbstract:
         cls.treeitem("This is a 'treeitem' line.")
         cls.treeitem("This is a 'treeitem' line with ends=True.", ends=True)
         cls.treelist(["First item with treelist", "Another one"])
+        cls.tree([
+            ("First item with tree", ["Nested item", ("Nested tree", ["Leaf"])]),
+            "Last item",
+        ])
+        cls.table(
+            [
+                ["info", cls.yes_or_no(True), 42],
+                ["error", cls.yes_or_no(False), 7],
+            ],
+            headers=["Sample table", "Status", "Count"],
+            align="<>>",
+        )
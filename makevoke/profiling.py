@@ -0,0 +1,485 @@
+"""
+Profiling
+=========
+
+Opt-in profiling of task bodies and of ``MakevokeBase.run()``.
+
+Three profilers are available:
+
+cpu
+    Profile calls with ``cProfile`` and dump statistics to a ``.prof`` file which
+    can be read with ``pstats`` or tools like ``snakeviz``;
+memory
+    Trace allocations with ``tracemalloc`` and write the top allocation
+    differences between start and end to a ``.memory.txt`` file;
+stacks
+    Sample the call stack at regular interval and write collapsed stacks to a
+    ``.collapsed`` file which flamegraph tools can read.
+
+Profilers are enabled with class attribute ``PROFILE`` or environment variable
+``MAKEVOKE_PROFILE`` (which takes precedence), either as a list or a comma
+separated string of profiler names, ``all`` enabling every profilers. Profiling can
+be limited to some tasks with class attribute ``PROFILE_TASKS`` or environment
+variable ``MAKEVOKE_PROFILE_TASKS`` with glob patterns of task names: ::
+
+    MAKEVOKE_PROFILE=cpu,stacks MAKEVOKE_PROFILE_TASKS="build*" invoke build
+
+Task bodies are profiled when decorated with ``MakevokeBase.profile_task()``.
+Commands run from a profiled task are included in its profiles, commands run
+outside of a profiled task are profiled with task name ``run``.
+
+Profiles are written to directory from class attribute ``PROFILE_DIR`` or
+environment variable ``MAKEVOKE_PROFILE_DIR``, default to a ``profiles``
+directory in Makevoke cache directory. Their paths are reported with ``info()``
+when the class implements printout methods like ``PrintOutAbstract``.
+
+Allocations are traced for the whole process, so memory profiles of tasks running
+at once in many threads include the allocations of each other.
+
+When profiling is disabled, the cost is a dictionnary lookup in environment.
+
+"""
+import contextlib
+import contextvars
+import fnmatch
+import itertools
+import os
+import sys
+import threading
+import time
+
+
+PROFILE_ENV_VAR = "MAKEVOKE_PROFILE"
+
+PROFILE_TASKS_ENV_VAR = "MAKEVOKE_PROFILE_TASKS"
+
+PROFILE_DIR_ENV_VAR = "MAKEVOKE_PROFILE_DIR"
+
+PROFILERS = ("cpu", "memory", "stacks")
+
+# Number of lines written from allocation differences
+MEMORY_TOP = 25
+
+# Delay in seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Name of the task currently profiled in context
+_CURRENT_TASK = contextvars.ContextVar("makevoke_profiled_task", default=None)
+
+# Profilers currently active in each thread, they can not be nested
+_ACTIVE = threading.local()
+
+# Number of memory profiles currently tracing allocations, tracing is process wide
+# so it is only stopped by the last one if it has been started by the first one
+_TRACING_LOCK = threading.Lock()
+_TRACING_USERS = 0
+_TRACING_OWNED = False
+
+_COUNTER = itertools.count(1)
+
+
+def _start_tracing():
+    """
+    Start tracing allocations if not already done.
+
+    Returns:
+        tracemalloc.Snapshot: Snapshot of current allocations.
+    """
+    global _TRACING_USERS, _TRACING_OWNED
+    import tracemalloc
+
+    with _TRACING_LOCK:
+        if _TRACING_USERS == 0:
+            _TRACING_OWNED = not tracemalloc.is_tracing()
+            if _TRACING_OWNED:
+                tracemalloc.start()
+        _TRACING_USERS += 1
+
+        return tracemalloc.take_snapshot()
+
+
+def _stop_tracing():
+    """
+    Stop tracing allocations if no other memory profile is tracing and tracing
+    has been started from ``_start_tracing()``.
+
+    Returns:
+        tracemalloc.Snapshot: Snapshot of current allocations.
+    """
+    global _TRACING_USERS
+    import tracemalloc
+
+    with _TRACING_LOCK:
+        snapshot = tracemalloc.take_snapshot()
+
+        _TRACING_USERS -= 1
+        if _TRACING_USERS == 0 and _TRACING_OWNED:
+            tracemalloc.stop()
+
+        return snapshot
+
+
+def split_values(value):
+    """
+    Split a comma separated string into a list.
+
+    Arguments:
+        value (string or iterable): Comma separated string or iterable of strings.
+
+    Returns:
+        list: Non empty stripped values.
+    """
+    if value is None:
+        return []
+
+    if isinstance(value, str):
+        value = value.split(",")
+
+    return [item.strip() for item in value if item and item.strip()]
+
+
+def parse_profilers(value):
+    """
+    Parse enabled profilers.
+
+    Arguments:
+        value (string or iterable): Comma separated string or iterable of profiler
+            names.
+
+    Returns:
+        tuple: Enabled profiler names in ``PROFILERS`` order.
+    """
+    names = set(split_values(value))
+    if "all" in names:
+        return PROFILERS
+
+    unknown = names.difference(PROFILERS)
+    if unknown:
+        raise ValueError(
+            "Unknown profilers: {}. Available ones are: {}".format(
+                ", ".join(sorted(unknown)), ", ".join(PROFILERS)
+            )
+        )
+
+    return tuple(name for name in PROFILERS if name in names)
+
+
+def is_enabled(klass):
+    """
+    Check quickly if any profiling is enabled for a class.
+
+    Arguments:
+        klass (class): Makevoke class.
+
+    Returns:
+        boolean: True if profiling may be enabled.
+    """
+    return bool(os.environ.get(PROFILE_ENV_VAR) or getattr(klass, "PROFILE", None))
+
+
+def get_profilers(klass, name):
+    """
+    Get profilers enabled for a task.
+
+    Arguments:
+        klass (class): Makevoke class.
+        name (string): Task name.
+
+    Returns:
+        tuple: Enabled profiler names.
+    """
+    value = os.environ.get(PROFILE_ENV_VAR)
+    if value is None:
+        value = getattr(klass, "PROFILE", None)
+
+    profilers = parse_profilers(value)
+    if not profilers:
+        return ()
+
+    patterns = split_values(
+        os.environ.get(PROFILE_TASKS_ENV_VAR) or getattr(klass, "PROFILE_TASKS", None)
+    )
+    if patterns and not any(
+        fnmatch.fnmatchcase(name, pattern) for pattern in patterns
+    ):
+        return ()
+
+    return profilers
+
+
+def get_profile_dir(klass):
+    """
+    Get directory where to write profiles.
+
+    Arguments:
+        klass (class): Makevoke class.
+
+    Returns:
+        string: Directory path.
+    """
+    directory = (
+        os.environ.get(PROFILE_DIR_ENV_VAR) or getattr(klass, "PROFILE_DIR", None)
+    )
+    if directory:
+        return str(directory)
+
+    from .utils import get_cache_dir
+
+    return os.path.join(get_cache_dir(), "profiles")
+
+
+def format_frame(frame):
+    """
+    Format a frame for a collapsed stack.
+
+    Arguments:
+        frame (frame): Python frame.
+
+    Returns:
+        string: Function name with its file and first line, without any ``;``.
+    """
+    code = frame.f_code
+
+    return "{} ({}:{})".format(
+        getattr(code, "co_qualname", code.co_name),
+        os.path.basename(code.co_filename),
+        code.co_firstlineno,
+    ).replace(";", ":")
+
+
+class StackSampler:
+    """
+    Sample the call stack of a thread from a background thread.
+
+    Keyword Arguments:
+        thread_id (integer): Identifier of thread to sample. Default to current
+            thread.
+        interval (float): Delay in seconds between samples.
+
+    Attributes:
+        counts (dict): Number of samples for each collapsed stack.
+    """
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """
+        Take a sample of the stack.
+        """
+        frame = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None:
+            names.append(format_frame(frame))
+            frame = frame.f_back
+
+        if names:
+            key = ";".join(reversed(names))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write(self, path):
+        """
+        Write collapsed stacks, one line per stack followed by its samples count.
+
+        Arguments:
+            path (string): File path.
+        """
+        with open(path, "w") as fp:
+            for key, count in sorted(self.counts.items()):
+                fp.write("{} {}\n".format(key, count))
+
+
+class Profile:
+    """
+    Profiles of a task run.
+
+    Arguments:
+        name (string): Task name.
+        profilers (iterable): Enabled profiler names.
+        directory (string): Directory where to write profiles.
+
+    Keyword Arguments:
+        interval (float): Delay in seconds between stack samples.
+
+    Attributes:
+        paths (dict): Paths of written profiles indexed on profiler names.
+    """
+    def __init__(self, name, profilers, directory, interval=SAMPLE_INTERVAL):
+        self.name = name
+        self.profilers = tuple(profilers)
+        self.directory = directory
+        self.interval = interval
+        self.paths = {}
+
+        self._profiler = None
+        self._snapshot = None
+        self._sampler = None
+
+    def get_path(self, suffix):
+        """
+        Arguments:
+            suffix (string): Profile file extension.
+
+        Returns:
+            string: A path unique to this profile.
+        """
+        if not hasattr(self, "_basename"):
+            self._basename = "{}-{}-{}-{}".format(
+                self.name.replace(os.sep, "_"),
+                time.strftime("%Y%m%d-%H%M%S"),
+                os.getpid(),
+                next(_COUNTER),
+            )
+
+        return os.path.join(self.directory, self._basename + suffix)
+
+    def start(self):
+        if "memory" in self.profilers:
+            self._snapshot = _start_tracing()
+
+        if "stacks" in self.profilers:
+            self._sampler = StackSampler(interval=self.interval)
+            self._sampler.start()
+
+        # Started last so it does not profile other profilers
+        if "cpu" in self.profilers:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        """
+        Stop profilers and write their profiles.
+        """
+        if self._profiler is not None:
+            self._profiler.disable()
+
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        snapshot = None
+        if self._snapshot is not None:
+            snapshot = _stop_tracing()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        if self._profiler is not None:
+            self.paths["cpu"] = self.get_path(".prof")
+            self._profiler.dump_stats(self.paths["cpu"])
+
+        if snapshot is not None:
+            self.paths["memory"] = self.get_path(".memory.txt")
+            differences = snapshot.compare_to(self._snapshot, "lineno")
+            with open(self.paths["memory"], "w") as fp:
+                for difference in differences[:MEMORY_TOP]:
+                    fp.write("{}\n".format(difference))
+
+        if self._sampler is not None:
+            self.paths["stacks"] = self.get_path(".collapsed")
+            self._sampler.write(self.paths["stacks"])
+
+
+@contextlib.contextmanager
+def profile(name, profilers, directory, interval=SAMPLE_INTERVAL):
+    """
+    Context manager to profile a block.
+
+    Profilers already active in current thread are not started again, the block is
+    already included in their profiles.
+
+    Arguments:
+        name (string): Task name.
+        profilers (iterable): Profiler names.
+        directory (string): Directory where to write profiles.
+
+    Keyword Arguments:
+        interval (float): Delay in seconds between stack samples.
+
+    Returns:
+        Profile: Profile object, its paths are set once block has ended.
+    """
+    active = getattr(_ACTIVE, "profilers", frozenset())
+    profilers = [item for item in profilers if item not in active]
+
+    current = Profile(name, profilers, directory, interval=interval)
+    if not profilers:
+        yield current
+        return
+
+    _ACTIVE.profilers = active.union(profilers)
+    current.start()
+    try:
+        yield current
+    finally:
+        current.stop()
+        _ACTIVE.profilers = active
+
+
+def profile_call(klass, name, func, *args, **kwargs):
+    """
+    Call a function with profilers enabled for a task.
+
+    Written profiles are reported with class ``info()`` method if any.
+
+    Arguments:
+        klass (class): Makevoke class.
+        name (string): Task name.
+        func (callable): Function to call.
+        *args: Any positional arguments are passed to function.
+        **kwargs: Any keyword arguments are passed to function.
+
+    Returns:
+        object: Function return value.
+    """
+    profilers = get_profilers(klass, name)
+    if not profilers:
+        return func(*args, **kwargs)
+
+    current = None
+    token = _CURRENT_TASK.set(name)
+    try:
+        with profile(name, profilers, get_profile_dir(klass)) as current:
+            return func(*args, **kwargs)
+    finally:
+        _CURRENT_TASK.reset(token)
+
+        if current is not None and hasattr(klass, "info"):
+            for profiler, path in current.paths.items():
+                klass.info("Profile '{}' from {} written to: {}".format(
+                    profiler, name, path
+                ))
+
+
+def profile_run(klass, func, *args, **kwargs):
+    """
+    Call a command runner with profilers enabled for current task, or for task
+    ``run`` if not called from a profiled task.
+
+    Arguments:
+        klass (class): Makevoke class.
+        func (callable): Function to call.
+        *args: Any positional arguments are passed to function.
+        **kwargs: Any keyword arguments are passed to function.
+
+    Returns:
+        object: Function return value.
+    """
+    return profile_call(klass, _CURRENT_TASK.get() or "run", func, *args, **kwargs)
@@ -0,0 +1,364 @@
+"""
+Progress
+========
+
+A live status area for long running or parallel work.
+
+"""
+import shutil
+import sys
+import threading
+import time
+
+
+def format_duration(seconds):
+    """
+    Format a duration in a compact human readable form.
+
+    Arguments:
+        seconds (float): Duration in seconds.
+
+    Returns:
+        string: Duration formatted as ``MM:SS`` or ``H:MM:SS`` when it is an hour or
+        more.
+    """
+    seconds = int(max(seconds, 0))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    if hours:
+        return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+    return "{:02d}:{:02d}".format(minutes, seconds)
+
+
+class ProgressDisplay:
+    """
+    A live status area showing running jobs, completed and total counts, elapsed time
+    and an estimated remaining time.
+
+    Job updates only change some counters, the status area is redrawn at most
+    ``refresh_rate`` times per second so terminal writes stay flat whatever is the
+    job completion rate. When the stream is not a TTY, no status area is drawn and a
+    summary line is printed every ``summary_interval`` seconds instead.
+
+    All methods are thread safe so a display can be shared between workers.
+
+    Usage sample: ::
+
+        with PrintOutAbstract.progress(total=len(jobs)) as progress:
+            for job in jobs:
+                progress.start(job)
+                ...
+                progress.done(job)
+                progress.log("Job {} is done".format(job), level="success")
+
+    Keyword Arguments:
+        total (integer): Expected total of jobs. If not given, there won't be any
+            estimated remaining time.
+        printer (object): A class which implements printout methods like in
+            ``PrintOutAbstract``, it is used by ``log()`` to print messages with a
+            level. If not given, messages are printed without any style.
+        stream (object): File object to write on. Default to ``sys.stdout`` as it is
+            when the display is created.
+        refresh_rate (float): Maximum number of redraws per second. Default to
+            ``REFRESH_RATE`` attribute.
+        summary_interval (float): Number of seconds between summary lines when stream
+            is not a TTY. Default to ``SUMMARY_INTERVAL`` attribute.
+        max_running (integer): Maximum number of running jobs to list in the status
+            area. Default to ``MAX_RUNNING_LINES`` attribute.
+        clock (callable): Function which returns a monotonic time in seconds. Default
+            to ``time.monotonic``.
+        tty (boolean): Force the TTY mode on or off. Default is to guess it from
+            stream.
+    """
+    REFRESH_RATE = 10
+    SUMMARY_INTERVAL = 5.0
+    MAX_RUNNING_LINES = 5
+
+    RUNNING_CHAR = "▸ "
+
+    def __init__(self, total=None, printer=None, stream=None, refresh_rate=None,
+                 summary_interval=None, max_running=None, clock=None, tty=None):
+        self.total = total
+        self.printer = printer
+        self.stream = stream or sys.stdout
+        self.clock = clock or time.monotonic
+        self.max_running = (
+            self.MAX_RUNNING_LINES if max_running is None else max_running
+        )
+
+        if tty is None:
+            isatty = getattr(self.stream, "isatty", None)
+            tty = bool(isatty and isatty())
+        self.tty = tty
+
+        if self.tty:
+            self.interval = 1.0 / (refresh_rate or self.REFRESH_RATE)
+            self.width = shutil.get_terminal_size().columns
+        else:
+            self.interval = (
+                self.SUMMARY_INTERVAL if summary_interval is None
+                else summary_interval
+            )
+            self.width = None
+
+        self.completed = 0
+        self.failed = 0
+        self.started_at = None
+
+        self._running = {}
+        self._lock = threading.RLock()
+        self._last_draw = None
+        self._drawn_lines = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Start the clock and draw the status area for the first time.
+
+        Returns:
+            ProgressDisplay: The display itself.
+        """
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = self.clock()
+                if self.tty:
+                    self._draw()
+                else:
+                    self._last_draw = self.started_at
+
+        return self
+
+    def start(self, job, label=None):
+        """
+        Register a running job.
+
+        Arguments:
+            job (object): Any hashable object to identify the job.
+
+        Keyword Arguments:
+            label (string): Label to display for the job. Default to the job string
+                representation.
+        """
+        with self._lock:
+            self._running[job] = (str(job) if label is None else label, self.clock())
+            self._tick()
+
+    def done(self, job=None, failed=False):
+        """
+        Mark a job as completed.
+
+        Keyword Arguments:
+            job (object): The job identifier as given to ``start()``. It may be
+                omitted for jobs that have never been started with ``start()``.
+            failed (boolean): If True, the job is also counted as failed.
+        """
+        with self._lock:
+            self._running.pop(job, None)
+            self.completed += 1
+            if failed:
+                self.failed += 1
+            self._tick()
+
+    def advance(self, count=1):
+        """
+        Count some completed jobs at once without any running job tracking.
+
+        Keyword Arguments:
+            count (integer): Number of completed jobs to add.
+        """
+        with self._lock:
+            self.completed += count
+            self._tick()
+
+    def log(self, msg, level=None):
+        """
+        Print a message above the status area.
+
+        Arguments:
+            msg (string): A simple string to print out.
+
+        Keyword Arguments:
+            level (string): Name of a printer method to use like ``info`` or
+                ``error``. If empty or if there is no printer, message is printed
+                without any style.
+        """
+        with self._lock:
+            self._clear()
+
+            if level and self.printer is not None:
+                self.stream.flush()
+                getattr(self.printer, level)(msg)
+                sys.stdout.flush()
+            else:
+                self.stream.write(str(msg) + "\n")
+
+            if self.tty and not self._closed:
+                self._draw()
+            else:
+                self.stream.flush()
+
+    def refresh(self, force=False):
+        """
+        Redraw status area if the refresh interval has passed.
+
+        Keyword Arguments:
+            force (boolean): If True, redraw without to care about interval.
+        """
+        with self._lock:
+            if force:
+                self._render()
+            else:
+                self._tick()
+
+    def close(self):
+        """
+        Draw the final state. Status area is left on screen for a TTY, else a last
+        summary line is printed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+
+            if self.started_at is None:
+                self.started_at = self.clock()
+
+            self._render()
+            self._closed = True
+
+    @property
+    def elapsed(self):
+        """
+        Elapsed seconds since display has been opened.
+
+        Returns:
+            float: Elapsed seconds.
+        """
+        if self.started_at is None:
+            return 0.0
+
+        return self.clock() - self.started_at
+
+    @property
+    def eta(self):
+        """
+        Estimated remaining seconds from the average duration of completed jobs.
+
+        Returns:
+            float: Remaining seconds or None if it can not be estimated yet or if
+            everything is done.
+        """
+        if not self.total or not self.completed:
+            return None
+
+        remaining = self.total - self.completed
+        if remaining <= 0:
+            return None
+
+        return self.elapsed / self.completed * remaining
+
+    def summary(self):
+        """
+        Build the status summary line.
+
+        Returns:
+            string: Summary with counts, elapsed and remaining time.
+        """
+        if self.total:
+            counts = "{}/{} done".format(self.completed, self.total)
+        else:
+            counts = "{} done".format(self.completed)
+
+        parts = [
+            counts,
+            "{} running".format(len(self._running)),
+        ]
+        if self.failed:
+            parts.append("{} failed".format(self.failed))
+
+        parts.append("elapsed {}".format(format_duration(self.elapsed)))
+
+        eta = self.eta
+        if eta is not None:
+            parts.append("ETA {}".format(format_duration(eta)))
+
+        return " · ".join(parts)
+
+    def lines(self):
+        """
+        Build all lines of the status area.
+
+        Returns:
+            list: Summary line followed by running job lines.
+        """
+        now = self.clock()
+        lines = [self.summary()]
+
+        running = list(self._running.values())
+        for label, started in running[:self.max_running]:
+            lines.append("{}{} ({})".format(
+                self.RUNNING_CHAR,
+                label,
+                format_duration(now - started),
+            ))
+
+        hidden = len(running) - self.max_running
+        if hidden > 0:
+            lines.append("{}… and {} more".format(self.RUNNING_CHAR, hidden))
+
+        return lines
+
+    def _tick(self):
+        """
+        Render only if the refresh interval has passed since last render.
+        """
+        if self._closed or self.started_at is None:
+            return
+
+        now = self.clock()
+        if self._last_draw is None or now - self._last_draw >= self.interval:
+            self._render(now=now)
+
+    def _render(self, now=None):
+        """
+        Either draw the status area or print a summary line depending TTY mode.
+        """
+        if self.tty:
+            self._draw(now=now)
+        else:
+            self._last_draw = self.clock() if now is None else now
+            self.stream.write(self.summary() + "\n")
+            self.stream.flush()
+
+    def _clear(self):
+        """
+        Erase the status area currently drawn.
+        """
+        if self._drawn_lines:
+            self.stream.write("\x1b[{}F\x1b[J".format(self._drawn_lines))
+            self._drawn_lines = 0
+
+    def _draw(self, now=None):
+        """
+        Redraw the status area in a single write.
+        """
+        lines = self.lines()
+        if self.width:
+            lines = [line[:self.width - 1] for line in lines]
+
+        output = ""
+        if self._drawn_lines:
+            output = "\x1b[{}F\x1b[J".format(self._drawn_lines)
+
+        self.stream.write(output + "".join(line + "\n" for line in lines))
+        self.stream.flush()
+
+        self._drawn_lines = len(lines)
+        self._last_draw = self.clock() if now is None else now
@@ -0,0 +1,102 @@
+"""
+Protocol
+========
+
+Wire helpers shared by the daemon and executors to exchange length prefixed JSON
+messages, possibly along file descriptors, over Unix sockets.
+
+"""
+import array
+import json
+import socket
+import struct
+
+
+# Message length prefix and exit code
+HEADER = struct.Struct("!i")
+
+# Standard file descriptors passed along messages
+STANDARD_FDS = (0, 1, 2)
+
+
+def send_message(sock, payload, fds=()):
+    """
+    Send a JSON message possibly with some file descriptors.
+
+    Arguments:
+        sock (socket.socket): Connected Unix socket.
+        payload (dict): Message to send.
+
+    Keyword Arguments:
+        fds (iterable): File descriptors to pass along message.
+    """
+    data = json.dumps(payload).encode("utf-8")
+    data = HEADER.pack(len(data)) + data
+
+    ancillary = []
+    if fds:
+        ancillary = [(
+            socket.SOL_SOCKET,
+            socket.SCM_RIGHTS,
+            array.array("i", fds),
+        )]
+
+    sent = sock.sendmsg([data], ancillary)
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def recv_exactly(sock, size, data=b""):
+    """
+    Receive data from a socket until it has a given size.
+
+    Arguments:
+        sock (socket.socket): Connected socket.
+        size (integer): Expected size.
+
+    Keyword Arguments:
+        data (bytes): Data already received.
+
+    Returns:
+        bytes: Received data.
+    """
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed before end of message")
+        data += chunk
+
+    return data
+
+
+def recv_message(sock, maxfds=len(STANDARD_FDS)):
+    """
+    Receive a JSON message possibly with some file descriptors.
+
+    Arguments:
+        sock (socket.socket): Connected Unix socket.
+
+    Keyword Arguments:
+        maxfds (integer): Maximum number of file descriptors to receive.
+
+    Returns:
+        tuple: Received payload and list of received file descriptors.
+    """
+    fds = array.array("i")
+    data, ancillary, flags, address = sock.recvmsg(
+        65536,
+        socket.CMSG_SPACE(maxfds * fds.itemsize),
+    )
+
+    for level, kind, content in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(content[:len(content) - (len(content) % fds.itemsize)])
+
+    if not data:
+        raise ConnectionError("Connection closed before any message")
+
+    data = recv_exactly(sock, HEADER.size, data)
+    size = HEADER.unpack_from(data)[0]
+    data = recv_exactly(sock, HEADER.size + size, data)
+
+    return json.loads(data[HEADER.size:].decode("utf-8")), list(fds)
@@ -0,0 +1,483 @@
+"""
+Registry
+========
+
+Registry of Makevoke project classes to run a task across many projects.
+
+In a monorepo, each sub-project has its own Makevoke class with its own context like
+``BASE_DIR``. The registry discovers these classes, selects some of them with
+filters and runs a task across them on a thread pool, each in its own directory and
+with its own context: ::
+
+    registry = ProjectRegistry()
+    registry.discover_files("projects/")
+
+    report = registry.run("test", patterns=["api-*"], workers=8, fail_fast=True)
+
+A task is either the name of a class method of project classes which is called
+with an Invoke context, or a callable which receives the project and an Invoke
+context. Invoke contexts are created for each project with its ``BASE_DIR`` as
+working directory.
+
+Project contexts are resolved once and used by tasks through
+``MakevokeBase.use_context()``, so ``run()`` calls from tasks do not resolve them
+again. A relative ``BASE_DIR`` is made absolute from the directory of the module
+defining it (like a sub-project ``tasks.py``), so commands using ``{BASE_DIR}``
+still work from project directory.
+
+"""
+import fnmatch
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .base import MakevokeBase
+from .finder import DEFAULT_EXCLUDES, iter_entries
+
+
+class Project:
+    """
+    A registered project.
+
+    Arguments:
+        klass (class): Makevoke class of project.
+
+    Keyword Arguments:
+        name (string): Project name. Default to class attribute ``PROJECT_NAME`` if
+            any, else the class name.
+
+    Attributes:
+        tags (set): Tags from class attribute ``PROJECT_TAGS``.
+        context (dict): Project context, resolved once on first access with an
+            absolute ``BASE_DIR``, see ``get_module_dir()``.
+        base_dir (Path): Project ``BASE_DIR`` from context.
+    """
+    def __init__(self, klass, name=None):
+        self.klass = klass
+        self.name = name or getattr(klass, "PROJECT_NAME", None) or klass.__name__
+        self.tags = set(getattr(klass, "PROJECT_TAGS", None) or [])
+        self._context = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<Project {}>".format(self.name)
+
+    @property
+    def context(self):
+        with self._lock:
+            if self._context is None:
+                context = self.klass.get_context()
+                if "BASE_DIR" in context:
+                    context["BASE_DIR"] = Path(os.path.abspath(os.path.join(
+                        self.get_module_dir(), context["BASE_DIR"]
+                    )))
+                self._context = context
+
+        return self._context
+
+    def get_module_dir(self):
+        """
+        Get directory of the module defining class ``BASE_DIR`` attribute, relative
+        base directories are resolved from it.
+
+        Returns:
+            string: Module directory, or the current directory if module has no
+            file.
+        """
+        owner = next(
+            (item for item in self.klass.__mro__ if "BASE_DIR" in vars(item)),
+            self.klass,
+        )
+        filename = getattr(sys.modules.get(owner.__module__), "__file__", None)
+
+        return os.path.dirname(os.path.abspath(filename)) if filename else os.getcwd()
+
+    @property
+    def base_dir(self):
+        return self.context.get("BASE_DIR", Path.cwd())
+
+    def get_invoke_context(self, config=None):
+        """
+        Create an Invoke context for project.
+
+        Keyword Arguments:
+            config (invoke.Config): Configuration to use.
+
+        Returns:
+            invoke.Context: Context whose commands run from project base directory.
+        """
+        from invoke import Context
+
+        context = Context(config=config)
+        context.command_cwds.append(str(self.base_dir))
+
+        return context
+
+
+class ProjectResult:
+    """
+    Result of a task for a project.
+
+    Attributes:
+        name (string): Project name.
+        status (string): Either ``success``, ``failed`` or ``skipped`` when not run
+            because of early stop.
+        value (object): Value returned from task.
+        error (Exception): Exception raised from task if any.
+        duration (float): Run duration in seconds.
+    """
+    def __init__(self, name, status, value=None, error=None, duration=0.0):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.duration = duration
+
+    def __repr__(self):
+        return "<ProjectResult {} {}>".format(self.name, self.status)
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            boolean: True if task succeeded.
+        """
+        return self.status == "success"
+
+
+class FanOutReport:
+    """
+    Aggregated results of a task across projects.
+
+    Attributes:
+        results (dict): ``ProjectResult`` objects indexed on project names, in
+            selection order.
+    """
+    def __init__(self, results=None):
+        self.results = results or {}
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            boolean: True if task succeeded for every projects.
+        """
+        return all(result.ok for result in self.results.values())
+
+    def get(self, status):
+        """
+        Arguments:
+            status (string): Result status.
+
+        Returns:
+            list: Names of projects with given status.
+        """
+        return [
+            name for name, result in self.results.items()
+            if result.status == status
+        ]
+
+    @property
+    def succeeded(self):
+        return self.get("success")
+
+    @property
+    def failed(self):
+        return self.get("failed")
+
+    @property
+    def skipped(self):
+        return self.get("skipped")
+
+    def rows(self):
+        """
+        Returns:
+            list: Rows ``[name, status, duration]`` suitable to
+            ``PrintOutAbstract.table()``.
+        """
+        return [
+            [name, result.status, "{:.2f}s".format(result.duration)]
+            for name, result in self.results.items()
+        ]
+
+
+def is_project_class(klass):
+    """
+    Default predicate for project classes.
+
+    Arguments:
+        klass (class): A ``MakevokeBase`` subclass.
+
+    Returns:
+        boolean: True if class defines its own ``BASE_DIR`` attribute.
+    """
+    return "BASE_DIR" in vars(klass)
+
+
+class ProjectRegistry:
+    """
+    Registry of project classes.
+
+    Keyword Arguments:
+        predicate (callable): Function which receives a discovered class and
+            returns True if it is a project class. Default to
+            ``is_project_class()``.
+    """
+    def __init__(self, predicate=None):
+        self.predicate = predicate or is_project_class
+        self.projects = {}
+
+    def __len__(self):
+        return len(self.projects)
+
+    def __iter__(self):
+        return iter(self.projects.values())
+
+    def register(self, klass, name=None):
+        """
+        Register a project class.
+
+        Arguments:
+            klass (class): Makevoke class of project.
+
+        Keyword Arguments:
+            name (string): Project name.
+
+        Returns:
+            Project: Registered project.
+        """
+        project = Project(klass, name=name)
+        registered = self.projects.get(project.name)
+        if registered is not None and registered.klass is not klass:
+            raise ValueError(
+                "A project is already registered with name: {}".format(project.name)
+            )
+
+        self.projects[project.name] = project
+
+        return project
+
+    def discover(self, base=MakevokeBase):
+        """
+        Register every imported subclasses of a base class which are project
+        classes.
+
+        Keyword Arguments:
+            base (class): Base class. Default to ``MakevokeBase``.
+
+        Returns:
+            list: Registered projects.
+        """
+        found = []
+        stack = list(base.__subclasses__())
+        seen = set()
+
+        while stack:
+            klass = stack.pop(0)
+            if klass in seen:
+                continue
+            seen.add(klass)
+            stack.extend(klass.__subclasses__())
+
+            if self.predicate(klass):
+                found.append(self.register(klass))
+
+        return found
+
+    @staticmethod
+    def load_module(path):
+        """
+        Import a tasks module under a name unique to its path, so many modules with
+        the same filename can be imported.
+
+        Arguments:
+            path (string): Module file path.
+
+        Returns:
+            module: The imported module.
+        """
+        path = os.path.abspath(path)
+        name = "makevoke_project_{}".format(
+            hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+        )
+        if name in sys.modules:
+            return sys.modules[name]
+
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+
+        return module
+
+    def discover_files(self, root, filename="tasks.py", exclude=DEFAULT_EXCLUDES):
+        """
+        Import tasks modules from a directory tree and register their project
+        classes.
+
+        Only classes defined in a module are registered, not the ones it imports.
+
+        Arguments:
+            root (string or Path): Directory to walk.
+
+        Keyword Arguments:
+            filename (string): Tasks module filename or glob pattern.
+            exclude (iterable): Glob patterns for directories to never enter.
+
+        Returns:
+            list: Registered projects.
+        """
+        paths = sorted(
+            entry.path
+            for entry, relative_path in iter_entries(
+                root, filename, exclude=exclude, dirs=False
+            )
+        )
+
+        found = []
+        for path in paths:
+            module = self.load_module(path)
+            for value in list(vars(module).values()):
+                if (
+                    isinstance(value, type) and
+                    issubclass(value, MakevokeBase) and
+                    value.__module__ == module.__name__ and
+                    self.predicate(value)
+                ):
+                    found.append(self.register(value))
+
+        return found
+
+    def select(self, names=None, patterns=None, tags=None, predicate=None):
+        """
+        Select projects with filters. Every given filter must match.
+
+        Keyword Arguments:
+            names (iterable): Project names.
+            patterns (iterable): Glob patterns matched against project names.
+            tags (iterable): Tags, projects must have at least one of them.
+            predicate (callable): Function which receives a project and returns True
+                to select it.
+
+        Returns:
+            list: Selected projects sorted on names.
+        """
+        names = set(names) if names is not None else None
+        tags = set(tags) if tags is not None else None
+
+        selected = []
+        for name in sorted(self.projects):
+            project = self.projects[name]
+            if names is not None and name not in names:
+                continue
+            if patterns is not None and not any(
+                fnmatch.fnmatchcase(name, pattern) for pattern in patterns
+            ):
+                continue
+            if tags is not None and not (project.tags & tags):
+                continue
+            if predicate is not None and not predicate(project):
+                continue
+            selected.append(project)
+
+        return selected
+
+    @staticmethod
+    def call(project, task, config=None, **kwargs):
+        """
+        Run a task for a single project, with its resolved context.
+
+        Arguments:
+            project (Project): Project.
+            task (string or callable): Class method name or callable.
+
+        Keyword Arguments:
+            config (invoke.Config): Configuration for Invoke context.
+            **kwargs: Any other keyword arguments are passed to task.
+
+        Returns:
+            ProjectResult: Task result.
+        """
+        start = time.perf_counter()
+        inv = project.get_invoke_context(config=config)
+
+        try:
+            with project.klass.use_context(project.context):
+                if isinstance(task, str):
+                    value = getattr(project.klass, task)(inv, **kwargs)
+                else:
+                    value = task(project, inv, **kwargs)
+        except Exception as error:
+            return ProjectResult(
+                project.name, "failed",
+                error=error,
+                duration=time.perf_counter() - start,
+            )
+
+        status = "failed" if getattr(value, "failed", False) else "success"
+
+        return ProjectResult(
+            project.name, status,
+            value=value,
+            duration=time.perf_counter() - start,
+        )
+
+    def run(self, task, projects=None, workers=4, fail_fast=False, config=None,
+            **kwargs):
+        """
+        Run a task across projects with bounded parallelism.
+
+        Project contexts are resolved once before any run.
+
+        Arguments:
+            task (string or callable): Class method name called with an Invoke
+                context, or callable called with project and an Invoke context.
+
+        Keyword Arguments:
+            projects (iterable): Projects to run. Default to every registered
+                projects sorted on names.
+            workers (integer): Maximum number of projects run at once.
+            fail_fast (boolean): If True, projects not started yet are skipped once
+                a task failed.
+            config (invoke.Config): Configuration for Invoke contexts.
+            **kwargs: Any other keyword arguments are passed to task.
+
+        Returns:
+            FanOutReport: Aggregated results.
+        """
+        projects = self.select() if projects is None else list(projects)
+        for project in projects:
+            project.context
+
+        stop = threading.Event()
+
+        def work(project):
+            if stop.is_set():
+                return ProjectResult(project.name, "skipped")
+
+            result = self.call(project, task, config=config, **kwargs)
+            if fail_fast and not result.ok:
+                stop.set()
+
+            return result
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (project, executor.submit(work, project)) for project in projects
+            ]
+
+        return FanOutReport({
+            project.name: future.result() for project, future in futures
+        })
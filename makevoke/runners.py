@@ -0,0 +1,202 @@
+"""
+Runners
+=======
+
+Run Python callables like commands, either in the current process or on a shared
+process pool, with captured outputs.
+
+A callable receives the Makevoke context as its first argument. Its outputs are
+captured and returned in a ``PythonResult`` which behaves like the ``Result``
+object returned from ``invoke`` runners.
+
+Callables run on the process pool must be picklable (like any function defined at
+module level) and so must be their arguments and return value.
+
+Capture replaces ``sys.stdout`` and ``sys.stderr`` which are shared by every
+threads of a process. So callables run in the current process are run one at a
+time, and anything printed meanwhile by other threads is captured too. Use the
+process pool to run callables concurrently.
+
+"""
+import atexit
+import contextlib
+import io
+import sys
+import threading
+import traceback
+
+from invoke.exceptions import UnexpectedExit
+from invoke.runners import Result
+
+
+class PythonResult(Result):
+    """
+    Result of a Python callable run.
+
+    Attributes:
+        return_value (object): Value returned from callable, None if it failed.
+    """
+    def __init__(self, return_value=None, **kwargs):
+        super().__init__(**kwargs)
+        self.return_value = return_value
+
+
+def get_callable_name(func):
+    """
+    Get a readable name for a callable.
+
+    Arguments:
+        func (callable): Any callable.
+
+    Returns:
+        string: Callable module and qualified name.
+    """
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", None)
+    if name is None:
+        return repr(func)
+
+    return "{}.{}".format(getattr(func, "__module__", "?"), name)
+
+
+# Outputs redirection is process wide, captured calls have to be serialized. A
+# captured call may itself run another one from the same thread.
+_CAPTURE_LOCK = threading.RLock()
+
+
+def call_captured(func, context, args=(), kwargs=None):
+    """
+    Call a function with captured outputs.
+
+    Any exception is caught: ``SystemExit`` code is used as exit code and any other
+    exception is written to captured error output with exit code 1.
+
+    Calls from many threads are run one at a time since output redirection is
+    process wide.
+
+    Arguments:
+        func (callable): Function to call with context as first argument.
+        context (dict): Makevoke context.
+
+    Keyword Arguments:
+        args (tuple): Positional arguments to pass after context.
+        kwargs (dict): Keyword arguments to pass.
+
+    Returns:
+        tuple: A tuple ``(return_value, stdout, stderr, exited)``.
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    return_value = None
+    exited = 0
+
+    with _CAPTURE_LOCK:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                return_value = func(context, *args, **(kwargs or {}))
+            except SystemExit as error:
+                if error.code is None:
+                    exited = 0
+                elif isinstance(error.code, int):
+                    exited = error.code
+                else:
+                    print(error.code, file=sys.stderr)
+                    exited = 1
+            except Exception:
+                traceback.print_exc()
+                exited = 1
+
+    return return_value, stdout.getvalue(), stderr.getvalue(), exited
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_process_pool(workers=None):
+    """
+    Get the process pool shared during the session.
+
+    Pool is created on first call, its worker processes are started on demand and
+    reused by every next runs. It is shut down on interpreter exit.
+
+    Keyword Arguments:
+        workers (integer): Maximum number of worker processes, only used when pool
+            is created. Default to the ``ProcessPoolExecutor`` default.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: The shared pool.
+    """
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            _POOL = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(shutdown_process_pool)
+
+    return _POOL
+
+
+def shutdown_process_pool():
+    """
+    Shut down the shared process pool if it has been created.
+    """
+    global _POOL
+
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def run_python(func, context, args=(), kwargs=None, pool=False, hide=False,
+               warn=False):
+    """
+    Run a Python callable like a command.
+
+    Arguments:
+        func (callable): Function to call with context as first argument.
+        context (dict): Makevoke context.
+
+    Keyword Arguments:
+        args (tuple): Positional arguments to pass after context.
+        kwargs (dict): Keyword arguments to pass.
+        pool (boolean): If True, callable is run on the shared process pool, else
+            it is run in current process.
+        hide (boolean): If True, captured outputs are not printed.
+        warn (boolean): If True, a failure does not raise an exception.
+
+    Returns:
+        PythonResult: Result with captured outputs, exit code and returned value.
+    """
+    if pool:
+        future = get_process_pool().submit(
+            call_captured, func, context, args=tuple(args), kwargs=kwargs,
+        )
+        return_value, stdout, stderr, exited = future.result()
+    else:
+        return_value, stdout, stderr, exited = call_captured(
+            func, context, args=args, kwargs=kwargs,
+        )
+
+    if not hide:
+        sys.stdout.write(stdout)
+        sys.stdout.flush()
+        sys.stderr.write(stderr)
+        sys.stderr.flush()
+
+    result = PythonResult(
+        return_value=return_value,
+        stdout=stdout,
+        stderr=stderr,
+        command=get_callable_name(func),
+        exited=exited,
+        hide=("stdout", "stderr") if hide else (),
+    )
+
+    if not result.ok and not warn:
+        raise UnexpectedExit(result)
+
+    return result
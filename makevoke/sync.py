@@ -0,0 +1,439 @@
+"""
+Sync
+====
+
+Incremental one way synchronization of a directory tree to another one.
+
+Files are compared on their size and modification time (and optionally on their
+content digest) and only changed files are copied. Copies are made by the kernel
+with ``os.copy_file_range`` or ``os.sendfile`` when available so file content never
+goes through Python, and they run from a thread pool.
+
+"""
+import os
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from .cleaner import remove_entry
+from .finder import compile_patterns
+from .utils import file_digest, format_size
+
+
+# Chunk size for each kernel copy call
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _kernel_copy(function, source_fd, destination_fd, size):
+    copied = 0
+    while copied < size:
+        sent = function(source_fd, destination_fd, min(COPY_CHUNK_SIZE, size - copied))
+        if not sent:
+            break
+        copied += sent
+
+    return copied
+
+
+def copy_file_content(source, destination, size=None):
+    """
+    Copy content of a file to a new file.
+
+    It tries ``os.copy_file_range``, then ``os.sendfile`` and finally falls back to
+    a buffered copy if none is available or supported by filesystems.
+
+    Arguments:
+        source (string): Source file path.
+        destination (string): Destination file path, it is truncated if it exists.
+
+    Keyword Arguments:
+        size (integer): Source file size if already known.
+
+    Returns:
+        integer: Copied size in bytes.
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        if size is None:
+            size = os.fstat(src.fileno()).st_size
+
+        for name in ("copy_file_range", "sendfile"):
+            function = getattr(os, name, None)
+            if function is None:
+                continue
+
+            if name == "copy_file_range":
+                def call(source_fd, destination_fd, count):
+                    return os.copy_file_range(source_fd, destination_fd, count)
+            else:
+                def call(source_fd, destination_fd, count):
+                    return os.sendfile(destination_fd, source_fd, None, count)
+
+            try:
+                copied = _kernel_copy(call, src.fileno(), dst.fileno(), size)
+            except OSError:
+                # Not supported between these filesystems, restart from scratch
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                continue
+
+            if copied == size:
+                return copied
+
+            # File has changed during copy, finish it with a buffered copy
+            src.seek(copied)
+            dst.seek(copied)
+            shutil.copyfileobj(src, dst)
+            return dst.tell()
+
+        shutil.copyfileobj(src, dst)
+        return dst.tell()
+
+
+def copy_file(source, destination, status):
+    """
+    Copy a file with its permissions and modification time.
+
+    Content is copied to a temporary file next to destination which then replaces
+    destination, so destination is never left partially written.
+
+    Arguments:
+        source (string): Source file path.
+        destination (string): Destination file path.
+        status (os.stat_result): Source file status.
+
+    Returns:
+        integer: Copied size in bytes.
+    """
+    directory, name = os.path.split(destination)
+    tmp_path = os.path.join(directory, ".{}.{}.tmp".format(name, os.getpid()))
+
+    try:
+        copied = copy_file_content(source, tmp_path, size=status.st_size)
+        os.chmod(tmp_path, stat.S_IMODE(status.st_mode))
+        os.utime(tmp_path, ns=(status.st_atime_ns, status.st_mtime_ns))
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return copied
+
+
+class SyncReport:
+    """
+    Report of a synchronization.
+
+    Every path is relative to synchronized directories with ``/`` as separator.
+
+    Attributes:
+        created (list): Paths of files, links and directories created in
+            destination.
+        updated (list): Paths of files and links replaced in destination.
+        deleted (list): Paths of stale destination entries which have been removed.
+        unchanged (integer): Number of files which did not need any copy.
+        size (integer): Total size in bytes of copied files.
+        errors (list): List of tuples ``(path, error)``.
+        dry_run (boolean): True if nothing has been changed.
+    """
+    def __init__(self, dry_run=False):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.unchanged = 0
+        self.size = 0
+        self.errors = []
+        self.dry_run = dry_run
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            boolean: True if there is no error.
+        """
+        return not self.errors
+
+    @property
+    def changed(self):
+        """
+        Returns:
+            boolean: True if anything has been created, updated or deleted.
+        """
+        return bool(self.created or self.updated or self.deleted)
+
+
+def is_same_file(source_status, destination_status, source=None, destination=None,
+                 checksum=False):
+    """
+    Compare a source file to its destination.
+
+    Arguments:
+        source_status (os.stat_result): Source file status.
+        destination_status (os.stat_result): Destination file status.
+
+    Keyword Arguments:
+        source (string): Source file path, required for checksum.
+        destination (string): Destination file path, required for checksum.
+        checksum (boolean): If True, files with the same size are compared on their
+            content digest instead of their modification time.
+
+    Returns:
+        boolean: True if files are the same.
+    """
+    if source_status.st_size != destination_status.st_size:
+        return False
+
+    if source_status.st_mtime_ns == destination_status.st_mtime_ns:
+        return True
+
+    if checksum:
+        return file_digest(source) == file_digest(destination)
+
+    return False
+
+
+def sync_tree(source, destination, exclude=None, delete=False, checksum=False,
+              dry_run=False, workers=None):
+    """
+    Synchronize a directory tree to a destination directory.
+
+    Arguments:
+        source (string or Path): Source directory.
+        destination (string or Path): Destination directory, it is created if it
+            does not exist.
+
+    Keyword Arguments:
+        exclude (iterable): Glob patterns of source entries to ignore, see
+            ``makevoke.finder``. Excluded destination entries are never deleted.
+        delete (boolean): If True, destination entries which do not exist in source
+            are removed.
+        checksum (boolean): If True, files with the same size but a different
+            modification time are compared on their content digest and only copied
+            if content differs.
+        dry_run (boolean): If True, nothing is changed and report describes what
+            would be done.
+        workers (integer): Maximum number of threads for copies. Default to the
+            ``ThreadPoolExecutor`` default.
+
+    Returns:
+        SyncReport: Synchronization report.
+    """
+    report = SyncReport(dry_run=dry_run)
+    excluder = compile_patterns(exclude) if exclude else None
+
+    def list_directory(path, relative):
+        entries = {}
+        try:
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    relative_path = relative + entry.name
+                    if excluder is not None and excluder.match(
+                        relative_path, entry.name
+                    ):
+                        continue
+                    entries[entry.name] = entry
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+
+        return entries
+
+    def compare_and_copy(source_path, destination_path, relative_path, existing):
+        source_status = os.stat(source_path)
+
+        if existing == "file":
+            if is_same_file(
+                source_status,
+                os.stat(destination_path),
+                source=source_path,
+                destination=destination_path,
+                checksum=checksum,
+            ):
+                if not dry_run and checksum:
+                    os.utime(
+                        destination_path,
+                        ns=(source_status.st_atime_ns, source_status.st_mtime_ns),
+                    )
+                return None, relative_path, 0
+        elif existing is not None and not dry_run:
+            # Destination is a directory or a link to replace
+            remove_entry(destination_path)
+
+        size = source_status.st_size
+        if not dry_run:
+            size = copy_file(source_path, destination_path, source_status)
+
+        return ("created" if existing is None else "updated"), relative_path, size
+
+    def copy_link(source_path, destination_path):
+        target = os.readlink(source_path)
+        if os.path.lexists(destination_path):
+            if (
+                os.path.islink(destination_path) and
+                os.readlink(destination_path) == target
+            ):
+                return None
+            if not dry_run:
+                remove_entry(destination_path)
+            state = "updated"
+        else:
+            state = "created"
+
+        if not dry_run:
+            os.symlink(target, destination_path)
+
+        return state
+
+    if not dry_run:
+        os.makedirs(destination, exist_ok=True)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        stack = [(os.fspath(source), os.fspath(destination), "")]
+        while stack:
+            source_dir, destination_dir, relative = stack.pop()
+
+            sources = list_directory(source_dir, relative)
+            destinations = list_directory(destination_dir, relative)
+
+            if delete:
+                for name in sorted(set(destinations) - set(sources)):
+                    relative_path = relative + name
+                    entries, size, errors = remove_entry(
+                        destinations[name].path, dry_run=dry_run
+                    )
+                    report.errors.extend(errors)
+                    report.deleted.append(relative_path)
+
+            subdirs = []
+            for name, entry in sorted(sources.items()):
+                relative_path = relative + name
+                destination_path = os.path.join(destination_dir, name)
+                existing = destinations.get(name)
+
+                try:
+                    if entry.is_symlink():
+                        state = copy_link(entry.path, destination_path)
+                        if state is None:
+                            report.unchanged += 1
+                        else:
+                            getattr(report, state).append(relative_path)
+                        continue
+
+                    if entry.is_dir():
+                        if existing is not None and not existing.is_dir(
+                            follow_symlinks=False
+                        ):
+                            if not dry_run:
+                                remove_entry(existing.path)
+                            report.updated.append(relative_path)
+                            existing = None
+                        elif existing is None:
+                            report.created.append(relative_path)
+
+                        if existing is None and not dry_run:
+                            os.mkdir(destination_path)
+
+                        subdirs.append(
+                            (entry.path, destination_path, relative_path + "/")
+                        )
+                        continue
+
+                    if existing is None:
+                        existing_kind = None
+                    elif existing.is_symlink() or existing.is_dir():
+                        existing_kind = "other"
+                    else:
+                        existing_kind = "file"
+                except OSError as error:
+                    report.errors.append((relative_path, error))
+                    continue
+
+                futures.append((relative_path, executor.submit(
+                    compare_and_copy,
+                    entry.path,
+                    destination_path,
+                    relative_path,
+                    existing_kind,
+                )))
+
+            stack.extend(reversed(subdirs))
+
+        for relative_path, future in futures:
+            try:
+                state, path, size = future.result()
+            except OSError as error:
+                report.errors.append((relative_path, error))
+                continue
+
+            if state is None:
+                report.unchanged += 1
+            else:
+                getattr(report, state).append(path)
+                report.size += size
+
+    return report
+
+
+class SyncAbstract:
+    """
+    This class implements a method to synchronize directory trees.
+
+    Depends on ``PrintOutAbstract`` alike since it prints its report with printout
+    methods.
+    """
+    @classmethod
+    def sync(cls, source, destination, exclude=None, delete=False, checksum=False,
+             dry_run=False, workers=None, verbose=False):
+        """
+        Synchronize a directory tree to a destination directory and print a
+        summary.
+
+        Arguments and keyword arguments are the same than ``sync_tree()`` except:
+
+        Keyword Arguments:
+            verbose (boolean): If True, list every changes. Dry run always lists them.
+
+        Returns:
+            SyncReport: Synchronization report.
+        """
+        report = sync_tree(
+            source,
+            destination,
+            exclude=exclude,
+            delete=delete,
+            checksum=checksum,
+            dry_run=dry_run,
+            workers=workers,
+        )
+
+        if verbose or dry_run:
+            for label, paths in (
+                ("created", report.created),
+                ("updated", report.updated),
+                ("deleted", report.deleted),
+            ):
+                for path in sorted(paths):
+                    cls.dotitem("{} {}".format(label, path))
+
+        for path, error in report.errors:
+            cls.error("Unable to sync '{}': {}".format(path, error))
+
+        cls.info(
+            (
+                "{prefix}{created} created, {updated} updated, {deleted} deleted, "
+                "{unchanged} unchanged ({size} copied)"
+            ).format(
+                prefix="Dry run: " if dry_run else "",
+                created=len(report.created),
+                updated=len(report.updated),
+                deleted=len(report.deleted),
+                unchanged=report.unchanged,
+                size=format_size(report.size),
+            )
+        )
+
+        return report
@@ -0,0 +1,251 @@
+"""
+Templating
+==========
+
+Render template files with the Makevoke context.
+
+Templates use the same format syntax as command lines given to
+``MakevokeBase.run()``, like ``listen {PORT};``. Literal braces have to be doubled.
+
+Templates are parsed once and cached until their file changes. A rendered file is
+only written when its content differs from the existing one, so its modification
+time does not change for nothing.
+
+"""
+import os
+import string
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .exceptions import MakevokeTemplateError
+
+
+class Template:
+    """
+    A parsed template.
+
+    Arguments:
+        source (string): Template content.
+
+    Keyword Arguments:
+        name (string): Template name used in error messages.
+
+    Attributes:
+        fields (list): Names of context variables used in template.
+        segments (list): Parsed template as tuples ``(literal, field, spec,
+            conversion)`` from ``string.Formatter.parse()``.
+    """
+    formatter = string.Formatter()
+
+    def __init__(self, source, name="<string>"):
+        self.source = source
+        self.name = name
+
+        try:
+            self.segments = list(self.formatter.parse(source))
+        except ValueError as error:
+            raise MakevokeTemplateError(
+                "Invalid template '{}': {}".format(name, error)
+            )
+
+        fields = []
+        for literal, field, spec, conversion in self.segments:
+            if field is None:
+                continue
+            if field == "" or field.isdigit():
+                raise MakevokeTemplateError(
+                    "Invalid template '{}': positional fields are not "
+                    "allowed".format(name)
+                )
+            base = field.split(".", 1)[0].split("[", 1)[0]
+            if base not in fields:
+                fields.append(base)
+
+        self.fields = fields
+
+    def render(self, context):
+        """
+        Render template with a context.
+
+        Arguments:
+            context (dict): Context variables.
+
+        Returns:
+            string: Rendered content.
+        """
+        missing = [name for name in self.fields if name not in context]
+        if missing:
+            raise MakevokeTemplateError(
+                "Template '{}' uses undefined context variables: {}".format(
+                    self.name, ", ".join(missing)
+                )
+            )
+
+        parts = []
+        for literal, field, spec, conversion in self.segments:
+            parts.append(literal)
+            if field is None:
+                continue
+
+            value = self.formatter.get_field(field, (), context)[0]
+            value = self.formatter.convert_field(value, conversion)
+            # Format specification may itself contain fields like '{PORT:>{WIDTH}}'
+            if "{" in spec:
+                spec = self.formatter.vformat(spec, (), context)
+            parts.append(format(value, spec))
+
+        return "".join(parts)
+
+
+_TEMPLATES = {}
+_TEMPLATES_LOCK = threading.Lock()
+
+
+def load_template(path, encoding="utf-8"):
+    """
+    Load a parsed template from a file.
+
+    Parsed templates are cached until their file modification time or size has
+    changed.
+
+    Arguments:
+        path (string or Path): Template file path.
+
+    Keyword Arguments:
+        encoding (string): Template file encoding.
+
+    Returns:
+        Template: Parsed template.
+    """
+    path = os.path.abspath(path)
+    status = os.stat(path)
+    key = (status.st_mtime_ns, status.st_size)
+
+    with _TEMPLATES_LOCK:
+        cached = _TEMPLATES.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, "r", encoding=encoding) as fp:
+        template = Template(fp.read(), name=path)
+
+    with _TEMPLATES_LOCK:
+        _TEMPLATES[path] = (key, template)
+
+    return template
+
+
+def write_if_changed(path, content, encoding="utf-8"):
+    """
+    Write content to a file only if it differs from the existing file content.
+
+    File is written atomically through a temporary file and keeps the permissions of
+    existing file. A new file is created with default permissions from the process
+    umask, applied by the system so it is safe to call from many threads.
+
+    Arguments:
+        path (string or Path): Destination file path.
+        content (string or bytes): Content to write.
+
+    Keyword Arguments:
+        encoding (string): Encoding for a string content.
+
+    Returns:
+        boolean: True if file has been written.
+    """
+    path = os.fspath(path)
+    data = content.encode(encoding) if isinstance(content, str) else content
+
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        status = None
+
+    if status is not None and status.st_size == len(data):
+        with open(path, "rb") as fp:
+            if fp.read() == data:
+                return False
+
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, ".{}.{}.tmp".format(name, uuid.uuid4().hex))
+    mode = 0o666 if status is None else status.st_mode & 0o7777
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, mode)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            # Umask does not apply to permissions of an existing file
+            if status is not None:
+                os.fchmod(fp.fileno(), mode)
+            fp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return True
+
+
+class TemplatingAbstract:
+    """
+    This class implements methods to render template files with the Makevoke
+    context.
+
+    Depends on ``MakevokeBase`` alike since it uses ``get_context()``.
+    """
+    @classmethod
+    def render_template(cls, source, destination, extra=None, encoding="utf-8"):
+        """
+        Render a template file with Makevoke context to a destination file.
+
+        Destination is only written if its content has changed.
+
+        Arguments:
+            source (string or Path): Template file path.
+            destination (string or Path): Destination file path.
+
+        Keyword Arguments:
+            extra (dict): A dictionnary for extra variable to pass into Makefile
+                context.
+            encoding (string): Encoding for template and destination files.
+
+        Returns:
+            boolean: True if destination has been written.
+        """
+        context = cls.get_context(extra=extra)
+
+        return write_if_changed(
+            destination,
+            load_template(source, encoding=encoding).render(context),
+            encoding=encoding,
+        )
+
+    @classmethod
+    def render_templates(cls, templates, extra=None, encoding="utf-8", workers=None):
+        """
+        Render many template files concurrently.
+
+        Arguments:
+            templates (iterable): Tuples ``(source, destination)`` of file paths.
+
+        Keyword Arguments:
+            extra (dict): A dictionnary for extra variable to pass into Makefile
+                context.
+            encoding (string): Encoding for template and destination files.
+            workers (integer): Maximum number of threads. Default to the
+                ``ThreadPoolExecutor`` default.
+
+        Returns:
+            dict: For each destination, True if it has been written.
+        """
+        context = cls.get_context(extra=extra)
+
+        def render(item):
+            source, destination = item
+            return destination, write_if_changed(
+                destination,
+                load_template(source, encoding=encoding).render(context),
+                encoding=encoding,
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(executor.map(render, list(templates)))
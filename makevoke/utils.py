@@ -1,19 +1,325 @@
+import functools
+import hashlib
+import mmap
+import os
 import re
+import unicodedata
+
+
+# Escape sequence alternatives, any of them starts with an ESC character
+ANSI_SEQUENCE = (
+    # CSI sequences like colors (SGR), cursor movements or erasing
+    r"\[[0-?]*[ -/]*[@-~]"
+    # OSC sequences like hyperlinks or window titles, terminated by BEL or ST
+    r"|\][^\x07\x1b]*(?:\x07|\x1b\\)"
+    # DCS, SOS, PM and APC strings terminated by ST
+    r"|[PX^_][^\x1b]*\x1b\\"
+    # nF sequences like character set designations
+    r"|[ -/]+[0-~]"
+    # Any other two characters sequences
+    r"|[0-OQ-WYZ\\`-~]"
+)
+
+# Start of a sequence which is not terminated at the end of a chunk
+ANSI_PARTIAL = (
+    r"(?:\[[0-?]*[ -/]*"
+    r"|\][^\x07\x1b]*\x1b?"
+    r"|[PX^_][^\x1b]*\x1b?"
+    r"|[ -/]*)\Z"
+)
+
+ANSI_PATTERN = re.compile("\x1b(?:" + ANSI_SEQUENCE + ")")
+ANSI_BYTES_PATTERN = re.compile(ANSI_PATTERN.pattern.encode("ascii"))
+ANSI_PARTIAL_PATTERN = re.compile("\x1b" + ANSI_PARTIAL)
+ANSI_PARTIAL_BYTES_PATTERN = re.compile(ANSI_PARTIAL_PATTERN.pattern.encode("ascii"))
 
 
 def clean_ansi(value):
     """
-    Remove ANSI code from a string (not bytes object).
+    Remove ANSI escape sequences from a string or a bytes object.
 
-    .. Note::
-        Code has been stealed and adapted
-        from: https://github.com/ewen-lbh/python-strip-ansi
+    This covers SGR codes (colors, styles) but also every other CSI sequences (like
+    cursor movements), OSC sequences (like hyperlinks) and other escape sequences.
+    Value without any escape character is returned immediately.
 
     Arguments:
-        value (string): A string for which to remove its included ANSI codes.
+        value (string or bytes): A string or bytes for which to remove its included
+            ANSI codes.
 
     Returns:
-        string: Given value with all ANSI codes removed.
+        string or bytes: Given value with all ANSI codes removed.
+    """
+    if isinstance(value, str):
+        if "\x1b" not in value:
+            return value
+
+        return ANSI_PATTERN.sub("", value)
+
+    if b"\x1b" not in value:
+        return value
+
+    return ANSI_BYTES_PATTERN.sub(b"", value)
+
+
+@functools.lru_cache(maxsize=4096)
+def display_width(value):
     """
-    pattern = re.compile(r"\x1B\[\d+(;\d+){0,2}m")
-    return pattern.sub("", value)
+    Compute the visible width of a string in a terminal.
+
+    ANSI escape sequences are ignored, wide and fullwidth characters are counted
+    twice and combining or format characters are not counted. Results are cached
+    since table cells often repeat the same values.
+
+    Arguments:
+        value (string): String to measure.
+
+    Returns:
+        integer: Number of terminal columns used by the string.
+    """
+    value = clean_ansi(value)
+
+    if value.isascii():
+        return len(value)
+
+    width = 0
+    for char in value:
+        if unicodedata.combining(char) or unicodedata.category(char) in ("Me", "Cf"):
+            continue
+
+        width += 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+    return width
+
+
+class AnsiStreamCleaner:
+    """
+    Remove ANSI escape sequences from a stream of chunks.
+
+    An escape sequence may be split between two chunks, so the start of an
+    unterminated sequence at the end of a chunk is held until the next chunk. Held
+    content is limited to ``MAX_PENDING`` characters, beyond it content is released
+    as it is.
+
+    Usage sample: ::
+
+        cleaner = AnsiStreamCleaner()
+        for chunk in chunks:
+            output.write(cleaner.feed(chunk))
+        output.write(cleaner.flush())
+
+    Keyword Arguments:
+        binary (boolean): If True, chunks are expected to be bytes else strings.
+            Default to False.
+    """
+    MAX_PENDING = 4096
+
+    def __init__(self, binary=False):
+        self.binary = binary
+
+        if binary:
+            self._empty = b""
+            self._escape = b"\x1b"
+            self._pattern = ANSI_BYTES_PATTERN
+            self._partial = ANSI_PARTIAL_BYTES_PATTERN
+        else:
+            self._empty = ""
+            self._escape = "\x1b"
+            self._pattern = ANSI_PATTERN
+            self._partial = ANSI_PARTIAL_PATTERN
+
+        self._pending = self._empty
+
+    def feed(self, chunk):
+        """
+        Clean a chunk.
+
+        Arguments:
+            chunk (string or bytes): Chunk to clean.
+
+        Returns:
+            string or bytes: Cleaned content, it may be shorter than the chunk since
+            an unterminated sequence at the end is held for the next chunk.
+        """
+        data = self._pending + chunk if self._pending else chunk
+        self._pending = self._empty
+
+        start = max(len(data) - self.MAX_PENDING, 0)
+        if self._escape not in data[start:]:
+            return clean_ansi(data)
+
+        partial = self._partial.search(data, start)
+        if partial:
+            self._pending = data[partial.start():]
+            data = data[:partial.start()]
+
+        return clean_ansi(data)
+
+    def flush(self):
+        """
+        Release any held content once there is no more chunk.
+
+        Returns:
+            string or bytes: Held content, cleaned.
+        """
+        data = self._pending
+        self._pending = self._empty
+
+        return clean_ansi(data)
+
+
+def clean_ansi_file(source, destination, chunk_size=1024 * 1024):
+    """
+    Write a copy of a file with all ANSI escape sequences removed.
+
+    Source file is memory mapped so it is scanned in a single pass without to be
+    loaded in memory and unchanged parts are written without any copy. If source can
+    not be memory mapped (like a pipe), it is read by chunks instead.
+
+    Arguments:
+        source (string or Path): Source file path.
+        destination (string or Path): Destination file path.
+
+    Keyword Arguments:
+        chunk_size (integer): Size in bytes of chunks to read when source can not be
+            memory mapped.
+
+    Returns:
+        integer: Number of bytes written.
+    """
+    written = 0
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            mapped = None
+
+        if mapped is None:
+            cleaner = AnsiStreamCleaner(binary=True)
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                written += dst.write(cleaner.feed(chunk))
+            written += dst.write(cleaner.flush())
+
+            return written
+
+        with mapped, memoryview(mapped) as view:
+            position = 0
+
+            if mapped.find(b"\x1b") != -1:
+                for match in ANSI_BYTES_PATTERN.finditer(mapped):
+                    if match.start() > position:
+                        written += dst.write(view[position:match.start()])
+                    position = match.end()
+
+            written += dst.write(view[position:])
+
+    return written
+
+
+def file_digest(path):
+    """
+    Compute the SHA256 hexadecimal digest of a file content.
+
+    Arguments:
+        path (string): File path.
+
+    Returns:
+        string: Hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def format_size(size):
+    """
+    Format a size in bytes to a human readable string with binary units.
+
+    Arguments:
+        size (integer): Size in bytes.
+
+    Returns:
+        string: Formatted size like ``512 B`` or ``1.5 KiB``.
+    """
+    if size < 1024:
+        return "{} B".format(size)
+
+    for unit in ("KiB", "MiB", "GiB", "TiB"):
+        size /= 1024
+        if size < 1024 or unit == "TiB":
+            break
+
+    return "{:.1f} {}".format(size, unit)
+
+
+def get_cache_dir():
+    """
+    Get the default directory for Makevoke cache files.
+
+    Returns:
+        string: Directory path from ``XDG_CACHE_HOME`` if defined, else
+        ``~/.cache/makevoke``.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+
+    return os.path.join(base, "makevoke")
+
+
+def lookahead(iterable):
+    """
+    Iterate over any iterable with a lookahead of one item to know about the last
+    one.
+
+    Arguments:
+        iterable (iterable): Any iterable, including generators.
+
+    Returns:
+        generator: Yield a tuple ``(item, is_last)`` for each item.
+    """
+    iterator = iter(iterable)
+
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+
+    for item in iterator:
+        yield previous, False
+        previous = item
+
+    yield previous, True
+
+
+def scandir_tree(path, sort=False):
+    """
+    Lazily build a tree of a directory content suitable to
+    ``PrintOutAbstract.tree()``.
+
+    Directories are scanned only when their children are iterated so memory usage
+    does not depend on the tree size. Symbolic links to directories are not followed.
+
+    Arguments:
+        path (string or Path): Directory path to scan.
+
+    Keyword Arguments:
+        sort (boolean): If True, entries of each directory are sorted by name. This
+            requires to hold a whole directory listing in memory. Default to False.
+
+    Returns:
+        generator: Yield a tuple ``(name, children)`` for directories where
+        ``children`` is a generator alike for the directory content, or the name
+        for any other entry.
+    """
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda x: x.name) if sort else it
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield entry.name + "/", scandir_tree(entry.path, sort=sort)
+            else:
+                yield entry.name
@@ -1,5 +1,45 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from .executables import get_resolver
+from .finder import DEFAULT_EXCLUDES, iter_matches
+
+
+class PathValidationReport:
+    """
+    Report of a batch path validation.
+
+    Attributes:
+        valid (list): List of tuples ``(name, path)`` for validated paths where path
+            is a ``Path`` object.
+        errors (list): List of tuples ``(name, path, status)`` for invalid paths
+            where status is one of ``empty``, ``missing``, ``isfile`` or ``isdir``.
+    """
+    def __init__(self):
+        self.valid = []
+        self.errors = []
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def ok(self):
+        """
+        Returns:
+            boolean: True if there is no error.
+        """
+        return not self.errors
+
+    @property
+    def paths(self):
+        """
+        Returns:
+            list: Validated ``Path`` objects.
+        """
+        return [path for name, path in self.valid]
+
 
 class ArgValidatorAbstract:
     """
@@ -10,7 +50,99 @@ class ArgValidatorAbstract:
     Since it depends on printout methods, it requires to be associated with a class
     which implements printout methods like in ``PrintOutAbstract``, either you use this
     class or implement it with another printer solution.
+
+    Every path validation performs a single ``stat`` system call and takes every
+    answer from its result. Status can be shared between validations during a session
+    with a ``makevoke.cache.StatCache`` object set on ``STAT_CACHE`` attribute: ::
+
+        from makevoke.cache import StatCache
+
+        class Makefile(ArgValidatorAbstract, PrintOutAbstract):
+            STAT_CACHE = StatCache()
     """
+    STAT_CACHE = None
+    EXECUTABLE_RESOLVER = None
+    PATH_STATUS_LABELS = {
+        "empty": "value is empty",
+        "missing": "does not exists",
+        "isfile": "is a file",
+        "isdir": "is a directory",
+    }
+
+    @classmethod
+    def stat_path(cls, path):
+        """
+        Get status of a path.
+
+        Arguments:
+            path (string or Path): A filesystem path.
+
+        Returns:
+            os.stat_result: The path status or None if path does not exist or can
+            not be reached.
+        """
+        if cls.STAT_CACHE is not None:
+            return cls.STAT_CACHE.stat(path)
+
+        try:
+            return os.stat(path)
+        except OSError:
+            # Like a symbolic link loop, a denied access or a too long name
+            return None
+
+    @classmethod
+    def check_path(cls, value, kind="path"):
+        """
+        Check a path value with a single status lookup.
+
+        Arguments:
+            value (string): A filesystem path.
+
+        Keyword Arguments:
+            kind (string): Kind of expected path, either ``path`` for any existing
+                path, ``dir`` for a path which is not a file or ``file`` for a path
+                which is not a directory. Default to ``path``.
+
+        Returns:
+            tuple: A tuple ``(status, path)`` where status is either ``valid``,
+            ``empty``, ``missing``, ``isfile`` or ``isdir`` and path is the value
+            coerced to a ``Path`` object (or None if value is empty).
+        """
+        if not value:
+            return "empty", None
+
+        path = Path(value)
+        status = cls.stat_path(path)
+
+        if status is None:
+            return "missing", path
+
+        if kind == "dir" and stat.S_ISREG(status.st_mode):
+            return "isfile", path
+
+        if kind == "file" and stat.S_ISDIR(status.st_mode):
+            return "isdir", path
+
+        return "valid", path
+
+    @classmethod
+    def _validate_checked_path(cls, value, kind, name, loglevel, messages):
+        """
+        Check a path value and print the message related to the error if any.
+
+        Returns:
+            Path or boolean: The path if valid, None if empty or False for any other
+            error.
+        """
+        status, path = cls.check_path(value, kind=kind)
+
+        if status == "valid":
+            return path
+
+        getattr(cls, loglevel)(messages[status].format(argname=name, dest=path))
+
+        return None if status == "empty" else False
+
     @classmethod
     def validate_path(
         cls,
@@ -43,19 +175,10 @@ class ArgValidatorAbstract:
             Returns None if value is empty. Returns False if path either does not
             exists or is a file.
         """
-        if not value:
-            getattr(cls, loglevel)(error_empty.format(argname=name))
-            return None
-
-        value = Path(value)
-
-        if not value.exists():
-            getattr(cls, loglevel)(
-                error_doesnotexists.format(argname=name, dest=value)
-            )
-            return False
-
-        return value
+        return cls._validate_checked_path(value, "path", name, loglevel, {
+            "empty": error_empty,
+            "missing": error_doesnotexists,
+        })
 
     @classmethod
     def validate_dir_path(
@@ -92,19 +215,11 @@ class ArgValidatorAbstract:
             Path or boolean: Returns the coerced path if validated. Returns None if
             value is empty. Returns False if path either does not exists or is a file.
         """
-        value = cls.validate_path(
-            value,
-            name=name,
-            loglevel=loglevel,
-            error_empty=error_empty,
-            error_doesnotexists=error_doesnotexists,
-        )
-
-        if value.is_file():
-            getattr(cls, loglevel)(error_isfile.format(argname=name, dest=value))
-            return False
-
-        return value
+        return cls._validate_checked_path(value, "dir", name, loglevel, {
+            "empty": error_empty,
+            "missing": error_doesnotexists,
+            "isfile": error_isfile,
+        })
 
     @classmethod
     def validate_file_path(
@@ -141,16 +256,270 @@ class ArgValidatorAbstract:
             Path or boolean: Returns the coerced path if validated. Returns None if
             value is empty. Returns False if path either does not exists or is a file.
         """
-        value = cls.validate_path(
-            value,
-            name=name,
-            loglevel=loglevel,
-            error_empty=error_empty,
-            error_doesnotexists=error_doesnotexists,
+        return cls._validate_checked_path(value, "file", name, loglevel, {
+            "empty": error_empty,
+            "missing": error_doesnotexists,
+            "isdir": error_isdir,
+        })
+
+    @classmethod
+    def validate_paths(
+        cls,
+        values,
+        kind="path",
+        name="paths",
+        loglevel="critical",
+        workers=None,
+        error_summary=(
+            "Argument '{argname}' has {count} invalid path(s):"
+        ),
+        error_item=(
+            "- {dest}: {reason}"
+        ),
+    ):
+        """
+        Validate many paths at once and print a single summarized error message for
+        all invalid paths.
+
+        Each path is checked with a single ``stat`` system call. On slow filesystems
+        (like NFS) you may use ``workers`` to perform checks concurrently.
+
+        Arguments:
+            values (iterable or dict): Filesystem paths to validate. It may be a
+                dictionnary of paths indexed on a name, names are then used in report
+                instead of paths.
+
+        Keyword Arguments:
+            kind (string): Kind of expected paths, either ``path`` for any existing
+                path, ``dir`` for directories or ``file`` for files. Default to
+                ``path``.
+            name (string): Name to use in error message, defaut to 'paths'.
+            loglevel (string): The Makevoke method to use for print out error message.
+                It must be a valid printout method like 'error' or 'warning'. Default
+                to 'critical' which will also abort command (opposed to other methods).
+            workers (integer): Number of threads to use to check paths. Default to
+                None to check paths sequentially.
+            error_summary (string): First line of the error message.
+            error_item (string): Line of error message for each invalid path.
+
+        Returns:
+            PathValidationReport: Report of valid and invalid paths, it is evaluated
+            to False when there is any invalid path.
+        """
+        if isinstance(values, dict):
+            items = list(values.items())
+        else:
+            items = [(value, value) for value in values]
+
+        def check(value):
+            return cls.check_path(value, kind=kind)
+
+        if workers and workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(check, [v for k, v in items]))
+        else:
+            results = [check(value) for key, value in items]
+
+        report = PathValidationReport()
+        for (key, value), (status, path) in zip(items, results):
+            if status == "valid":
+                report.valid.append((key, path))
+            else:
+                report.errors.append((key, path, status))
+
+        if report.errors:
+            lines = [
+                error_summary.format(argname=name, count=len(report.errors))
+            ] + [
+                error_item.format(
+                    argname=name,
+                    name=key,
+                    dest=key if path is None else path,
+                    reason=cls.PATH_STATUS_LABELS[status],
+                )
+                for key, path, status in report.errors
+            ]
+            getattr(cls, loglevel)("\n".join(lines))
+
+        return report
+
+    @classmethod
+    def validate_glob(
+        cls,
+        root,
+        patterns,
+        name="value",
+        loglevel="critical",
+        exclude=DEFAULT_EXCLUDES,
+        error_nomatch=(
+            "Argument '{argname}' has no path matching '{patterns}' in: {dest}"
+        ),
+    ):
+        """
+        Validate there is at least one path matching glob patterns in a directory.
+
+        Patterns are described in ``makevoke.finder``. Walk stops at the first
+        matching path.
+
+        Arguments:
+            root (string or Path): Directory to search in.
+            patterns (string or iterable): A glob pattern or a list of patterns.
+
+        Keyword Arguments:
+            name (string): Name to use in error message, defaut to 'value'.
+            loglevel (string): The Makevoke method to use for print out error message.
+                It must be a valid printout method like 'error' or 'warning'. Default
+                to 'critical' which will also abort command (opposed to other methods).
+            exclude (iterable): Glob patterns for directories to never enter. Default
+                to ``makevoke.finder.DEFAULT_EXCLUDES``.
+            error_nomatch (string): Message to use if there is no matching path.
+
+        Returns:
+            Path or boolean: Returns the first matching path if validated else
+            returns False.
+        """
+        patterns = (patterns,) if isinstance(patterns, str) else tuple(patterns)
+
+        found = next(iter_matches(root, patterns, exclude=exclude), None)
+        if found is None:
+            getattr(cls, loglevel)(error_nomatch.format(
+                argname=name,
+                patterns=", ".join(patterns),
+                dest=root,
+            ))
+            return False
+
+        return found
+
+    @classmethod
+    def validate_no_glob(
+        cls,
+        root,
+        patterns,
+        name="value",
+        loglevel="critical",
+        exclude=DEFAULT_EXCLUDES,
+        error_found=(
+            "Argument '{argname}' must not have any path matching '{patterns}' in "
+            "{dest}, found: {found}"
+        ),
+    ):
+        """
+        Validate there is no path matching glob patterns in a directory.
+
+        Patterns are described in ``makevoke.finder``. Walk stops at the first
+        matching path.
+
+        Arguments:
+            root (string or Path): Directory to search in.
+            patterns (string or iterable): A glob pattern or a list of patterns.
+
+        Keyword Arguments:
+            name (string): Name to use in error message, defaut to 'value'.
+            loglevel (string): The Makevoke method to use for print out error message.
+                It must be a valid printout method like 'error' or 'warning'. Default
+                to 'critical' which will also abort command (opposed to other methods).
+            exclude (iterable): Glob patterns for directories to never enter. Default
+                to ``makevoke.finder.DEFAULT_EXCLUDES``.
+            error_found (string): Message to use if a matching path is found.
+
+        Returns:
+            boolean: Returns True if validated else returns False.
+        """
+        patterns = (patterns,) if isinstance(patterns, str) else tuple(patterns)
+
+        found = next(iter_matches(root, patterns, exclude=exclude), None)
+        if found is not None:
+            getattr(cls, loglevel)(error_found.format(
+                argname=name,
+                patterns=", ".join(patterns),
+                dest=root,
+                found=found,
+            ))
+            return False
+
+        return True
+
+    @classmethod
+    def validate_executables(
+        cls,
+        commands=None,
+        suffix="_BIN",
+        name="executables",
+        loglevel="critical",
+        base_dir=None,
+        error_missing=(
+            "Some required executables for '{argname}' can not be found:"
+        ),
+        error_item=(
+            "- {name}: {program}"
+        ),
+    ):
+        """
+        Validate every program from given commands or context variables can be
+        resolved to an executable.
+
+        All programs are resolved at once, each ``PATH`` directory is listed only
+        once and results are cached during the session (see
+        ``makevoke.executables.get_resolver()``), you may use your own resolver
+        with ``EXECUTABLE_RESOLVER`` attribute.
+
+        A program may be a bare name searched in ``PATH`` or a path. Only the first
+        part of a command is checked, so a value like ``python docs/sphinx_reload.py``
+        is validated on ``python``.
+
+        Keyword Arguments:
+            commands (dict or list): Commands to validate. It may be a dictionnary of
+                commands indexed on a name. Default to None to validate every context
+                variables whose name ends with ``suffix``, this requires the class to
+                implement ``get_context()`` like ``MakevokeBase``.
+            suffix (string): Suffix of context variable names to validate when
+                ``commands`` is not given. Default to ``_BIN``.
+            name (string): Name to use in error message, defaut to 'executables'.
+            loglevel (string): The Makevoke method to use for print out error message.
+                It must be a valid printout method like 'error' or 'warning'. Default
+                to 'critical' which will also abort command (opposed to other methods).
+            base_dir (string or Path): Directory to resolve relative program paths.
+                Default to the class ``BASE_DIR`` attribute if any, else the current
+                directory.
+            error_missing (string): First line of the error message.
+            error_item (string): Line of error message for each missing program.
+
+        Returns:
+            dict or boolean: Returns resolved executable paths indexed on names if
+            validated else returns False.
+        """
+        if commands is None:
+            commands = {
+                key: value
+                for key, value in cls.get_context().items()
+                if key.endswith(suffix)
+            }
+        elif not isinstance(commands, dict):
+            commands = {command: command for command in commands}
+
+        if base_dir is None:
+            base_dir = getattr(cls, "BASE_DIR", None)
+
+        resolver = cls.EXECUTABLE_RESOLVER or get_resolver()
+        resolved = resolver.resolve(
+            [str(value) for value in commands.values()],
+            base_dir=base_dir,
         )
 
-        if value.is_dir():
-            getattr(cls, loglevel)(error_isdir.format(argname=name, dest=value))
+        results = {key: resolved[str(value)] for key, value in commands.items()}
+        missing = [key for key, path in results.items() if path is None]
+
+        if missing:
+            lines = [error_missing.format(argname=name)] + [
+                error_item.format(
+                    argname=name,
+                    name=key,
+                    program=resolver.get_program(commands[key]),
+                )
+                for key in missing
+            ]
+            getattr(cls, loglevel)("\n".join(lines))
             return False
 
-        return value
+        return results
@@ -0,0 +1,157 @@
+import pytest
+
+from makevoke.utils import (
+    AnsiStreamCleaner, clean_ansi, clean_ansi_file, display_width, format_size,
+    lookahead, scandir_tree,
+)
+
+
+SAMPLE_ANSI = (
+    "\x1b[31mred\x1b[0m \x1b[1;4mbold\x1b[22m\x1b[38;2;255;0;0m!\x1b[0m\n"
+    "\x1b]8;;https://example.com\x1b\\link\x1b]8;;\x07\n"
+    "\x1b[2K\x1b[1A\x1b[?25lprogress\x1b[?25h\x1b(B\x1b7\x1b8\n"
+)
+SAMPLE_CLEAN = "red bold!\nlink\nprogress\n"
+
+
+def test_lookahead():
+    """
+    Function should flag the last item of any iterable.
+    """
+    assert list(lookahead([])) == []
+    assert list(lookahead(["a"])) == [("a", True)]
+    assert list(lookahead(x for x in "abc")) == [
+        ("a", False),
+        ("b", False),
+        ("c", True),
+    ]
+
+
+def test_scandir_tree(tmp_path):
+    """
+    Function should lazily build a nested tree from a directory.
+    """
+    (tmp_path / "foo" / "bar").mkdir(parents=True)
+    (tmp_path / "foo" / "bar" / "ping.txt").write_text("ping")
+    (tmp_path / "foo" / "pong.txt").write_text("pong")
+    (tmp_path / "zip.txt").write_text("zip")
+
+    def materialize(items):
+        return [
+            (item[0], materialize(item[1])) if isinstance(item, tuple) else item
+            for item in items
+        ]
+
+    assert materialize(scandir_tree(tmp_path, sort=True)) == [
+        ("foo/", [
+            ("bar/", ["ping.txt"]),
+            "pong.txt",
+        ]),
+        "zip.txt",
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", ""),
+    ("plain", "plain"),
+    ("\x1b[31mred\x1b[0m", "red"),
+    ("\x1b[1m\x1b[4mtitle", "title"),
+    (SAMPLE_ANSI, SAMPLE_CLEAN),
+    (b"\x1b[32mgreen\x1b[0m", b"green"),
+    (SAMPLE_ANSI.encode("utf-8"), SAMPLE_CLEAN.encode("utf-8")),
+])
+def test_clean_ansi(value, expected):
+    """
+    Function should remove every kind of ANSI sequences from strings or bytes.
+    """
+    assert clean_ansi(value) == expected
+
+
+def test_clean_ansi_fast_path():
+    """
+    Value without any escape character should be returned as it is.
+    """
+    value = "nothing to clean" * 10
+    assert clean_ansi(value) is value
+
+
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_ansi_stream_cleaner(binary, size):
+    """
+    Stream cleaner should properly clean sequences split between chunks.
+    """
+    content = SAMPLE_ANSI * 3
+    expected = SAMPLE_CLEAN * 3
+    if binary:
+        content = content.encode("utf-8")
+        expected = expected.encode("utf-8")
+
+    cleaner = AnsiStreamCleaner(binary=binary)
+    output = [
+        cleaner.feed(content[i:i + size])
+        for i in range(0, len(content), size)
+    ]
+    output.append(cleaner.flush())
+
+    assert output[0][:0].join(output) == expected
+
+
+def test_ansi_stream_cleaner_unterminated():
+    """
+    An unterminated sequence should be held until flush and then released.
+    """
+    cleaner = AnsiStreamCleaner()
+
+    assert cleaner.feed("foo\x1b]8;;https://") == "foo"
+    assert cleaner.flush() == "\x1b]8;;https://"
+
+
+@pytest.mark.parametrize("content", [
+    b"",
+    b"no sequence at all\n",
+    SAMPLE_ANSI.encode("utf-8") * 1000,
+])
+def test_clean_ansi_file(tmp_path, content):
+    """
+    Function should write a cleaned copy of a file.
+    """
+    source = tmp_path / "source.log"
+    destination = tmp_path / "destination.log"
+    source.write_bytes(content)
+
+    written = clean_ansi_file(source, destination)
+
+    assert destination.read_bytes() == clean_ansi(content)
+    assert written == len(clean_ansi(content))
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", 0),
+    ("plain", 5),
+    ("\x1b[32m✔\x1b[0m", 1),
+    ("日本語", 6),
+    ("e\u0301", 1),
+    ("\x1b[1mレポート\x1b[0m ok", 11),
+])
+def test_display_width(value, expected):
+    """
+    Function should compute visible width, ignoring ANSI codes and counting wide
+    characters.
+    """
+    assert display_width(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0, "0 B"),
+    (1023, "1023 B"),
+    (1024, "1.0 KiB"),
+    (1536, "1.5 KiB"),
+    (5 * 1024 * 1024, "5.0 MiB"),
+    (3 * 1024 ** 5, "3072.0 TiB"),
+])
+def test_format_size(value, expected):
+    """
+    Sizes should be formatted with binary units.
+    """
+    assert format_size(value) == expected
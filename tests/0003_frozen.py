@@ -0,0 +1,190 @@
+import pytest
+
+from makevoke.frozen import (
+    InstalledIndex, evaluate_marker, get_frozen_requirements, normalize_name,
+    parse_requirement, resolve_requirements, write_frozen_requirements,
+)
+
+
+def make_distribution(site, name, version, requires=None, extras=None,
+                      dirname=None):
+    path = site / "{}-{}.dist-info".format(dirname or name, version)
+    path.mkdir(parents=True)
+
+    lines = [
+        "Metadata-Version: 2.1",
+        "Name: {}".format(name),
+        "Version: {}".format(version),
+    ]
+    lines += ["Provides-Extra: {}".format(item) for item in extras or []]
+    lines += ["Requires-Dist: {}".format(item) for item in requires or []]
+    (path / "METADATA").write_text("\n".join(lines) + "\n")
+
+    return path
+
+
+@pytest.fixture(scope="function")
+def site(tmp_path):
+    """
+    Create a fake site packages directory with some distributions.
+    """
+    site = tmp_path / "site"
+    make_distribution(site, "sample", "1.2.0", requires=[
+        "Foo_Bar>=1.0",
+        "ping[fast]",
+        'sphinx>=4.3.0; extra == "doc"',
+        'nope; extra == "doc"',
+        'never; python_version < "2.0"',
+    ], extras=["doc"])
+    make_distribution(site, "Foo_Bar", "1.5")
+    make_distribution(site, "ping", "0.1", requires=[
+        'pong; extra == "fast"',
+        'slow; extra == "slow"',
+    ], extras=["fast", "slow"])
+    make_distribution(site, "pong", "3.0", requires=["sample"])
+    make_distribution(site, "slow", "0.0.1")
+    # Wheels normalize name of their metadata directory
+    make_distribution(site, "Sphinx", "7.2.6", dirname="sphinx")
+    make_distribution(site, "unrelated", "9.9")
+
+    return site
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("foo", "foo"),
+    ("Foo_Bar", "foo-bar"),
+    ("foo.bar--ping", "foo-bar-ping"),
+])
+def test_normalize_name(name, expected):
+    """
+    Names should be normalized following PEP 503.
+    """
+    assert normalize_name(name) == expected
+
+
+@pytest.mark.parametrize("requirement, expected", [
+    ("foo", ("foo", set(), None)),
+    ("Foo_Bar >= 1.0, <2", ("foo-bar", set(), None)),
+    ("foo[Bar, ping]", ("foo", {"bar", "ping"}, None)),
+    (
+        'foo (>=1.0) ; extra == "doc"',
+        ("foo", set(), 'extra == "doc"'),
+    ),
+    ("", None),
+])
+def test_parse_requirement(requirement, expected):
+    """
+    Requirement strings should be parsed to name, extras and marker.
+    """
+    assert parse_requirement(requirement) == expected
+
+
+@pytest.mark.parametrize("marker, extras, expected", [
+    (None, [], True),
+    ('extra == "doc"', [], False),
+    ('extra == "doc"', ["doc"], True),
+    ('extra == "doc"', ["dev", "doc"], True),
+    ('python_version < "2.0"', [], False),
+    ('python_version >= "3.0"', [], True),
+])
+def test_evaluate_marker(marker, extras, expected):
+    """
+    Markers should be evaluated against enabled extras.
+    """
+    assert evaluate_marker(marker, extras) is expected
+
+
+def test_index_cache(tmp_path, site):
+    """
+    Installed packages should be scanned once then read from cache until directory
+    has changed.
+    """
+    cache_dir = tmp_path / "cache"
+
+    index = InstalledIndex(paths=[str(site)], cache_dir=str(cache_dir))
+    packages = index.get_packages()
+    assert index.scanned == 1
+    assert sorted(packages) == [
+        "foo-bar", "ping", "pong", "sample", "slow", "sphinx", "unrelated",
+    ]
+    assert packages["foo-bar"]["name"] == "Foo_Bar"
+    assert packages["foo-bar"]["version"] == "1.5"
+
+    # Packages are memorized on index
+    assert index.get_packages() is packages
+
+    index = InstalledIndex(paths=[str(site)], cache_dir=str(cache_dir))
+    assert index.get_packages() == packages
+    assert index.scanned == 0
+
+    make_distribution(site, "new", "1.0")
+    index = InstalledIndex(paths=[str(site)], cache_dir=str(cache_dir))
+    assert index.get_packages()["new"]["version"] == "1.0"
+    assert index.scanned == 1
+
+
+def test_index_precedence(tmp_path, site):
+    """
+    A package from an earlier directory should take precedence.
+    """
+    other = tmp_path / "other"
+    make_distribution(other, "ping", "2.0")
+
+    index = InstalledIndex(
+        paths=[str(other), str(site)],
+        cache_dir=str(tmp_path / "cache"),
+    )
+    assert index.get_packages()["ping"]["version"] == "2.0"
+
+
+def test_resolve_requirements(tmp_path, site):
+    """
+    Requirements should be resolved with extras and transitive dependencies.
+    """
+    index = InstalledIndex(paths=[str(site)], cache_dir=str(tmp_path / "cache"))
+
+    assert resolve_requirements("sample", index=index) == {
+        "foo-bar": set(),
+        "ping": {"fast"},
+        "pong": set(),
+        "sphinx": set(),
+        "nope": set(),
+    }
+
+    assert resolve_requirements("sample", extras=[], index=index) == {
+        "foo-bar": set(),
+        "ping": {"fast"},
+        "pong": set(),
+    }
+
+    assert resolve_requirements(
+        "sample", extras=[], transitive=False, index=index
+    ) == {
+        "foo-bar": set(),
+        "ping": {"fast"},
+    }
+
+
+def test_write_frozen_requirements(tmp_path, site, monkeypatch):
+    """
+    Frozen file should list every installed requirements with their version.
+    """
+    index = InstalledIndex(paths=[str(site)], cache_dir=str(tmp_path / "cache"))
+
+    assert get_frozen_requirements("sample", index=index, ignore=["pong"]) == [
+        "Foo_Bar==1.5",
+        "ping==0.1",
+        "Sphinx==7.2.6",
+    ]
+
+    monkeypatch.syspath_prepend(str(site))
+    destination = tmp_path / "frozen.txt"
+    write_frozen_requirements("sample", filename=str(destination), index=index)
+
+    assert destination.read_text() == "\n".join([
+        "# Frozen requirement versions from '1.2.0' installation",
+        "Foo_Bar==1.5",
+        "ping==0.1",
+        "pong==3.0",
+        "Sphinx==7.2.6",
+    ])
@@ -204,3 +204,122 @@ def test_styleguide(capsys):
 
     captured = capsys.readouterr()
     assert len(clean_ansi(captured.out)) > 0
+
+
+def test_treelist_generator(capsys):
+    """
+    Method treelist should accept any iterable like a generator.
+    """
+    PrintOutAbstract.treelist(item for item in ("One", "Two", "Three"))
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == "├── One\n├── Two\n└── Three\n"
+
+    PrintOutAbstract.treelist(item for item in ())
+
+    captured = capsys.readouterr()
+    assert captured.out == ""
+
+
+def test_tree_nested(capsys):
+    """
+    Method tree should render nested items with continuation prefixes.
+    """
+    PrintOutAbstract.tree([
+        ("One", ["A", ("B", iter(["B1", "B2"]))]),
+        "Two",
+        ("Three", (item for item in ["C", ("D", [])])),
+    ], indent=1)
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "    ├── One\n"
+        "    │   ├── A\n"
+        "    │   └── B\n"
+        "    │       ├── B1\n"
+        "    │       └── B2\n"
+        "    ├── Two\n"
+        "    └── Three\n"
+        "        ├── C\n"
+        "        └── D\n"
+    )
+
+    # Tuples without children are simple items
+    PrintOutAbstract.tree([("a", 1), ("b", "c")])
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == "├── ('a', 1)\n└── ('b', 'c')\n"
+
+
+def test_tree_buffered(capsys):
+    """
+    Method tree should write its output by chunks of lines.
+    """
+    class ChunkedPrintOut(PrintOutAbstract):
+        WRITE_BUFFER_LINES = 2
+
+    class Recorder:
+        def __init__(self):
+            self.writes = []
+
+        def write(self, content):
+            self.writes.append(content)
+
+        def flush(self):
+            pass
+
+    stream = Recorder()
+    ChunkedPrintOut.tree(("Item {}".format(i) for i in range(5)), stream=stream)
+
+    assert len(stream.writes) == 3
+    assert clean_ansi("".join(stream.writes)).splitlines() == [
+        "├── Item 0",
+        "├── Item 1",
+        "├── Item 2",
+        "├── Item 3",
+        "└── Item 4",
+    ]
+
+
+def test_table(capsys):
+    """
+    Method table should align columns on visible widths, ignoring ANSI codes.
+    """
+    PrintOutAbstract.table(
+        [
+            ["foo", PrintOutAbstract.yes_or_no(True), 1],
+            ["pingpong", PrintOutAbstract.yes_or_no(False), 200],
+        ],
+        headers=["Name", "Ok", "Count"],
+        align="<<>",
+    )
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "Name      Ok  Count\n"
+        "────────  ──  ─────\n"
+        "foo       ✔       1\n"
+        "pingpong  ✖     200\n"
+    )
+
+
+def test_table_sampled(capsys):
+    """
+    Column widths should be computed from sampled rows only and other rows streamed
+    with the same layout, overflowing when larger. Fixed widths should be used as
+    given.
+    """
+    rows = (["x" * size, "end"] for size in (1, 2, 5))
+    PrintOutAbstract.table(rows, sample=2, indent=1)
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "    x   end\n"
+        "    xx  end\n"
+        "    xxxxx  end\n"
+    )
+
+    PrintOutAbstract.table([["a", "b"]], widths=[3, 3])
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == "a    b\n"
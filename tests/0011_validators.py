@@ -1,9 +1,11 @@
+import os
 from pathlib import Path
 
 import pytest
 
 from invoke.exceptions import Exit
 
+from makevoke.cache import StatCache
 from makevoke.printout import PrintOutAbstract
 from makevoke.validators import ArgValidatorAbstract
 from makevoke.utils import clean_ansi
@@ -216,3 +218,160 @@ def test_validate_file_path(capsys, basic_structure):
     assert clean_ansi(captured.out) == (
         "\n  Argument 'dir-foo' path is a directory: {}  \n\n"
     ).format(dir_foo)
+
+
+def test_validate_single_stat(monkeypatch, basic_structure):
+    """
+    Each validation should perform a single stat system call and non blocking
+    validations should not fail on missing paths.
+    """
+    calls = []
+    original_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        calls.append(path)
+        return original_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", counting_stat)
+
+    dir_foo = basic_structure / "foo"
+    file_bar = dir_foo / "bar.txt"
+
+    assert MakevokePrintoutValidator.validate_dir_path(dir_foo) == dir_foo
+    assert len(calls) == 1
+
+    assert MakevokePrintoutValidator.validate_file_path(file_bar) == file_bar
+    assert len(calls) == 2
+
+    result = MakevokePrintoutValidator.validate_dir_path(
+        basic_structure / "nope",
+        loglevel="error",
+    )
+    assert result is False
+    assert len(calls) == 3
+
+    result = MakevokePrintoutValidator.validate_file_path("", loglevel="error")
+    assert result is None
+    assert len(calls) == 3
+
+
+def test_validate_unreachable_paths(basic_structure):
+    """
+    Paths which can not be reached should be reported as missing, from cache or
+    not.
+    """
+    loop = basic_structure / "loop"
+    loop.symlink_to(loop)
+    too_long = basic_structure / ("x" * 1000)
+
+    class CachedValidator(MakevokePrintoutValidator):
+        STAT_CACHE = StatCache()
+
+    for klass in (MakevokePrintoutValidator, CachedValidator):
+        for path in (loop, too_long):
+            assert klass.check_path(path) == ("missing", path)
+            assert klass.validate_path(path, loglevel="error") is False
+
+
+@pytest.mark.parametrize("workers", [None, 4])
+def test_validate_paths(capsys, basic_structure, workers):
+    """
+    Method should validate every paths and print a single summarized error.
+    """
+    dir_foo = basic_structure / "foo"
+    dir_ping = basic_structure / "ping"
+    file_bar = dir_foo / "bar.txt"
+    nope = basic_structure / "nope"
+
+    # Everything is valid
+    report = MakevokePrintoutValidator.validate_paths(
+        [dir_foo, dir_ping],
+        kind="dir",
+        workers=workers,
+    )
+    assert report.ok is True
+    assert report.paths == [dir_foo, dir_ping]
+    assert capsys.readouterr().out == ""
+
+    # Some errors with non blocking log level
+    report = MakevokePrintoutValidator.validate_paths(
+        [dir_foo, nope, file_bar, ""],
+        kind="dir",
+        loglevel="error",
+        workers=workers,
+    )
+    assert bool(report) is False
+    assert report.paths == [dir_foo]
+    assert report.errors == [
+        (nope, nope, "missing"),
+        (file_bar, file_bar, "isfile"),
+        ("", None, "empty"),
+    ]
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "Argument 'paths' has 3 invalid path(s):\n"
+        "- {nope}: does not exists\n"
+        "- {bar}: is a file\n"
+        "- : value is empty\n"
+    ).format(nope=nope, bar=file_bar)
+
+    # Named paths with default critical log level
+    with pytest.raises(Exit):
+        MakevokePrintoutValidator.validate_paths(
+            {"source": file_bar, "destination": dir_foo},
+            kind="file",
+            name="files",
+            error_item="- {name}: {reason}",
+            workers=workers,
+        )
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "\n  Argument 'files' has 1 invalid path(s):\n- destination: is a directory  "
+        "\n\n"
+    )
+
+
+def test_validate_glob(capsys, basic_structure):
+    """
+    Method should succeed if at least one path matches patterns.
+    """
+    result = MakevokePrintoutValidator.validate_glob(basic_structure, "*.txt")
+    assert result.suffix == ".txt"
+
+    result = MakevokePrintoutValidator.validate_glob(
+        basic_structure,
+        ["*.rst", "*.md"],
+        name="docs",
+        loglevel="error",
+    )
+    assert result is False
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "Argument 'docs' has no path matching '*.rst, *.md' in: {}\n"
+    ).format(basic_structure)
+
+
+def test_validate_no_glob(capsys, basic_structure):
+    """
+    Method should succeed if no path matches patterns.
+    """
+    assert MakevokePrintoutValidator.validate_no_glob(
+        basic_structure,
+        "__pycache__",
+    ) is True
+
+    with pytest.raises(Exit):
+        MakevokePrintoutValidator.validate_no_glob(
+            basic_structure,
+            "ping/*.txt",
+            name="pings",
+        )
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "\n  Argument 'pings' must not have any path matching 'ping/*.txt' in {root}, "
+        "found: {root}/ping/pong.txt  \n\n"
+    ).format(root=basic_structure)
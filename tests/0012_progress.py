@@ -0,0 +1,141 @@
+import io
+
+from makevoke.printout import PrintOutAbstract
+from makevoke.progress import ProgressDisplay, format_duration
+from makevoke.utils import clean_ansi
+
+
+class FakeClock:
+    """
+    A clock which only moves when asked to.
+    """
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_format_duration():
+    """
+    Duration should be formatted with minutes and seconds or with hours when needed.
+    """
+    assert format_duration(0) == "00:00"
+    assert format_duration(65.9) == "01:05"
+    assert format_duration(3600 + 61) == "1:01:01"
+    assert format_duration(-5) == "00:00"
+
+
+def test_progress_summary_and_eta():
+    """
+    Summary should include counts, elapsed time and an estimated remaining time.
+    """
+    clock = FakeClock()
+    progress = ProgressDisplay(total=4, stream=io.StringIO(), clock=clock, tty=False)
+    progress.open()
+
+    assert progress.eta is None
+
+    clock.now += 10
+    progress.start("foo")
+    progress.done("foo")
+
+    assert progress.eta == 30.0
+    assert progress.summary() == "1/4 done · 0 running · elapsed 00:10 · ETA 00:30"
+
+    progress.start("bar")
+    progress.done("bar", failed=True)
+    assert progress.summary() == (
+        "2/4 done · 0 running · 1 failed · elapsed 00:10 · ETA 00:10"
+    )
+
+
+def test_progress_not_tty_throttled():
+    """
+    Without a TTY, summary lines should only be printed once per summary interval
+    no matter how many jobs are completed.
+    """
+    clock = FakeClock()
+    stream = io.StringIO()
+
+    with ProgressDisplay(total=5000, stream=stream, clock=clock, tty=False,
+                         summary_interval=5) as progress:
+        for i in range(5000):
+            progress.start(i)
+            progress.done(i)
+            if i == 2500:
+                clock.now += 5
+
+    lines = stream.getvalue().splitlines()
+    assert lines == [
+        "2501/5000 done · 1 running · elapsed 00:05 · ETA 00:04",
+        "5000/5000 done · 0 running · elapsed 00:05",
+    ]
+
+
+def test_progress_tty_redraw(monkeypatch):
+    """
+    With a TTY, status area should be redrawn at a capped rate, erasing previous
+    drawing each time and log lines are printed above it.
+    """
+    clock = FakeClock()
+    stream = io.StringIO()
+
+    progress = ProgressDisplay(total=3, stream=stream, clock=clock, tty=True,
+                               refresh_rate=10, max_running=1)
+    progress.open()
+    # Initial drawing is only the summary line
+    assert stream.getvalue() == "0/3 done · 0 running · elapsed 00:00\n"
+
+    # Too soon to be redrawn
+    progress.start("foo")
+    progress.start("bar")
+    assert stream.getvalue().count("\n") == 1
+
+    clock.now += 0.2
+    progress.refresh()
+    assert stream.getvalue().endswith(
+        "\x1b[1F\x1b[J"
+        "0/3 done · 2 running · elapsed 00:00\n"
+        "▸ foo (00:00)\n"
+        "▸ … and 1 more\n"
+    )
+
+    # Logging erase the status area, print the message and redraw it
+    progress.log("Hello")
+    assert stream.getvalue().endswith(
+        "\x1b[3F\x1b[J"
+        "Hello\n"
+        "0/3 done · 2 running · elapsed 00:00\n"
+        "▸ foo (00:00)\n"
+        "▸ … and 1 more\n"
+    )
+
+    progress.done("foo")
+    progress.done("bar")
+    progress.done()
+    progress.close()
+    assert stream.getvalue().endswith(
+        "\x1b[3F\x1b[J"
+        "3/3 done · 0 running · elapsed 00:00\n"
+    )
+
+
+def test_progress_printer_log(capsys):
+    """
+    Log messages with a level should be printed with the printer methods.
+    """
+    clock = FakeClock()
+
+    progress = PrintOutAbstract.progress(total=2, clock=clock, tty=False)
+    assert progress.printer is PrintOutAbstract
+
+    with progress:
+        progress.log("Job done", level="success")
+        progress.advance(2)
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "Job done\n"
+        "2/2 done · 0 running · elapsed 00:00\n"
+    )
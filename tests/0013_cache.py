@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from makevoke.cache import InotifyWatcher, StatCache
+from makevoke.printout import PrintOutAbstract
+from makevoke.validators import ArgValidatorAbstract
+
+
+def test_stat_cache(tmp_path):
+    """
+    Status should be cached for existing and missing paths until invalidated.
+    """
+    cache = StatCache()
+    foo = tmp_path / "foo.txt"
+
+    assert cache.stat(foo) is None
+    assert cache.stat(str(foo)) is None
+    assert cache.counters() == {"hits": 1, "misses": 1}
+
+    # Cache is not aware of change until invalidated
+    foo.write_text("foo")
+    assert cache.stat(foo) is None
+
+    cache.invalidate(foo)
+    assert cache.stat(foo).st_size == 3
+    assert cache.counters() == {"hits": 2, "misses": 2}
+
+
+def test_stat_cache_listdir(tmp_path):
+    """
+    Directory listing should be cached until invalidated, invalidating an entry
+    also invalidates its parent listing.
+    """
+    cache = StatCache()
+    (tmp_path / "foo").mkdir()
+    (tmp_path / "bar.txt").write_text("bar")
+
+    listing = cache.listdir(tmp_path)
+    assert sorted((item.name, item.is_dir) for item in listing) == [
+        ("bar.txt", False),
+        ("foo", True),
+    ]
+    assert cache.listdir(tmp_path) is listing
+
+    (tmp_path / "ping.txt").write_text("ping")
+    cache.invalidate(tmp_path / "ping.txt")
+    assert sorted(item.name for item in cache.listdir(tmp_path)) == [
+        "bar.txt", "foo", "ping.txt",
+    ]
+
+    cache.stat(tmp_path / "foo")
+    cache.invalidate(tmp_path, recursive=True)
+    assert cache._stats == {}
+    assert cache._listings == {}
+    assert cache.counters() == {"hits": 1, "misses": 3}
+
+
+def test_stat_cache_validators(monkeypatch, tmp_path):
+    """
+    Validators should use the cache when enabled.
+    """
+    class CachedValidator(ArgValidatorAbstract, PrintOutAbstract):
+        STAT_CACHE = StatCache()
+
+    calls = []
+    original_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        calls.append(path)
+        return original_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", counting_stat)
+
+    for i in range(3):
+        assert CachedValidator.validate_dir_path(tmp_path) == tmp_path
+        assert CachedValidator.validate_paths([tmp_path], kind="dir").ok is True
+
+    assert len(calls) == 1
+    assert CachedValidator.STAT_CACHE.counters() == {"hits": 5, "misses": 1}
+
+
+@pytest.mark.skipif(
+    not InotifyWatcher.available(),
+    reason="Inotify is not available on this system"
+)
+def test_stat_cache_watch(tmp_path):
+    """
+    With watching enabled, cache should be invalidated from filesystem changes.
+    """
+    cache = StatCache(watch=True)
+    foo = tmp_path / "foo.txt"
+
+    try:
+        assert cache.stat(foo) is None
+        assert cache.listdir(tmp_path) == ()
+
+        foo.write_text("foo")
+
+        assert cache.stat(foo).st_size == 3
+        assert [item.name for item in cache.listdir(tmp_path)] == ["foo.txt"]
+
+        # Unchanged entries are still served from cache
+        assert cache.stat(foo).st_size == 3
+        assert cache.counters() == {"hits": 1, "misses": 4}
+    finally:
+        cache.close()
+
+
+@pytest.mark.skipif(
+    not InotifyWatcher.available(),
+    reason="Inotify is not available on this system"
+)
+def test_stat_cache_watch_race(monkeypatch, tmp_path):
+    """
+    A change happening just after a path has been read should still be reported.
+    """
+    cache = StatCache(watch=True)
+    foo = tmp_path / "foo.txt"
+    foo.write_text("foo")
+
+    real_stat = os.stat
+
+    def stat_then_change(path, *args, **kwargs):
+        result = real_stat(path, *args, **kwargs)
+        if path == str(foo):
+            monkeypatch.setattr(os, "stat", real_stat)
+            foo.write_text("changed")
+        return result
+
+    monkeypatch.setattr(os, "stat", stat_then_change)
+
+    try:
+        assert cache.stat(foo).st_size == 3
+        assert cache.stat(foo).st_size == 7
+    finally:
+        cache.close()
@@ -0,0 +1,116 @@
+import pytest
+
+from makevoke.finder import (
+    compile_patterns, first_match, iter_entries, iter_matches, split_glob,
+    translate_glob,
+)
+
+
+@pytest.fixture(scope="function")
+def project_structure(tmp_path):
+    """
+    Create a project alike structure for tests
+    """
+    for path in [
+        "setup.py",
+        "docs/index.rst",
+        "docs/core/base.rst",
+        "docs/_build/html/index.html",
+        "makevoke/__init__.py",
+        "makevoke/__pycache__/__init__.cpython-311.pyc",
+        ".git/objects/README.rst",
+        ".venv/lib/site.py",
+    ]:
+        path = tmp_path / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+
+    return tmp_path
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ("*.rst", "index.rst", True),
+    ("*.rst", "index.txt", False),
+    ("docs/*.rst", "docs/index.rst", True),
+    ("docs/*.rst", "docs/core/base.rst", False),
+    ("docs/**/*.rst", "docs/index.rst", True),
+    ("docs/**/*.rst", "docs/core/base.rst", True),
+    ("docs/**", "docs/core/base.rst", True),
+    ("file?.txt", "file1.txt", True),
+    ("file?.txt", "file10.txt", False),
+    ("file[0-3].txt", "file2.txt", True),
+    ("file[!0-3].txt", "file2.txt", False),
+    ("file[!0-3].txt", "file5.txt", True),
+    ("a+b(c).txt", "a+b(c).txt", True),
+])
+def test_translate_glob(pattern, path, expected):
+    """
+    Glob patterns should be translated to the right regular expressions.
+    """
+    assert compile_patterns(pattern).match(path) is expected
+
+
+def test_compile_patterns_cached():
+    """
+    Matchers should be compiled once for the same patterns.
+    """
+    assert compile_patterns(["*.py", "*.rst"]) is compile_patterns(("*.py", "*.rst"))
+    assert translate_glob("*.py") == "[^/]*\\.py"
+
+
+def test_iter_matches(project_structure):
+    """
+    Walk should yield matching paths and never enter excluded directories.
+    """
+    found = sorted(
+        str(path.relative_to(project_structure))
+        for path in iter_matches(project_structure, "*.rst")
+    )
+    assert found == ["docs/core/base.rst", "docs/index.rst"]
+
+    found = sorted(
+        str(path.relative_to(project_structure))
+        for path in iter_matches(project_structure, "*.rst", exclude=["core"])
+    )
+    assert found == [".git/objects/README.rst", "docs/index.rst"]
+
+    found = sorted(
+        relative_path
+        for entry, relative_path in iter_entries(
+            project_structure,
+            ["__pycache__", "_build"],
+            descend_matched=False,
+        )
+    )
+    assert found == ["docs/_build", "makevoke/__pycache__"]
+
+    found = sorted(
+        relative_path
+        for entry, relative_path in iter_entries(
+            project_structure, "*.rst", max_depth=1,
+        )
+    )
+    assert found == ["docs/index.rst"]
+
+
+def test_first_match(project_structure):
+    """
+    First match should stop at the first found path.
+    """
+    assert first_match(project_structure, "*.nope") is None
+    assert first_match(project_structure, "setup.py") == project_structure / "setup.py"
+    assert first_match(project_structure / "nope", "*") is None
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("*.py", (".", "*.py")),
+    ("docs/**/*.rst", ("docs", "**/*.rst")),
+    ("/tmp/build/*/index.html", ("/tmp/build", "*/index.html")),
+    ("/*.txt", ("/", "*.txt")),
+    ("docs/core", ("docs/core", None)),
+])
+def test_split_glob(pattern, expected):
+    """
+    Static directory part should be splitted from pattern part.
+    """
+    assert split_glob(pattern) == expected
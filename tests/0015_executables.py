@@ -0,0 +1,132 @@
+import os
+import sys
+
+import pytest
+
+from invoke.exceptions import Exit
+
+from makevoke.base import MakevokeBase
+from makevoke.executables import ExecutableResolver
+from makevoke.printout import PrintOutAbstract
+from makevoke.utils import clean_ansi
+from makevoke.validators import ArgValidatorAbstract
+
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32",
+    reason="Tests rely on POSIX executable permissions"
+)
+
+
+def make_executable(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+    return path
+
+
+@pytest.fixture(scope="function")
+def search_path(tmp_path):
+    """
+    Create some directories with executables and return a search path.
+    """
+    make_executable(tmp_path / "bin1" / "foo")
+    make_executable(tmp_path / "bin2" / "foo")
+    make_executable(tmp_path / "bin2" / "bar")
+    (tmp_path / "bin2" / "noexec").write_text("")
+    make_executable(tmp_path / "project" / ".venv" / "bin" / "pytest")
+
+    return os.pathsep.join([
+        str(tmp_path / "bin1"),
+        str(tmp_path / "nope"),
+        str(tmp_path / "bin2"),
+        str(tmp_path / "bin1"),
+    ])
+
+
+def test_resolve_names(tmp_path, search_path):
+    """
+    Names should be resolved in PATH order, listing each directory only once.
+    """
+    resolver = ExecutableResolver(path=search_path)
+    assert resolver.directories == [
+        str(tmp_path / "bin1"), str(tmp_path / "nope"), str(tmp_path / "bin2"),
+    ]
+
+    assert resolver.resolve_names(["foo", "bar", "noexec", "nope"]) == {
+        "foo": str(tmp_path / "bin1" / "foo"),
+        "bar": str(tmp_path / "bin2" / "bar"),
+        "noexec": None,
+        "nope": None,
+    }
+    assert resolver.scanned == 3
+
+    # Everything comes from cache
+    assert resolver.resolve_names(["bar", "nope"]) == {
+        "bar": str(tmp_path / "bin2" / "bar"),
+        "nope": None,
+    }
+    assert resolver.scanned == 3
+
+
+def test_resolve_commands(tmp_path, search_path):
+    """
+    Commands should be resolved from their program either by name or by path.
+    """
+    resolver = ExecutableResolver(path=search_path)
+
+    assert resolver.resolve(
+        ["foo --help", ".venv/bin/pytest", ".venv/bin/nope", ""],
+        base_dir=tmp_path / "project",
+    ) == {
+        "foo --help": str(tmp_path / "bin1" / "foo"),
+        ".venv/bin/pytest": str(tmp_path / "project" / ".venv" / "bin" / "pytest"),
+        ".venv/bin/nope": None,
+        "": None,
+    }
+    # Only PATH directories are scanned until foo is found
+    assert resolver.scanned == 1
+
+
+def test_validate_executables(capsys, tmp_path, search_path):
+    """
+    Validator should resolve every context variables ending with '_BIN' and report
+    all missing programs at once.
+    """
+    class Makefile(MakevokeBase, ArgValidatorAbstract, PrintOutAbstract):
+        EXECUTABLE_RESOLVER = ExecutableResolver(path=search_path)
+        BASE_DIR = tmp_path / "project"
+        FOO_BIN = "foo"
+        PYTEST_BIN = ".venv/bin/pytest"
+        RELOAD_BIN = "bar docs/sphinx_reload.py"
+        NAME = "nope"
+        ENABLED_CONTEXT_VARS = ["BASE_DIR", "FOO_BIN", "PYTEST_BIN", "RELOAD_BIN",
+                                "NAME"]
+
+    # Relative paths are resolved from class base directory
+    assert Makefile.validate_executables() == {
+        "FOO_BIN": str(tmp_path / "bin1" / "foo"),
+        "PYTEST_BIN": str(tmp_path / "project" / ".venv" / "bin" / "pytest"),
+        "RELOAD_BIN": str(tmp_path / "bin2" / "bar"),
+    }
+
+    with pytest.raises(Exit):
+        Makefile.validate_executables(base_dir=tmp_path)
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "\n  Some required executables for 'executables' can not be found:\n"
+        "- PYTEST_BIN: .venv/bin/pytest  \n\n"
+    )
+
+    assert Makefile.validate_executables(
+        ["foo", "ping", "pong -v"],
+        loglevel="error",
+    ) is False
+
+    captured = capsys.readouterr()
+    assert clean_ansi(captured.out) == (
+        "Some required executables for 'executables' can not be found:\n"
+        "- ping: ping\n"
+        "- pong -v: pong\n"
+    )
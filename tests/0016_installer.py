@@ -0,0 +1,199 @@
+from pathlib import Path
+
+from invoke import MockContext
+
+from makevoke.base import MakevokeBase
+from makevoke.installer import (
+    InstallerAbstract, InstallState, read_requirements_file, read_setup_requirements,
+)
+from makevoke.printout import PrintOutAbstract
+from makevoke.utils import clean_ansi
+
+
+SETUP_CFG = """[metadata]
+name = sample
+
+[options]
+install_requires =
+    invoke>=2.2.0
+    colorama>=0.4.6
+
+[options.extras_require]
+dev =
+    pytest
+doc =
+    sphinx>=4.3.0
+    # A comment
+    livereload
+"""
+
+
+class Makefile(InstallerAbstract, PrintOutAbstract, MakevokeBase):
+    PIP_BIN = "venv/bin/pip"
+    INSTALL_WHEELHOUSE = "wheels"
+    ENABLED_CONTEXT_VARS = ["BASE_DIR", "PIP_BIN"]
+
+
+def make_project(path):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "setup.cfg").write_text(SETUP_CFG)
+    (path / "setup.py").write_text("from setuptools import setup\nsetup()\n")
+    (path / "requirements.txt").write_text(
+        "# Some requirements\n--index-url https://example.com\nfoo==1.0  # pinned\n"
+    )
+    (path / "venv").mkdir()
+    (path / "venv" / "pyvenv.cfg").write_text("home = /usr/bin\nversion = 3.11.7\n")
+
+    return path
+
+
+def get_state(path, **kwargs):
+    return InstallState(
+        path / "venv",
+        base_dir=path,
+        requirements_files=["requirements.txt"],
+        extras=["dev"],
+        **kwargs
+    )
+
+
+def test_read_requirements(tmp_path):
+    """
+    Requirements should be read from setup configuration and requirements files.
+    """
+    project = make_project(tmp_path)
+
+    assert read_setup_requirements(project / "setup.cfg") == [
+        "invoke>=2.2.0", "colorama>=0.4.6",
+    ]
+    assert read_setup_requirements(project / "setup.cfg", extras=["doc", "nope"]) == [
+        "invoke>=2.2.0", "colorama>=0.4.6", "sphinx>=4.3.0", "livereload",
+    ]
+    assert read_requirements_file(project / "requirements.txt") == (
+        ["foo==1.0"],
+        ["--index-url https://example.com"],
+    )
+
+
+def test_plan(tmp_path):
+    """
+    Install plan should depend on what changed since recorded state.
+    """
+    project = make_project(tmp_path)
+    state = get_state(project)
+
+    plan = state.plan()
+    assert plan.action == "full"
+    assert plan.reason == "no previous install"
+    assert plan.state["interpreter"] == "3.11.7"
+    assert plan.state["requirements"] == [
+        "invoke>=2.2.0", "colorama>=0.4.6", "pytest", "foo==1.0",
+    ]
+    state.write(plan.state)
+
+    assert state.plan().action == "skip"
+    assert state.plan(force=True).action == "full"
+
+    # A new requirement
+    (project / "requirements.txt").write_text(
+        "--index-url https://example.com\nfoo==1.0\nbar\n"
+    )
+    plan = state.plan()
+    assert plan.action == "partial"
+    assert plan.requirements == ["bar"]
+    assert plan.editable is False
+    state.write(plan.state)
+
+    # A changed requirement from setup configuration
+    (project / "setup.cfg").write_text(SETUP_CFG.replace("invoke>=2.2.0", "invoke>=3"))
+    plan = state.plan()
+    assert plan.action == "partial"
+    assert plan.requirements == ["invoke>=3"]
+    assert plan.editable is True
+    state.write(plan.state)
+
+    # Opaque changes
+    (project / "setup.py").write_text("from setuptools import setup\nsetup(name='a')\n")
+    plan = state.plan()
+    assert plan.action == "full"
+    assert plan.reason == "setup.py has changed"
+    state.write(plan.state)
+
+    assert get_state(project, sources=["setup.cfg"]).plan().action == "partial"
+
+    (project / "venv" / "pyvenv.cfg").write_text("version = 3.12.0\n")
+    assert state.plan().reason == "interpreter has changed"
+
+
+def test_install_requirements(tmp_path, monkeypatch, capsys):
+    """
+    Pip should only be run when needed and install state recorded once done.
+    """
+    project = make_project(tmp_path / "project")
+    monkeypatch.chdir(project)
+
+    ctx = MockContext(run=True, repeat=True)
+    options = {
+        "extras": ["dev"],
+        "requirements_files": ["requirements.txt"],
+        "venv_dir": "venv",
+    }
+
+    plan = Makefile.install_requirements(ctx, **options)
+    assert plan.action == "full"
+    assert [call.args[0] for call in ctx.run.call_args_list] == [
+        "venv/bin/pip install --find-links wheels -e '.[dev]' -r ./requirements.txt",
+    ]
+    assert Path("venv", InstallState.FILENAME).exists()
+
+    ctx = MockContext(run=True, repeat=True)
+    plan = Makefile.install_requirements(ctx, **options)
+    assert plan.action == "skip"
+    assert ctx.run.call_args_list == []
+
+    (project / "requirements.txt").write_text("foo==1.1\n")
+    ctx = MockContext(run=True, repeat=True)
+    plan = Makefile.install_requirements(ctx, **options)
+    assert plan.action == "full"
+    assert plan.reason == "requirement options have changed"
+
+    (project / "requirements.txt").write_text("foo==1.2\n")
+    (project / "setup.cfg").write_text(SETUP_CFG.replace("pytest", "pytest>=8"))
+    ctx = MockContext(run=True, repeat=True)
+    plan = Makefile.install_requirements(ctx, **options)
+    assert plan.action == "partial"
+    assert [call.args[0] for call in ctx.run.call_args_list] == [
+        (
+            "venv/bin/pip wheel --wheel-dir wheels --find-links wheels "
+            "'pytest>=8' foo==1.2"
+        ),
+        "venv/bin/pip install --no-index --find-links wheels 'pytest>=8' foo==1.2",
+        "venv/bin/pip install --no-deps -e .",
+    ]
+
+    assert clean_ansi(capsys.readouterr().out).splitlines() == [
+        "Installing (full): no previous install",
+        "Install skipped, requirements are unchanged",
+        "Installing (full): requirement options have changed",
+        "Installing (partial): 2 changed requirement(s)",
+    ]
+
+
+def test_install_commands_braces(tmp_path, monkeypatch):
+    """
+    Braces from paths should be kept as is while Pip command is formatted with
+    context.
+    """
+    project = make_project(tmp_path / "{project}")
+    monkeypatch.chdir(tmp_path)
+
+    ctx = MockContext(run=True, repeat=True)
+    Makefile.install_requirements(
+        ctx, target="{project}", venv_dir="{project}/venv",
+        pip="{BASE_DIR}/{PIP_BIN}",
+    )
+
+    assert [call.args[0] for call in ctx.run.call_args_list] == [
+        "./venv/bin/pip install --find-links wheels -e '{project}'",
+    ]
+    assert Path(project, "venv", InstallState.FILENAME).exists()
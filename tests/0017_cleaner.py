@@ -0,0 +1,95 @@
+from makevoke.cleaner import CleanerAbstract, clean
+from makevoke.printout import PrintOutAbstract
+from makevoke.utils import clean_ansi
+
+
+def make_tree(root):
+    for path, content in [
+        ("setup.py", "setup()"),
+        ("pkg/__init__.py", ""),
+        ("pkg/__pycache__/__init__.cpython-311.pyc", "x" * 100),
+        ("pkg/__pycache__/other.cpython-311.pyc", "x" * 50),
+        ("pkg/sub/module.pyc", "x" * 10),
+        ("pkg.egg-info/PKG-INFO", "x" * 20),
+        (".pytest_cache/v/cache/lastfailed", "{}"),
+        (".venv/lib/__pycache__/keep.pyc", "x"),
+    ]:
+        path = root / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    return root
+
+
+def test_clean_dry_run(tmp_path):
+    """
+    Dry run should report matches without removing anything.
+    """
+    make_tree(tmp_path)
+
+    report = clean(tmp_path, dry_run=True)
+
+    assert report.ok is True
+    assert sorted(report.paths) == [
+        ".pytest_cache", "pkg.egg-info", "pkg/__pycache__", "pkg/sub/module.pyc",
+    ]
+    assert report.entries == 10
+    assert report.size == 182
+    assert (tmp_path / "pkg" / "__pycache__").exists()
+
+
+def test_clean(tmp_path):
+    """
+    Every matches should be removed except from excluded directories.
+    """
+    make_tree(tmp_path)
+
+    report = clean(tmp_path, workers=2)
+
+    assert report.ok is True
+    assert report.entries == 10
+    assert report.size == 182
+    assert sorted(
+        path.relative_to(tmp_path).as_posix()
+        for path in tmp_path.rglob("*")
+        if path.is_file()
+    ) == [".venv/lib/__pycache__/keep.pyc", "pkg/__init__.py", "setup.py"]
+
+    assert clean(tmp_path).paths == []
+
+
+def test_clean_symlink(tmp_path):
+    """
+    Symbolic links should be removed without following them.
+    """
+    (tmp_path / "target").mkdir()
+    (tmp_path / "target" / "keep.txt").write_text("keep")
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "__pycache__").symlink_to(tmp_path / "target")
+
+    report = clean(tmp_path / "project")
+
+    assert report.paths == ["__pycache__"]
+    assert report.entries == 1
+    assert (tmp_path / "target" / "keep.txt").exists()
+    assert not (tmp_path / "project" / "__pycache__").exists()
+
+
+def test_cleaner_abstract(tmp_path, capsys):
+    """
+    Cleaner method should print a report.
+    """
+    class Makefile(CleanerAbstract, PrintOutAbstract):
+        CLEAN_PATTERNS = ["*.egg-info", "__pycache__"]
+
+    make_tree(tmp_path)
+
+    Makefile.clean(tmp_path, dry_run=True)
+    Makefile.clean(tmp_path, patterns=["*.pyc"], exclude=[])
+
+    assert clean_ansi(capsys.readouterr().out).splitlines() == [
+        "▪ pkg.egg-info",
+        "▪ pkg/__pycache__",
+        "Would remove 2 match(es), 5 entries for 170 B",
+        "Removed 4 match(es), 4 entries for 161 B",
+    ]
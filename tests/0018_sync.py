@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from makevoke.printout import PrintOutAbstract
+from makevoke.sync import SyncAbstract, copy_file_content, sync_tree
+from makevoke.utils import clean_ansi
+
+
+def write(path, content, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def listing(root):
+    return {
+        path.relative_to(root).as_posix(): (
+            "->" + os.readlink(path) if path.is_symlink()
+            else (path.read_text() if path.is_file() else None)
+        )
+        for path in root.rglob("*")
+    }
+
+
+@pytest.fixture(scope="function")
+def source(tmp_path):
+    """
+    Create a source tree.
+    """
+    root = tmp_path / "source"
+    write(root / "index.html", "<html></html>", mtime=1000000)
+    write(root / "css" / "main.css", "body{}", mtime=1000000)
+    write(root / "js" / "app.js", "app()", mtime=1000000)
+    write(root / "node_modules" / "lib.js", "lib", mtime=1000000)
+    os.symlink("index.html", root / "home.html")
+
+    return root
+
+
+@pytest.mark.parametrize("size", [0, 10, 3 * 1024 * 1024 + 7])
+def test_copy_file_content(tmp_path, size):
+    """
+    Content should be fully copied, whatever its size.
+    """
+    source = tmp_path / "source.bin"
+    source.write_bytes(os.urandom(size))
+
+    assert copy_file_content(str(source), str(tmp_path / "copy.bin")) == size
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+
+
+def test_sync_tree(tmp_path, source):
+    """
+    Only changed files should be copied.
+    """
+    destination = tmp_path / "destination"
+
+    report = sync_tree(source, destination, exclude=["node_modules"])
+    assert report.ok is True
+    assert sorted(report.created) == [
+        "css", "css/main.css", "home.html", "index.html", "js", "js/app.js",
+    ]
+    assert report.size == 24
+    assert listing(destination) == {
+        "css": None,
+        "css/main.css": "body{}",
+        "home.html": "->index.html",
+        "index.html": "<html></html>",
+        "js": None,
+        "js/app.js": "app()",
+    }
+    assert (destination / "index.html").stat().st_mtime == 1000000
+
+    report = sync_tree(source, destination, exclude=["node_modules"])
+    assert report.changed is False
+    assert report.unchanged == 4
+
+    # Same size but a newer modification time
+    write(source / "js" / "app.js", "boo()", mtime=2000000)
+    write(source / "css" / "main.css", "body{}", mtime=2000000)
+    write(destination / "stale.txt", "stale")
+    write(destination / "node_modules" / "keep.js", "keep")
+
+    report = sync_tree(source, destination, exclude=["node_modules"], dry_run=True)
+    assert sorted(report.updated) == ["css/main.css", "js/app.js"]
+    assert (destination / "js" / "app.js").read_text() == "app()"
+
+    report = sync_tree(
+        source, destination, exclude=["node_modules"], checksum=True, delete=True,
+    )
+    assert report.updated == ["js/app.js"]
+    assert report.deleted == ["stale.txt"]
+    assert report.unchanged == 3
+    assert (destination / "js" / "app.js").read_text() == "boo()"
+    assert (destination / "css" / "main.css").stat().st_mtime == 2000000
+    assert (destination / "node_modules" / "keep.js").exists()
+    assert not (destination / "stale.txt").exists()
+
+
+def test_sync_tree_kind_change(tmp_path, source):
+    """
+    Destination entries of another kind should be replaced.
+    """
+    destination = tmp_path / "destination"
+    write(destination / "index.html" / "nope.txt", "nope")
+    write(destination / "css", "nope")
+
+    report = sync_tree(source, destination, exclude=["node_modules"])
+
+    assert report.ok is True
+    assert sorted(report.updated) == ["css", "index.html"]
+    assert (destination / "index.html").read_text() == "<html></html>"
+    assert (destination / "css" / "main.css").read_text() == "body{}"
+
+
+def test_sync_abstract(tmp_path, source, capsys):
+    """
+    Sync method should print a summary.
+    """
+    class Makefile(SyncAbstract, PrintOutAbstract):
+        pass
+
+    destination = tmp_path / "destination"
+    write(destination / "stale.txt", "stale")
+
+    Makefile.sync(source / "css", destination, delete=True, dry_run=True)
+    Makefile.sync(source / "css", destination, delete=True)
+
+    assert clean_ansi(capsys.readouterr().out).splitlines() == [
+        "▪ created main.css",
+        "▪ deleted stale.txt",
+        "Dry run: 1 created, 0 updated, 1 deleted, 0 unchanged (6 B copied)",
+        "1 created, 0 updated, 1 deleted, 0 unchanged (6 B copied)",
+    ]
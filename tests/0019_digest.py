@@ -0,0 +1,120 @@
+import hashlib
+import os
+
+import pytest
+
+import makevoke.digest
+from makevoke.digest import DigestIndex, hash_file
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture(scope="function")
+def files(tmp_path):
+    """
+    Create some files to hash.
+    """
+    root = tmp_path / "files"
+    for path, content in [
+        ("a.txt", b"a"),
+        ("empty.txt", b""),
+        ("sub/b.whl", b"b" * 3000),
+        ("sub/c.whl", b"c"),
+        (".git/ignored", b"no"),
+    ]:
+        path = root / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    return root
+
+
+@pytest.mark.parametrize("size", [0, 1, 5000])
+def test_hash_file(tmp_path, monkeypatch, size):
+    """
+    Digest should be the same either with memory mapping or buffered reads.
+    """
+    path = tmp_path / "file.bin"
+    content = os.urandom(size)
+    path.write_bytes(content)
+
+    monkeypatch.setattr(makevoke.digest, "READ_BUFFER_SIZE", 1000)
+    assert hash_file(path) == sha256(content)
+    assert hash_file(path, algorithm="md5") == hashlib.md5(content).hexdigest()
+
+    monkeypatch.setattr(makevoke.digest, "MMAP_THRESHOLD", 1)
+    assert hash_file(path) == sha256(content)
+
+
+def test_digests(tmp_path, files):
+    """
+    Digests should be computed once then taken from index until files change.
+    """
+    index_path = str(tmp_path / "index.json")
+
+    with DigestIndex(path=index_path, workers=2) as index:
+        assert index.digests(files) == {
+            str(files / "a.txt"): sha256(b"a"),
+            str(files / "empty.txt"): sha256(b""),
+            str(files / "sub" / "b.whl"): sha256(b"b" * 3000),
+            str(files / "sub" / "c.whl"): sha256(b"c"),
+        }
+        assert (index.hits, index.misses) == (0, 4)
+
+    index = DigestIndex(path=index_path)
+    assert index.digests(str(files / "sub" / "*.whl")) == {
+        str(files / "sub" / "b.whl"): sha256(b"b" * 3000),
+        str(files / "sub" / "c.whl"): sha256(b"c"),
+    }
+    assert (index.hits, index.misses) == (2, 0)
+    assert index.save() is False
+
+    (files / "sub" / "c.whl").write_bytes(b"changed")
+    assert index.get(files / "sub" / "c.whl") == sha256(b"changed")
+    assert index.get(files / "a.txt") == sha256(b"a")
+    assert (index.hits, index.misses) == (3, 1)
+    assert index.save() is True
+
+    (files / "a.txt").unlink()
+    assert index.prune() == 1
+    assert index.lookup(files / "sub" / "c.whl") == sha256(b"changed")
+
+
+def test_iter_digests_streaming(tmp_path, files):
+    """
+    Iterator should yield digests for a directory with patterns or a single file.
+    """
+    index = DigestIndex(path=str(tmp_path / "index.json"), workers=1)
+
+    assert sorted(index.iter_digests(files, patterns="*.whl")) == [
+        (str(files / "sub" / "b.whl"), sha256(b"b" * 3000)),
+        (str(files / "sub" / "c.whl"), sha256(b"c")),
+    ]
+    assert list(index.iter_digests(files / "a.txt")) == [
+        (str(files / "a.txt"), sha256(b"a")),
+    ]
+    assert list(index.iter_digests(files / "nope")) == []
+
+
+def test_iter_files_glob_anchored(files):
+    """
+    Glob targets should only match at their own depth unless '**' is used.
+    """
+    (files / "sub" / "old").mkdir()
+    (files / "sub" / "old" / "d.whl").write_bytes(b"d")
+
+    assert sorted(DigestIndex.iter_files(str(files / "sub" / "*.whl"))) == [
+        str(files / "sub" / "b.whl"),
+        str(files / "sub" / "c.whl"),
+    ]
+    assert sorted(DigestIndex.iter_files(str(files / "*" / "*.whl"))) == [
+        str(files / "sub" / "b.whl"),
+        str(files / "sub" / "c.whl"),
+    ]
+    assert sorted(DigestIndex.iter_files(str(files / "sub" / "**" / "*.whl"))) == [
+        str(files / "sub" / "b.whl"),
+        str(files / "sub" / "c.whl"),
+        str(files / "sub" / "old" / "d.whl"),
+    ]
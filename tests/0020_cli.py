@@ -0,0 +1,239 @@
+import os
+import io
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from makevoke.cli.entrypoint import (
+    cli_frontend, complete, discover_classes, discover_tasks, find_tasks_file,
+    load_tasks_module
+)
+from makevoke.cli.index import TaskIndex
+from makevoke.utils import clean_ansi
+
+
+# Maximum time allowed to import the frontend and print its help
+HELP_TIME_BUDGET = 0.15
+
+TASKS_SOURCE = textwrap.dedent('''
+    from invoke import task
+
+    from makevoke.base import MakevokeBase
+    from makevoke.printout import PrintOutAbstract
+
+
+    class Makefile(MakevokeBase, PrintOutAbstract):
+        ECHO_BIN = "echo"
+        ENABLED_CONTEXT_VARS = ["BASE_DIR", "ECHO_BIN"]
+
+
+    @task(help={"name": "Name to greet"}, aliases=["hi"])
+    def hello(c, name="World", loud=False):
+        """
+        Say hello.
+
+        With some details.
+        """
+        Makefile.info("Hello {}!".format(name))
+
+
+    @task
+    def echo_context(c):
+        Makefile.run(c, "{ECHO_BIN} {BASE_DIR}")
+''')
+
+
+@pytest.fixture(scope="function")
+def tasks_file(tmp_path, monkeypatch):
+    """
+    Create a tasks module and restore import state once done.
+    """
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.setitem(sys.modules, "tasks", None)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    path = tmp_path / "tasks.py"
+    path.write_text(TASKS_SOURCE)
+    (tmp_path / "sub" / "dir").mkdir(parents=True)
+
+    return path
+
+
+def test_find_tasks_file(tmp_path, tasks_file):
+    """
+    Tasks file should be searched from start directory and its parents.
+    """
+    assert find_tasks_file(start=tmp_path / "sub" / "dir") == str(tasks_file)
+    assert find_tasks_file(filename=str(tasks_file)) == str(tasks_file)
+    assert find_tasks_file(filename=str(tmp_path / "nope.py")) is None
+
+
+def test_discover(tasks_file):
+    """
+    Tasks and Makevoke classes should be discovered from tasks module.
+    """
+    module = load_tasks_module(str(tasks_file))
+
+    assert discover_tasks(module) == [
+        ("echo-context", ""),
+        ("hello", "Say hello."),
+    ]
+    assert [name for name, klass in discover_classes(module)] == ["Makefile"]
+
+
+def test_cli_list(capsys, tasks_file):
+    """
+    Frontend should list tasks and classes.
+    """
+    assert cli_frontend(["-f", str(tasks_file), "--list"]) == 0
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "Available tasks:\n"
+        "\n"
+        "  echo-context\n"
+        "  hello         Say hello.\n"
+        "\n"
+        "Makevoke classes:\n"
+        "\n"
+        "  Makefile (BASE_DIR, ECHO_BIN)\n"
+    )
+
+
+def test_cli_run(capfd, monkeypatch, tasks_file):
+    """
+    Frontend should run tasks with their arguments.
+    """
+    # Invoke runner would read from stdin which is not allowed with capture
+    monkeypatch.setattr(sys, "stdin", io.StringIO())
+
+    assert cli_frontend(["-f", str(tasks_file), "hello", "--name", "Ping"]) == 0
+    assert cli_frontend(["-f", str(tasks_file), "echo-context"]) == 0
+
+    captured = capfd.readouterr()
+    assert clean_ansi(captured.out) == "Hello Ping!\n.\n"
+
+
+def test_cli_missing_tasks(capsys, tmp_path):
+    """
+    Frontend should exit with an error when tasks module can not be found.
+    """
+    with pytest.raises(SystemExit):
+        cli_frontend(["-f", str(tmp_path / "nope.py"), "--list"])
+
+    captured = capsys.readouterr()
+    assert "Unable to find tasks module" in captured.err
+
+
+def test_cli_help_startup():
+    """
+    Frontend help should not import heavy modules and stay under time budget.
+
+    This is run in a fresh interpreter so imports from other tests do not count.
+    """
+    script = textwrap.dedent('''
+        import sys
+        import time
+
+        start = time.perf_counter()
+        from makevoke.cli.entrypoint import cli_frontend
+        try:
+            cli_frontend(["--help"])
+        except SystemExit:
+            pass
+        elapsed = time.perf_counter() - start
+
+        heavy = [
+            name for name in ("invoke", "colorama", "importlib.metadata")
+            if name in sys.modules
+        ]
+        sys.stderr.write("{}|{}".format(elapsed, ",".join(heavy)))
+    ''')
+
+    # Best of a few runs to avoid noise from a cold filesystem cache
+    timings = []
+    for i in range(3):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        elapsed, heavy = output.stderr.split("|")
+        assert "usage: makevoke" in output.stdout
+        assert heavy == ""
+        timings.append(float(elapsed))
+
+    assert min(timings) < HELP_TIME_BUDGET
+
+
+def test_task_index(tmp_path, tasks_file):
+    """
+    Index should be built once and then loaded without importing tasks until a
+    source file content changes.
+    """
+    index = TaskIndex(str(tasks_file), cache_dir=str(tmp_path / "cache"))
+    assert index.load() is None
+
+    imports = []
+
+    def loader():
+        imports.append(True)
+        return load_tasks_module(str(tasks_file))
+
+    data = index.get(loader)
+    assert len(imports) == 1
+    assert [task["name"] for task in data["tasks"]] == ["echo-context", "hello"]
+    assert data["tasks"][1]["aliases"] == ["hi"]
+    assert data["tasks"][1]["arguments"] == [
+        {"names": ["name", "n"], "kind": "str", "help": "Name to greet"},
+        {"names": ["loud", "l"], "kind": "bool", "help": ""},
+    ]
+    assert data["classes"] == [
+        {"name": "Makefile", "context": ["BASE_DIR", "ECHO_BIN"]},
+    ]
+    assert [source["path"] for source in data["sources"]] == [str(tasks_file)]
+
+    # Loaded from index file
+    assert index.get(loader) == data
+    assert len(imports) == 1
+
+    # Touching a file without changing its content does not invalidate index
+    stat = tasks_file.stat()
+    os.utime(tasks_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert index.get(loader)["tasks"] == data["tasks"]
+    assert len(imports) == 1
+    assert index.read()["sources"][0]["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+
+    # Changing content rebuild index
+    tasks_file.write_text(TASKS_SOURCE.replace("Say hello.", "Greet someone."))
+    assert index.get(loader)["tasks"][1]["help"] == "Greet someone."
+    assert len(imports) == 2
+
+
+def test_complete(tmp_path, tasks_file):
+    """
+    Completion candidates should be task names or arguments of the current task.
+    """
+    index = TaskIndex(str(tasks_file), cache_dir=str(tmp_path / "cache"))
+    data = index.get(lambda: load_tasks_module(str(tasks_file)))
+
+    assert complete(data, []) == ["echo-context", "hello", "hi"]
+    assert complete(data, ["h"]) == ["hello", "hi"]
+    assert complete(data, ["hello", "--"]) == ["--loud", "--name"]
+    assert complete(data, ["hi", "-"]) == ["--loud", "--name", "-l", "-n"]
+    assert complete(data, ["hello", "--name", "Ping", "e"]) == ["echo-context"]
+    assert complete(data, ["-"]) == []
+
+
+def test_cli_complete(capsys, tasks_file):
+    """
+    Frontend should print completion candidates and completion scripts.
+    """
+    assert cli_frontend(["-f", str(tasks_file), "--complete", "hello", "--n"]) == 0
+    assert capsys.readouterr().out == "--name\n"
+
+    assert cli_frontend(["--print-completion-script", "bash"]) == 0
+    assert "complete -F _makevoke_complete makevoke" in capsys.readouterr().out
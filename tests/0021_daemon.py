@@ -0,0 +1,193 @@
+import os
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from makevoke.cli import daemon
+from makevoke.utils import clean_ansi
+
+
+pytestmark = pytest.mark.skipif(
+    not daemon.is_available(),
+    reason="Daemon mode is not available on this system"
+)
+
+TASKS_SOURCE = textwrap.dedent('''
+    import os
+
+    from invoke import task
+
+    from makevoke.printout import PrintOutAbstract
+
+
+    @task
+    def hello(c, name="World"):
+        PrintOutAbstract.info("{{}} {{}} from {{}}".format(
+            "{greeting}", name, os.environ.get("WHO"),
+        ))
+
+
+    @task
+    def fail(c):
+        raise SystemExit(3)
+''')
+
+
+def wait_for(predicate, timeout=10):
+    """
+    Wait until predicate is true or fail after timeout.
+    """
+    start = time.monotonic()
+    while not predicate():
+        if time.monotonic() - start > timeout:
+            raise AssertionError("Timeout while waiting for daemon")
+        time.sleep(0.02)
+
+
+@pytest.fixture(scope="function")
+def tasks_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    path = tmp_path / "tasks.py"
+    path.write_text(TASKS_SOURCE.format(greeting="Hello"))
+
+    return path
+
+
+def test_is_enabled():
+    """
+    Daemon mode should be enabled from environment variable.
+    """
+    assert daemon.is_enabled({}) is False
+    assert daemon.is_enabled({"MAKEVOKE_DAEMON": "0"}) is False
+    assert daemon.is_enabled({"MAKEVOKE_DAEMON": "1"}) is True
+    assert daemon.is_enabled({"MAKEVOKE_DAEMON": "yes"}) is True
+
+
+def test_daemon_run_reload_stop(capfd, monkeypatch, tmp_path, tasks_file):
+    """
+    Daemon should run tasks with client environment and file descriptors, reload on
+    source changes and stop on request.
+    """
+    socket_path = str(tmp_path / "daemon.sock")
+    process = daemon.start_daemon(str(tasks_file), socket_path=socket_path)
+
+    try:
+        wait_for(lambda: daemon.request(socket_path, "ping") is not None)
+        assert daemon.request(socket_path, "ping")["pid"] == process.pid
+
+        monkeypatch.setenv("WHO", "client")
+        code = daemon.run_with_daemon(
+            str(tasks_file),
+            ["hello", "--name", "Ping"],
+            socket_path=socket_path,
+        )
+        assert code == 0
+        assert clean_ansi(capfd.readouterr().out) == "Hello Ping from client\n"
+
+        code = daemon.run_with_daemon(
+            str(tasks_file),
+            ["fail"],
+            socket_path=socket_path,
+        )
+        assert code == 3
+
+        # Change source, with a different size to not rely on timestamp resolution
+        tasks_file.write_text(TASKS_SOURCE.format(greeting="Greetings"))
+        code = daemon.run_with_daemon(
+            str(tasks_file),
+            ["hello"],
+            socket_path=socket_path,
+        )
+        assert code == 0
+        assert clean_ansi(capfd.readouterr().out) == "Greetings World from client\n"
+        assert daemon.request(socket_path, "ping")["reloads"] == 1
+
+        assert daemon.request(socket_path, "stop") == {"stopped": True}
+        assert process.wait(timeout=10) == 0
+        assert os.path.exists(socket_path) is False
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_daemon_idle_timeout(tmp_path, tasks_file):
+    """
+    Daemon should shut down after idle timeout.
+    """
+    socket_path = str(tmp_path / "daemon.sock")
+    server = daemon.DaemonServer(
+        str(tasks_file),
+        socket_path=socket_path,
+        idle_timeout=0.2,
+        poll_interval=0.05,
+    )
+
+    modules = dict(sys.modules)
+    path = list(sys.path)
+    try:
+        start = time.monotonic()
+        server.serve()
+        assert time.monotonic() - start < 5
+        assert os.path.exists(socket_path) is False
+    finally:
+        sys.modules.clear()
+        sys.modules.update(modules)
+        sys.path[:] = path
+
+
+def test_no_daemon(tmp_path, tasks_file):
+    """
+    Client should report when there is no running daemon.
+    """
+    socket_path = str(tmp_path / "nope.sock")
+
+    assert daemon.request(socket_path, "ping") is None
+    assert daemon.run_with_daemon(
+        str(tasks_file),
+        ["hello"],
+        socket_path=socket_path,
+    ) is None
+
+
+def test_daemon_concurrent_and_stalled(monkeypatch, tmp_path, tasks_file):
+    """
+    A daemon should not take the socket of a running one and a stalled client
+    should not block other requests.
+    """
+    monkeypatch.setattr(daemon, "REQUEST_TIMEOUT", 0.2)
+    socket_path = str(tmp_path / "daemon.sock")
+    server = daemon.DaemonServer(
+        str(tasks_file), socket_path=socket_path, poll_interval=0.05,
+    )
+
+    modules = dict(sys.modules)
+    path = list(sys.path)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    try:
+        wait_for(lambda: daemon.request(socket_path, "ping") is not None)
+
+        other = daemon.DaemonServer(str(tasks_file), socket_path=socket_path)
+        assert other.bind() is None
+        assert daemon.request(socket_path, "ping")["pid"] == os.getpid()
+
+        stalled = daemon.connect(socket_path)
+        try:
+            start = time.monotonic()
+            assert daemon.request(socket_path, "ping") is not None
+            assert time.monotonic() - start < 5
+        finally:
+            stalled.close()
+
+        assert daemon.request(socket_path, "stop") == {"stopped": True}
+        thread.join(timeout=10)
+        assert thread.is_alive() is False
+    finally:
+        sys.modules.clear()
+        sys.modules.update(modules)
+        sys.path[:] = path
@@ -0,0 +1,119 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from makevoke.base import MakevokeBase
+from makevoke.exceptions import MakevokeTemplateError
+from makevoke.templating import (
+    Template, TemplatingAbstract, load_template, write_if_changed,
+)
+
+
+class Makefile(TemplatingAbstract, MakevokeBase):
+    BASE_DIR = Path("/srv/project")
+    PORT = 8001
+    ENABLED_CONTEXT_VARS = ["BASE_DIR", "PORT"]
+
+
+def test_template():
+    """
+    Template should know its fields and render with a context.
+    """
+    template = Template("root {BASE_DIR.name};\nlisten {PORT:>6} {{ {PORT!r} }}")
+
+    assert template.fields == ["BASE_DIR", "PORT"]
+    assert template.render(Makefile.get_context()) == (
+        "root project;\nlisten   8001 { 8001 }"
+    )
+
+    assert Template("{PORT:>{WIDTH}}|{BASE_DIR!s:.4}").render(
+        {"PORT": 80, "WIDTH": 4, "BASE_DIR": Path("/srv")}
+    ) == "  80|/srv"
+
+    with pytest.raises(MakevokeTemplateError) as excinfo:
+        template.render({"PORT": 80})
+    assert str(excinfo.value) == (
+        "Template '<string>' uses undefined context variables: BASE_DIR"
+    )
+
+
+@pytest.mark.parametrize("source", ["{PORT", "port {} {0}"])
+def test_template_invalid(source):
+    """
+    Invalid templates should raise an error on compilation.
+    """
+    with pytest.raises(MakevokeTemplateError):
+        Template(source)
+
+
+def test_load_template_cache(tmp_path):
+    """
+    Parsed template should be cached until its file changes.
+    """
+    path = tmp_path / "sample.tpl"
+    path.write_text("{PORT}")
+    os.utime(path, ns=(1000, 1000))
+
+    template = load_template(path)
+    assert load_template(path) is template
+
+    path.write_text("{BASE_DIR}")
+    os.utime(path, ns=(2000, 2000))
+    assert load_template(path).fields == ["BASE_DIR"]
+
+
+def test_write_if_changed(tmp_path):
+    """
+    File should only be written when content differs.
+    """
+    path = tmp_path / "settings.ini"
+
+    assert write_if_changed(path, "a = 1\n") is True
+    path.chmod(0o600)
+    os.utime(path, ns=(1000, 1000))
+
+    assert write_if_changed(path, "a = 1\n") is False
+    assert write_if_changed(path, b"a = 1\n") is False
+    assert path.stat().st_mtime_ns == 1000
+
+    assert write_if_changed(path, "a = 2\n") is True
+    assert path.read_text() == "a = 2\n"
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert [item.name for item in tmp_path.iterdir()] == ["settings.ini"]
+
+
+def test_write_if_changed_umask(tmp_path):
+    """
+    New file permissions should follow the process umask.
+    """
+    umask = os.umask(0o027)
+    try:
+        assert write_if_changed(tmp_path / "new.ini", "a = 1\n") is True
+    finally:
+        os.umask(umask)
+
+    assert (tmp_path / "new.ini").stat().st_mode & 0o777 == 0o640
+
+
+def test_render_templates(tmp_path):
+    """
+    Templates should be rendered with Makevoke context and only written if changed.
+    """
+    templates = []
+    for index in range(5):
+        source = tmp_path / "conf{}.tpl".format(index)
+        source.write_text("server_{} {{BASE_DIR}}:{{PORT}} {{name}}".format(index))
+        templates.append((source, tmp_path / "conf{}.txt".format(index)))
+
+    assert Makefile.render_template(
+        templates[0][0], templates[0][1], extra={"name": "foo"}
+    ) is True
+    assert templates[0][1].read_text() == "server_0 /srv/project:8001 foo"
+
+    results = Makefile.render_templates(templates, extra={"name": "foo"}, workers=2)
+    assert results == {
+        destination: index > 0
+        for index, (source, destination) in enumerate(templates)
+    }
+    assert templates[4][1].read_text() == "server_4 /srv/project:8001 foo"
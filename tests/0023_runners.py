@@ -0,0 +1,126 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from invoke.exceptions import UnexpectedExit
+
+from makevoke.base import MakevokeBase
+from makevoke.runners import PythonResult, call_captured, shutdown_process_pool
+
+
+class Makefile(MakevokeBase):
+    NAME = "sample"
+    ENABLED_CONTEXT_VARS = ["BASE_DIR", "NAME"]
+
+
+def greet(context, greeting, punctuation="!"):
+    print("{} {}{}".format(greeting, context["NAME"], punctuation))
+    print("warning", file=sys.stderr)
+    return len(context["NAME"])
+
+
+def leave(context, code):
+    print("leaving")
+    sys.exit(code)
+
+
+def explode(context):
+    raise ValueError("Boom")
+
+
+def chatter(context, name):
+    for i in range(5):
+        print(name)
+        time.sleep(0.001)
+
+
+@pytest.mark.parametrize("func, args, expected", [
+    (greet, ("Hello",), (6, "Hello sample!\n", "warning\n", 0)),
+    (leave, (None,), (None, "leaving\n", "", 0)),
+    (leave, (3,), (None, "leaving\n", "", 3)),
+    (leave, ("Failed",), (None, "leaving\n", "Failed\n", 1)),
+])
+def test_call_captured(func, args, expected):
+    """
+    Function outputs and exit code should be captured.
+    """
+    assert call_captured(func, {"NAME": "sample"}, args=args) == expected
+
+
+def test_call_captured_exception():
+    """
+    Exceptions should be captured as a failure with traceback in error output.
+    """
+    return_value, stdout, stderr, exited = call_captured(explode, {})
+
+    assert exited == 1
+    assert stderr.startswith("Traceback")
+    assert stderr.endswith("ValueError: Boom\n")
+
+
+def test_call_captured_threads():
+    """
+    Concurrent captured calls should only capture their own outputs.
+    """
+    results = {}
+
+    def work(name):
+        results[name] = call_captured(chatter, {}, args=(name,))[1]
+
+    threads = [threading.Thread(target=work, args=(str(i),)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {str(i): "{}\n".format(i) * 5 for i in range(4)}
+
+
+def test_run_python(capsys):
+    """
+    Function should be run in process and its outputs printed unless hidden.
+    """
+    result = Makefile.run_python(greet, "Hi", punctuation="?")
+
+    assert isinstance(result, PythonResult)
+    assert result.ok is True
+    assert result.return_value == 6
+    assert result.command.endswith("0023_runners.greet")
+    assert result.stdout == "Hi sample?\n"
+
+    captured = capsys.readouterr()
+    assert captured.out == "Hi sample?\n"
+    assert captured.err == "warning\n"
+
+    result = Makefile.run_python(greet, "Hi", extra={"NAME": "foo"}, hide=True)
+    assert result.stdout == "Hi foo!\n"
+    assert capsys.readouterr().out == ""
+
+
+def test_run_python_failure():
+    """
+    Failure should raise an error unless warn is enabled.
+    """
+    with pytest.raises(UnexpectedExit):
+        Makefile.run_python(explode, hide=True)
+
+    result = Makefile.run_python(leave, 2, hide=True, warn=True)
+    assert result.failed is True
+    assert result.exited == 2
+
+
+def test_run_python_pool(capsys):
+    """
+    Function should be run on a reused process pool.
+    """
+    try:
+        first = Makefile.run_python(greet, "Hello", pool=True, hide=True)
+        second = Makefile.run_python(leave, 4, pool=True, hide=True, warn=True)
+    finally:
+        shutdown_process_pool()
+
+    assert first.return_value == 6
+    assert first.stdout == "Hello sample!\n"
+    assert second.exited == 4
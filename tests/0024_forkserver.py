@@ -0,0 +1,173 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from invoke import MockContext
+from invoke.exceptions import UnexpectedExit
+
+from makevoke.base import MakevokeBase
+from makevoke.forkserver import ForkServer, ForkServerExecutor, is_available
+
+
+pytestmark = pytest.mark.skipif(
+    not is_available(),
+    reason="Fork server requires fork and Unix sockets"
+)
+
+
+def tool_main():
+    print("argv:", " ".join(sys.argv[1:]))
+    print("some error", file=sys.stderr)
+    return int(sys.argv[-1]) if sys.argv[-1].isdigit() else None
+
+
+@pytest.fixture(scope="function")
+def executor(tmp_path):
+    """
+    Executor with a fake console script.
+    """
+    scripts = tmp_path / "bin"
+    scripts.mkdir()
+    script = scripts / "tool"
+    script.write_text("#!/bin/sh\n")
+    script.chmod(0o755)
+
+    executor = ForkServerExecutor(
+        programs=["tool"],
+        modules=["json.tool"],
+        preload=["json"],
+        scripts_dir=str(scripts),
+    )
+    executor._entry_points = {"tool": "{}:tool_main".format(__name__)}
+
+    yield executor
+
+    executor.close()
+
+
+def test_accepts(tmp_path, executor):
+    """
+    Only commands from current environment without shell syntax should be accepted.
+    """
+    tool = str(tmp_path / "bin" / "tool")
+
+    assert executor.accepts(tool + " --flag=1 'quoted arg'") is True
+    assert executor.accepts(tool, hide=True, warn=True) is True
+    assert executor.accepts(tool, pty=True) is False
+    assert executor.accepts(tool + " | cat") is False
+    assert executor.accepts(tool + " *.py") is False
+    assert executor.accepts("tool") is False
+    assert executor.accepts(str(tmp_path / "nope")) is False
+
+    assert executor.accepts(sys.executable + " -m json.tool") is True
+    assert executor.accepts(sys.executable + " -m pytest") is False
+    assert executor.accepts(sys.executable + " script.py") is False
+
+    # Interpreter from another environment, like a virtual environment whose
+    # interpreter links to the current one
+    other = tmp_path / "venv" / "bin"
+    other.mkdir(parents=True)
+    (other / "python").symlink_to(os.path.realpath(sys.executable))
+    assert executor.accepts(str(other / "python") + " -m json.tool") is False
+
+
+def test_run_entry_point(tmp_path, executor, capsys):
+    """
+    Console script entry point should be run from fork server with its outputs and
+    exit code.
+    """
+    tool = str(tmp_path / "bin" / "tool")
+
+    class Makefile(MakevokeBase):
+        EXECUTORS = [executor]
+        TOOL_BIN = tool
+        ENABLED_CONTEXT_VARS = ["BASE_DIR", "TOOL_BIN"]
+
+    # Context would fail with any command which is not run from executor
+    inv = MockContext()
+
+    result = Makefile.run(inv, "{TOOL_BIN} hello 'big world'")
+    assert result.ok is True
+    assert result.stdout == "argv: hello big world\n"
+    assert result.stderr == "some error\n"
+
+    captured = capsys.readouterr()
+    assert captured.out == "argv: hello big world\n"
+    assert captured.err == "some error\n"
+
+    result = Makefile.run(inv, "{TOOL_BIN} {code}", extra={"code": 3}, warn=True,
+                          hide=True)
+    assert result.exited == 3
+    assert result.stdout == "argv: 3\n"
+    assert capsys.readouterr().out == ""
+
+    with pytest.raises(UnexpectedExit):
+        Makefile.run(inv, "{TOOL_BIN} 4", hide="out")
+    assert capsys.readouterr().err == "some error\n"
+
+    # Server is reused
+    pid = executor.server.pid
+    Makefile.run(inv, "{TOOL_BIN}", hide=True)
+    assert executor.server.pid == pid
+
+
+def test_server_restart(tmp_path, monkeypatch, executor):
+    """
+    A server which has died between two runs should be started again.
+    """
+    tool = str(tmp_path / "bin" / "tool")
+
+    result = executor.run(None, tool + " first", hide=True)
+    assert result.stdout == "argv: first\n"
+
+    pid = executor.server.pid
+    os.kill(pid, signal.SIGKILL)
+    time.sleep(0.1)
+
+    result = executor.run(None, tool + " second", hide=True)
+    assert result.stdout == "argv: second\n"
+    assert executor.server.pid not in (None, pid)
+
+    # Also when server death is only noticed when sending request
+    monkeypatch.setattr(
+        ForkServer, "running", property(lambda self: self.pid is not None)
+    )
+    pid = executor.server.pid
+    os.kill(pid, signal.SIGKILL)
+    time.sleep(0.1)
+
+    result = executor.run(None, tool + " third", hide=True)
+
+    assert result.stdout == "argv: third\n"
+
+
+@pytest.mark.parametrize("content", ['{"b": 1, "a": [1, 2]}', "{nope"])
+def test_run_module(tmp_path, monkeypatch, executor, content):
+    """
+    Module run should have the same outputs and exit code than a new process.
+    """
+    # Pytest import hook would claim every modules since tests patterns match any
+    # Python files, it can not run them as main module
+    monkeypatch.setattr(sys, "meta_path", [
+        item for item in sys.meta_path
+        if type(item).__name__ != "AssertionRewritingHook"
+    ])
+
+    source = tmp_path / "sample.json"
+    source.write_text(content)
+    command = "{} -m json.tool --sort-keys {}".format(sys.executable, source)
+
+    expected = subprocess.run(command, shell=True, capture_output=True, text=True)
+
+    class Makefile(MakevokeBase):
+        EXECUTORS = [executor]
+
+    result = Makefile.run(MockContext(), command, hide=True, warn=True)
+
+    assert result.exited == expected.returncode
+    assert result.stdout == expected.stdout
+    assert result.stderr == expected.stderr
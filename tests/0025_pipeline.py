@@ -0,0 +1,94 @@
+import sys
+
+import pytest
+
+from invoke.exceptions import UnexpectedExit
+
+from makevoke.base import MakevokeBase
+from makevoke.pipeline import Pipeline
+
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32",
+    reason="Tests rely on POSIX commands"
+)
+
+
+class Makefile(MakevokeBase):
+    PYTHON_BIN = sys.executable
+    ENABLED_CONTEXT_VARS = ["BASE_DIR", "PYTHON_BIN"]
+
+
+def numbers(lines):
+    for i in range(1, 6):
+        yield str(i)
+
+
+def odds(lines):
+    for line in lines:
+        if int(line) % 2:
+            yield line
+
+
+def explode(lines):
+    for line in lines:
+        raise ValueError("Boom")
+        yield line
+
+
+def test_pipeline_commands(capfd):
+    """
+    Commands and Python stages should stream data to each others.
+    """
+    result = Makefile.pipeline(
+        "printf '3\\n1\\n2\\n5\\n'",
+        "sort -n",
+        odds,
+        "{PYTHON_BIN} -c \"import sys; print(sys.stdin.read().upper().strip())\"",
+        capture=True,
+    )
+
+    assert result.ok is True
+    assert result.stdout == "1\n3\n5\n"
+    assert [stage.exited for stage in result.stages] == [0, 0, 0, 0]
+    assert result.stages[2].name == "odds"
+    assert capfd.readouterr().out == "1\n3\n5\n"
+
+
+def test_pipeline_python_source(capfd):
+    """
+    First stage can be a Python generator and output can be hidden.
+    """
+    result = Makefile.pipeline(numbers, odds, "tr '\\n' ,", hide=True, capture=True)
+
+    assert result.stdout == "1,3,5,"
+    assert result.command == "numbers | odds | tr '\\n' ,"
+    assert capfd.readouterr().out == ""
+
+
+def test_pipeline_early_exit():
+    """
+    A stage which stops reading should not block or fail producers.
+    """
+    def many(lines):
+        for i in range(1000000):
+            yield "line {}".format(i)
+
+    result = Pipeline([many, "head -n 2"]).run(capture=True, hide=True)
+
+    assert result.stdout == "line 0\nline 1\n"
+    assert [stage.exited for stage in result.stages] == [0, 0]
+
+
+def test_pipeline_failures(capfd):
+    """
+    Pipeline should fail if any stage failed.
+    """
+    with pytest.raises(UnexpectedExit):
+        Makefile.pipeline("printf 'a\\n'", explode, "cat", hide=True)
+
+    assert capfd.readouterr().err.endswith("ValueError: Boom\n")
+
+    result = Makefile.pipeline("exit 3", "cat", warn=True, hide=True)
+    assert result.exited == 3
+    assert [stage.exited for stage in result.stages] == [3, 0]
@@ -0,0 +1,216 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from makevoke.base import MakevokeBase
+from makevoke.registry import ProjectRegistry, is_project_class
+
+
+class Abstract(MakevokeBase):
+    pass
+
+
+class Foo(Abstract):
+    BASE_DIR = Path("foo")
+    PROJECT_TAGS = ["python"]
+
+
+class Bar(Abstract):
+    BASE_DIR = Path("bar")
+    PROJECT_NAME = "bar-api"
+    PROJECT_TAGS = ["python", "api"]
+
+    @classmethod
+    def build(cls, inv, flag=None):
+        return "built {} {}".format(inv.command_cwds[-1], flag)
+
+
+TASKS_MODULE = """
+from pathlib import Path
+
+from makevoke.base import MakevokeBase
+
+
+class Project(MakevokeBase):
+    BASE_DIR = Path(__file__).parent
+    PROJECT_NAME = "{name}"
+"""
+
+
+def test_discover():
+    """
+    Discovery should only register subclasses defining their own base directory.
+    """
+    registry = ProjectRegistry()
+    registry.discover(base=Abstract)
+
+    assert is_project_class(Abstract) is False
+    assert sorted(registry.projects) == ["Foo", "bar-api"]
+    # Relative to this module
+    assert registry.projects["Foo"].base_dir == Path(__file__).parent.resolve() / "foo"
+
+    assert [p.name for p in registry.select(patterns=["bar-*"])] == ["bar-api"]
+    assert [p.name for p in registry.select(tags=["python"])] == ["Foo", "bar-api"]
+    assert [p.name for p in registry.select(tags=["api"], names=["Foo"])] == []
+    assert [
+        p.name for p in registry.select(predicate=lambda p: p.klass is Foo)
+    ] == ["Foo"]
+
+
+def test_discover_files(tmp_path):
+    """
+    Tasks modules with the same filename should be imported from every
+    sub-projects and only their own classes registered.
+    """
+    for name in ("alpha", "beta"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "tasks.py").write_text(TASKS_MODULE.format(name=name))
+    (tmp_path / "node_modules" / "gamma").mkdir(parents=True)
+    (tmp_path / "node_modules" / "gamma" / "tasks.py").write_text(
+        TASKS_MODULE.format(name="gamma")
+    )
+
+    registry = ProjectRegistry()
+    found = registry.discover_files(tmp_path)
+
+    assert [project.name for project in found] == ["alpha", "beta"]
+    assert registry.projects["beta"].base_dir == tmp_path / "beta"
+    assert registry.discover_files(tmp_path)[0].klass is found[0].klass
+
+
+def test_register_conflict():
+    """
+    Two different classes can not be registered with the same name.
+    """
+    registry = ProjectRegistry()
+    registry.register(Foo, name="same")
+
+    with pytest.raises(ValueError):
+        registry.register(Bar, name="same")
+
+
+def test_run_method():
+    """
+    A task method name should be called with an Invoke context from project
+    directory.
+    """
+    registry = ProjectRegistry()
+    registry.register(Bar)
+
+    report = registry.run("build", flag="yes")
+
+    assert report.ok is True
+    assert report.results["bar-api"].value == "built {} yes".format(
+        Path(__file__).parent.resolve() / "bar"
+    )
+    assert report.rows()[0][:2] == ["bar-api", "success"]
+
+
+def test_run_commands(tmp_path):
+    """
+    Commands from tasks should run from their project directory.
+    """
+    registry = ProjectRegistry()
+    for name in ("alpha", "beta"):
+        (tmp_path / name).mkdir()
+        klass = type(name, (MakevokeBase,), {"BASE_DIR": tmp_path / name})
+        registry.register(klass)
+
+    def task(project, inv):
+        return project.klass.run(
+            inv, "{} -c \"import os; print(os.getcwd())\"".format(sys.executable),
+            hide=True, in_stream=False,
+        )
+
+    report = registry.run(task, workers=2)
+
+    assert report.succeeded == ["alpha", "beta"]
+    for name in ("alpha", "beta"):
+        assert report.results[name].value.stdout.strip() == str(tmp_path / name)
+
+
+RELATIVE_TASKS_MODULE = """
+from pathlib import Path
+
+from makevoke.base import MakevokeBase
+
+
+class Project(MakevokeBase):
+    BASE_DIR = Path(".")
+    PROJECT_NAME = "{name}"
+
+    @classmethod
+    def show(cls, inv):
+        return cls.run(inv, "cat {{BASE_DIR}}/data.txt", hide=True, in_stream=False)
+"""
+
+
+def test_run_resolved_context(tmp_path, monkeypatch):
+    """
+    Tasks should run with the resolved project context where a relative base
+    directory has been made absolute from the directory of its tasks module.
+    """
+    monkeypatch.chdir(tmp_path)
+    for name in ("alpha", "beta"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "data.txt").write_text("{} data".format(name))
+        (tmp_path / name / "tasks.py").write_text(
+            RELATIVE_TASKS_MODULE.format(name=name)
+        )
+
+    registry = ProjectRegistry()
+    alpha, beta = registry.discover_files(tmp_path)
+
+    assert alpha.context == {"BASE_DIR": tmp_path / "alpha"}
+    assert beta.base_dir == tmp_path / "beta"
+
+    # Class context is not resolved again for the run
+    monkeypatch.setattr(alpha.klass, "BASE_DIR", Path("nope"))
+    report = registry.run("show")
+
+    assert report.ok is True
+    assert report.results["alpha"].value.stdout == "alpha data"
+    assert report.results["beta"].value.stdout == "beta data"
+    assert alpha.klass.get_context() == {"BASE_DIR": Path("nope")}
+
+    with alpha.klass.use_context(alpha.context):
+        assert alpha.klass.get_context(extra={"FOO": 1}) == {
+            "BASE_DIR": tmp_path / "alpha", "FOO": 1,
+        }
+
+
+def test_run_failures():
+    """
+    Failures should be aggregated and early stop should skip pending projects.
+    """
+    registry = ProjectRegistry()
+    for i in range(6):
+        registry.register(
+            type("P{}".format(i), (MakevokeBase,), {"BASE_DIR": Path(".")})
+        )
+
+    calls = []
+    lock = threading.Lock()
+
+    def task(project, inv):
+        with lock:
+            calls.append(project.name)
+        if project.name in ("P1", "P3"):
+            raise RuntimeError("Boom")
+        return project.context["BASE_DIR"]
+
+    report = registry.run(task, workers=2)
+
+    assert report.ok is False
+    assert report.failed == ["P1", "P3"]
+    assert isinstance(report.results["P1"].error, RuntimeError)
+    assert len(calls) == 6
+
+    calls.clear()
+    report = registry.run(task, workers=1, fail_fast=True)
+
+    assert calls == ["P0", "P1"]
+    assert report.failed == ["P1"]
+    assert report.skipped == ["P2", "P3", "P4", "P5"]
@@ -0,0 +1,295 @@
+import json
+import socket
+import struct
+import sys
+import threading
+
+import pytest
+
+from invoke import MockContext
+from invoke.exceptions import UnexpectedExit
+
+from makevoke.base import MakevokeBase
+import makevoke.distributed
+from makevoke.distributed import (
+    DistributedExecutor, WorkerAgent, check_relative_path, parse_address,
+    read_frame, write_frame,
+)
+from makevoke.exceptions import MakevokeAgentError
+
+
+PYTHON = '"{}"'.format(sys.executable)
+
+
+@pytest.fixture(scope="function")
+def agents(tmp_path):
+    """
+    Start two agents on localhost with a capacity of one command each.
+    """
+    started = [
+        WorkerAgent(
+            port=0, capacity=1, workdir=str(tmp_path / "agent{}".format(i)),
+            token="secret",
+        ).start()
+        for i in range(2)
+    ]
+
+    yield started
+
+    for agent in started:
+        agent.shutdown()
+
+
+def test_parse_address():
+    """
+    Address should be parsed from string or tuple.
+    """
+    assert parse_address("build:9000") == ("build", 9000)
+    assert parse_address("build") == ("build", 8765)
+    assert parse_address("[::1]:9000") == ("::1", 9000)
+    assert parse_address(("build", "9000")) == ("build", 9000)
+
+
+@pytest.mark.parametrize("path", ["", "/etc/passwd", "../up", "a/../../b", "a//b"])
+def test_check_relative_path_invalid(path):
+    """
+    Paths escaping the job directory should be refused.
+    """
+    with pytest.raises(ValueError):
+        check_relative_path(path)
+
+
+def test_token_required(monkeypatch):
+    """
+    Agents should refuse to start without a token.
+    """
+    monkeypatch.delenv("MAKEVOKE_AGENT_TOKEN", raising=False)
+
+    with pytest.raises(MakevokeAgentError):
+        WorkerAgent(port=0)
+
+    with pytest.raises(MakevokeAgentError):
+        WorkerAgent(port=0, token="")
+
+
+@pytest.mark.parametrize("token", ["", None, 42])
+def test_empty_token_refused(agents, token):
+    """
+    Hello frames without a proper token should be refused.
+    """
+    sock = socket.create_connection(agents[0].address)
+    reader = sock.makefile("rb")
+    try:
+        header = {"type": "hello"}
+        if token is not None:
+            header["token"] = token
+        write_frame(sock, header)
+
+        assert read_frame(reader)[0]["type"] == "error"
+    finally:
+        reader.close()
+        sock.close()
+
+
+@pytest.mark.parametrize("size", [1, 10 ** 9, -1, "1", True])
+def test_hello_data_size_refused(agents, size):
+    """
+    Hello frames should not carry any data and invalid sizes should close the
+    connection, agent still serving other clients.
+    """
+    content = json.dumps({"type": "hello", "token": "secret", "size": size})
+    content = content.encode("utf-8")
+
+    sock = socket.create_connection(agents[0].address)
+    reader = sock.makefile("rb")
+    try:
+        sock.sendall(struct.pack("!i", len(content)) + content)
+
+        with pytest.raises(ConnectionError):
+            read_frame(reader)
+    finally:
+        reader.close()
+        sock.close()
+
+    executor = DistributedExecutor([agents[0].address], token="secret")
+
+    assert executor.run(None, "echo hello", hide=True).stdout == "hello\n"
+
+
+def test_hello_timeout(monkeypatch, tmp_path):
+    """
+    Clients not authenticating in time should be disconnected.
+    """
+    monkeypatch.setattr(makevoke.distributed, "HELLO_TIMEOUT", 0.2)
+    agent = WorkerAgent(port=0, workdir=str(tmp_path), token="secret").start()
+
+    sock = socket.create_connection(agent.address)
+    try:
+        sock.settimeout(5)
+        assert sock.recv(1) == b""
+    finally:
+        sock.close()
+        agent.shutdown()
+
+
+@pytest.mark.parametrize("files", [
+    [{"path": "a.txt", "digest": "0" * 64, "mode": "rwx"}],
+    [{"path": 42, "digest": "0" * 64}],
+    ["a.txt"],
+    42,
+])
+def test_run_invalid_files(agents, files):
+    """
+    Jobs with invalid input files should be refused.
+    """
+    sock = socket.create_connection(agents[0].address)
+    reader = sock.makefile("rb")
+    try:
+        write_frame(sock, {"type": "hello", "token": "secret"})
+        assert read_frame(reader)[0]["type"] == "hello"
+
+        write_frame(sock, {"type": "run", "command": "true", "files": files})
+        assert read_frame(reader)[0]["type"] == "error"
+    finally:
+        reader.close()
+        sock.close()
+
+
+def test_accepts():
+    """
+    Commands should be accepted from program names and supported options.
+    """
+    executor = DistributedExecutor(["localhost:1"], programs=["gcc"])
+
+    assert executor.accepts("gcc -c foo.c", hide=True, inputs=["foo.c"]) is True
+    assert executor.accepts("/usr/bin/gcc -c foo.c") is True
+    assert executor.accepts("gcc -c foo.c", pty=True) is False
+    assert executor.accepts("make") is False
+    assert DistributedExecutor(["localhost:1"]).accepts("make") is True
+
+
+def test_run_with_inputs(tmp_path, agents, capsys):
+    """
+    Inputs should be recreated on agent and outputs streamed back, contents only
+    being sent once to each agent.
+    """
+    root = tmp_path / "project"
+    (root / "src" / "sub").mkdir(parents=True)
+    (root / "src" / "a.txt").write_text("alpha\n")
+    (root / "src" / "sub" / "b.txt").write_text("beta\n")
+    (root / "other.txt").write_text("not sent\n")
+
+    executor = DistributedExecutor(
+        ["{}:{}".format(*agents[0].address)], root=str(root), token="secret",
+    )
+    command = "cat src/a.txt src/sub/b.txt && test ! -e other.txt && echo $FOO >&2"
+
+    result = executor.run(None, command, inputs=["src"], env={"FOO": "bar"})
+
+    assert result.ok is True
+    assert result.stdout == "alpha\nbeta\n"
+    assert result.stderr == "bar\n"
+    assert capsys.readouterr().out == "alpha\nbeta\n"
+    assert executor.sent == 2
+
+    executor.run(None, command, inputs=["src"], env={"FOO": "bar"}, hide=True)
+
+    assert executor.sent == 2
+    assert agents[0].served == 2
+
+
+def test_run_with_big_input(tmp_path, agents):
+    """
+    Contents bigger than a chunk should be streamed to the agent.
+    """
+    data = bytes(range(256)) * 1024
+    (tmp_path / "big.bin").write_bytes(data)
+
+    executor = DistributedExecutor(
+        [agents[0].address], root=str(tmp_path), token="secret",
+    )
+
+    result = executor.run(None, "wc -c < big.bin", inputs=["big.bin"], hide=True)
+
+    assert result.stdout.strip() == str(len(data))
+    assert executor.sent == 1
+
+
+def test_run_failure(agents):
+    """
+    A failed command should raise an exception like 'invoke' unless warned.
+    """
+    executor = DistributedExecutor(
+        [agents[0].address], token="secret",
+    )
+
+    with pytest.raises(UnexpectedExit):
+        executor.run(None, "exit 3", hide=True)
+
+    result = executor.run(None, "echo failed >&2; exit 3", hide=True, warn=True)
+
+    assert result.exited == 3
+    assert result.stderr == "failed\n"
+
+
+def test_unauthorized(agents):
+    """
+    Agents refusing the token should not be used.
+    """
+    executor = DistributedExecutor([agents[0].address], token="wrong")
+
+    with pytest.raises(ConnectionError):
+        executor.run(None, "echo hello", hide=True)
+
+
+def test_load_balancing(agents):
+    """
+    Commands run at once should be balanced on agents from their capacity, an
+    unreachable agent being ignored.
+    """
+    down = WorkerAgent(port=0, capacity=8, token="secret")
+    down_address = down.address
+    down.shutdown()
+
+    executor = DistributedExecutor(
+        [agent.address for agent in agents] + [down_address], token="secret",
+    )
+    command = "{} -c \"import time; time.sleep(0.2)\"".format(PYTHON)
+
+    threads = [
+        threading.Thread(target=executor.run, args=(None, command), daemon=True)
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [agent.served for agent in agents] == [2, 2]
+    assert [agent.capacity for agent in executor.agents[:2]] == [1, 1]
+    assert executor.agents[2].down is True
+
+
+def test_makevoke_run(agents):
+    """
+    Executor should be usable from Makevoke class executors.
+    """
+    class Makefile(MakevokeBase):
+        NAME = "world"
+        ENABLED_CONTEXT_VARS = ["BASE_DIR", "NAME"]
+        EXECUTORS = [
+            DistributedExecutor(
+                [agents[1].address], programs=["echo"], token="secret",
+            ),
+        ]
+
+    ctx = MockContext(run=True, repeat=True)
+
+    result = Makefile.run(ctx, "echo hello {NAME}", hide=True)
+
+    assert result.stdout == "hello world\n"
+    assert agents[1].served == 1
+
+    Makefile.run(ctx, "ls", hide=True)
+
+    assert ctx.run.call_args_list[0][0] == ("ls",)
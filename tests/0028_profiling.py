@@ -0,0 +1,162 @@
+import os
+import pstats
+import tracemalloc
+
+import pytest
+
+from invoke import MockContext, task
+
+from makevoke.base import MakevokeBase
+from makevoke.printout import PrintOutAbstract
+from makevoke.profiling import (
+    PROFILERS, Profile, StackSampler, get_profilers, parse_profilers, profile,
+)
+from makevoke.utils import clean_ansi
+
+
+@pytest.fixture(autouse=True)
+def clean_environ(monkeypatch):
+    for name in ("MAKEVOKE_PROFILE", "MAKEVOKE_PROFILE_TASKS", "MAKEVOKE_PROFILE_DIR"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def busy(size=20000):
+    return [str(i) * 3 for i in range(size)]
+
+
+def test_parse_profilers():
+    """
+    Profilers should be parsed from strings or lists.
+    """
+    assert parse_profilers(None) == ()
+    assert parse_profilers("") == ()
+    assert parse_profilers("stacks, cpu") == ("cpu", "stacks")
+    assert parse_profilers(["memory"]) == ("memory",)
+    assert parse_profilers("all") == PROFILERS
+
+    with pytest.raises(ValueError):
+        parse_profilers("cpu,gpu")
+
+
+def test_get_profilers(monkeypatch):
+    """
+    Environment should take precedence over class attributes.
+    """
+    class Makefile(MakevokeBase):
+        PROFILE = ["cpu"]
+        PROFILE_TASKS = ["build*"]
+
+    assert get_profilers(MakevokeBase, "build") == ()
+    assert get_profilers(Makefile, "build-docs") == ("cpu",)
+    assert get_profilers(Makefile, "test") == ()
+
+    monkeypatch.setenv("MAKEVOKE_PROFILE", "memory")
+    monkeypatch.setenv("MAKEVOKE_PROFILE_TASKS", "test")
+
+    assert get_profilers(Makefile, "build") == ()
+    assert get_profilers(Makefile, "test") == ("memory",)
+
+    monkeypatch.setenv("MAKEVOKE_PROFILE", "")
+
+    assert get_profilers(Makefile, "test") == ()
+
+
+def test_stack_sampler(tmp_path):
+    """
+    Sampler should write collapsed stacks with their counts.
+    """
+    sampler = StackSampler()
+    sampler.sample()
+    sampler.sample()
+    sampler.write(str(tmp_path / "out.collapsed"))
+
+    lines = (tmp_path / "out.collapsed").read_text().splitlines()
+
+    assert len(lines) == 1
+    stack, count = lines[0].rsplit(" ", 1)
+    assert count == "2"
+    assert stack.split(";")[-1].startswith("StackSampler.sample (profiling.py:")
+
+
+def test_profile(tmp_path, capsys):
+    """
+    Every profilers should write their profile and nested profiles should not
+    start active profilers again.
+    """
+    with profile("build", PROFILERS, str(tmp_path), interval=0.001) as current:
+        with profile("inner", ["cpu"], str(tmp_path)) as inner:
+            busy(200000)
+
+    assert inner.paths == {}
+    assert sorted(current.paths) == ["cpu", "memory", "stacks"]
+    assert os.path.basename(current.paths["cpu"]).startswith("build-")
+
+    stats = pstats.Stats(current.paths["cpu"])
+    assert any(key[2] == "busy" for key in stats.stats)
+
+    with open(current.paths["memory"]) as fp:
+        assert "size=" in fp.read()
+
+    with open(current.paths["stacks"]) as fp:
+        assert "busy (0028_profiling.py:" in fp.read()
+
+    # Paths are only reported from classes with printout methods
+    assert capsys.readouterr().err == ""
+
+
+def test_profile_memory_concurrent(tmp_path):
+    """
+    Memory profiles overlapping in time should share allocations tracing, which
+    is stopped once the last one has ended.
+    """
+    first = Profile("first", ["memory"], str(tmp_path))
+    second = Profile("second", ["memory"], str(tmp_path))
+
+    first.start()
+    second.start()
+    first.stop()
+    assert tracemalloc.is_tracing() is True
+    second.stop()
+
+    assert tracemalloc.is_tracing() is False
+    assert sorted(os.listdir(tmp_path)) == [
+        os.path.basename(first.paths["memory"]),
+        os.path.basename(second.paths["memory"]),
+    ]
+
+
+def test_profile_task(tmp_path, monkeypatch, capsys):
+    """
+    Decorated tasks and runs should be profiled only when enabled and written
+    profiles reported.
+    """
+    class Makefile(PrintOutAbstract, MakevokeBase):
+        PROFILE_DIR = tmp_path
+
+    @task
+    @Makefile.profile_task
+    def build_docs(ctx, size=10):
+        Makefile.run(ctx, "make docs", hide=True)
+        return len(busy(size))
+
+    ctx = MockContext(run=True, repeat=True)
+
+    assert build_docs(ctx, size=5) == 5
+    assert os.listdir(tmp_path) == []
+
+    monkeypatch.setenv("MAKEVOKE_PROFILE", "cpu")
+
+    assert build_docs(ctx) == 10
+    assert [name.split("-")[:2] for name in os.listdir(tmp_path)] == [
+        ["build", "docs"]
+    ]
+    assert clean_ansi(capsys.readouterr().out).startswith(
+        "Profile 'cpu' from build-docs written to: {}".format(tmp_path)
+    )
+
+    Makefile.run(ctx, "make docs", hide=True)
+
+    assert sorted(name.split("-")[0] for name in os.listdir(tmp_path)) == [
+        "build", "run"
+    ]
+    assert ctx.run.call_count == 3
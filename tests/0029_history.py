@@ -0,0 +1,179 @@
+import random
+import time
+
+import pytest
+
+from invoke import MockContext, task
+from invoke.runners import Result
+
+from makevoke.base import MakevokeBase
+from makevoke.history import (
+    RunHistory, get_history_path, get_revision, mann_whitney, percentile,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_environ(monkeypatch):
+    monkeypatch.delenv("MAKEVOKE_HISTORY", raising=False)
+
+
+def test_percentile():
+    """
+    Percentiles should be interpolated between closest values.
+    """
+    values = [float(i) for i in range(1, 101)]
+
+    assert percentile([], 50) is None
+    assert percentile([3.0], 99) == 3.0
+    assert percentile(values, 50) == 50.5
+    assert percentile(values, 95) == pytest.approx(95.05)
+    assert percentile(values, 100) == 100.0
+
+
+def test_mann_whitney():
+    """
+    Only clearly greater recent values should have a small p-value.
+    """
+    rng = random.Random(42)
+    baseline = [rng.gauss(1.0, 0.05) for i in range(40)]
+
+    assert mann_whitney(baseline, [rng.gauss(1.5, 0.05) for i in range(10)]) < 0.001
+    assert mann_whitney(baseline, [rng.gauss(1.0, 0.05) for i in range(10)]) > 0.01
+    assert mann_whitney(baseline, [rng.gauss(0.5, 0.05) for i in range(10)]) > 0.99
+    assert mann_whitney([1.0] * 5, [1.0] * 5) == 1.0
+
+
+def test_get_history_path(tmp_path, monkeypatch):
+    """
+    Environment should take precedence over class attribute.
+    """
+    class Makefile(MakevokeBase):
+        HISTORY = tmp_path / "history.db"
+
+    assert get_history_path(MakevokeBase) is None
+    assert get_history_path(Makefile) == str(tmp_path / "history.db")
+
+    monkeypatch.setenv("MAKEVOKE_HISTORY", "0")
+    assert get_history_path(Makefile) is None
+
+    monkeypatch.setenv("MAKEVOKE_HISTORY", "1")
+    assert get_history_path(MakevokeBase).endswith("history.sqlite3")
+
+
+def test_get_revision(tmp_path):
+    """
+    Revision should be read from loose or packed references.
+    """
+    git_dir = tmp_path / ".git"
+    (git_dir / "refs" / "heads").mkdir(parents=True)
+    (tmp_path / "sub").mkdir()
+
+    (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+    (git_dir / "packed-refs").write_text("# pack-refs\nabc123 refs/heads/main\n")
+    assert get_revision(str(tmp_path / "sub")) == "abc123"
+
+    (git_dir / "refs" / "heads" / "main").write_text("def456\n")
+    assert get_revision(str(tmp_path)) == "def456"
+
+    (git_dir / "HEAD").write_text("0123abcd\n")
+    assert get_revision(str(tmp_path)) == "0123abcd"
+
+
+def test_stats_and_regressions(tmp_path):
+    """
+    Statistics should be computed per template and slowdowns detected against
+    previous runs.
+    """
+    rng = random.Random(1)
+    now = time.time()
+
+    with RunHistory(str(tmp_path / "history.db")) as history:
+        for i in range(60):
+            slow = 2.0 if i >= 50 else 1.0
+            history.record(
+                "command", "make {}".format(i), "make {NAME}",
+                rng.gauss(slow, 0.05), 0.1, 0, started=now - 600 + i,
+            )
+            history.record(
+                "task", "lint", "lint", rng.gauss(0.5, 0.05), 0.1, 0,
+                started=now - 600 + i,
+            )
+
+        stats = history.stats()
+
+        assert [item["template"] for item in stats] == ["lint", "make {NAME}"]
+        assert stats[0]["count"] == 60
+        assert stats[0]["p50"] == pytest.approx(0.5, abs=0.05)
+        assert stats[0]["p50"] <= stats[0]["p95"] <= stats[0]["p99"]
+
+        regressions = history.regressions()
+
+        assert [item.template for item in regressions] == ["make {NAME}"]
+        assert regressions[0].ratio == pytest.approx(2.0, abs=0.2)
+        assert regressions[0].p_value < 0.01
+
+
+def test_compact(tmp_path):
+    """
+    Old records should be replaced with daily summaries and compaction should run
+    at most once a day.
+    """
+    now = time.time()
+    path = str(tmp_path / "history.db")
+
+    with RunHistory(path) as history:
+        for i in range(10):
+            history.record(
+                "command", "make", "make", float(i + 1), 0.5, 1 if i == 0 else 0,
+                started=now - 40 * 86400,
+            )
+        history.record("command", "make", "make", 3.0, 0.5, 0, started=now)
+
+        assert history.maybe_compact(now=now) is None
+        assert history.compact(now=now) == 10
+
+        daily = history.daily()
+        assert len(daily) == 1
+        assert daily[0]["count"] == 10
+        assert daily[0]["failures"] == 1
+        assert daily[0]["mean"] == 5.5
+        assert daily[0]["cpu_time"] == 5.0
+        assert history.stats()[0]["count"] == 1
+
+        assert history.maybe_compact(now=now + 3600) is None
+        assert history.maybe_compact(now=now + 2 * 86400) == 0
+
+
+def test_record_runs(tmp_path):
+    """
+    Runs and decorated tasks should be recorded only when enabled, with their exit
+    code.
+    """
+    class Makefile(MakevokeBase):
+        NAME = "foo"
+        ENABLED_CONTEXT_VARS = ["BASE_DIR", "NAME"]
+        HISTORY = tmp_path / "history.db"
+
+    @task
+    @Makefile.record_task
+    def build_all(ctx):
+        Makefile.run(ctx, "make {NAME}")
+
+    ctx = MockContext(run={
+        "make foo": Result(exited=0),
+        "make bar": Result(exited=2),
+    })
+
+    build_all(ctx)
+    Makefile.run(ctx, "make {NAME}", extra={"NAME": "bar"})
+
+    with RunHistory(str(tmp_path / "history.db")) as history:
+        rows = history.connection.execute(
+            "SELECT kind, name, template, exited FROM runs ORDER BY id"
+        ).fetchall()
+
+    assert rows == [
+        ("command", "make foo", "make {NAME}", 0),
+        ("task", "build-all", "build-all", 0),
+        ("command", "make bar", "make {NAME}", 2),
+    ]
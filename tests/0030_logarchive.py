@@ -0,0 +1,113 @@
+import gzip
+import os
+import sys
+
+import pytest
+
+from invoke import Config, Context
+from invoke.exceptions import UnexpectedExit
+
+from makevoke.base import MakevokeBase
+from makevoke.logarchive import LogArchive
+
+
+@pytest.fixture(autouse=True)
+def clean_environ(monkeypatch):
+    monkeypatch.delenv("MAKEVOKE_LOG_ARCHIVE", raising=False)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma"])
+def test_write_and_read(tmp_path, compression):
+    """
+    Outputs should be read back from their own members only.
+    """
+    archive = LogArchive(str(tmp_path), compression=compression)
+
+    for i in range(3):
+        writer = archive.open("make {}".format(i))
+        writer.stdout.write("line {}\n".format(i) * 1000)
+        writer.stderr.write(b"error\n")
+        entry = writer.close(exited=i)
+
+    assert entry["command"] == "make 2"
+    assert entry["exited"] == 2
+    assert entry["stdout"][2] == 7000
+    assert [item["command"] for item in archive.find(command="make [12]")] == [
+        "make 1", "make 2"
+    ]
+    assert archive.find(since=entry["started"] + 60) == []
+
+    first = archive.find()[0]
+    assert archive.read(first) == "line 0\n" * 1000
+    assert archive.read(archive.get(entry["id"]), "stderr") == "error\n"
+
+    # No spool file is left and segment is a valid multi-member file
+    assert sorted(os.listdir(tmp_path)) == [
+        ".lock", "index.jsonl",
+        "segment-000000.log.{}".format("gz" if compression == "gzip" else "xz"),
+    ]
+    if compression == "gzip":
+        content = gzip.decompress((tmp_path / "segment-000000.log.gz").read_bytes())
+        assert content.count(b"error\n") == 3
+
+
+def test_rotation(tmp_path):
+    """
+    Segments should be rotated on size and only last ones kept with their index
+    entries.
+    """
+    archive = LogArchive(str(tmp_path), max_segment_size=1, max_segments=2)
+
+    for i in range(4):
+        writer = archive.open("make {}".format(i))
+        writer.stdout.write("output {}\n".format(i))
+        writer.close(exited=0)
+
+    assert archive.get_segments() == [
+        "segment-000002.log.gz", "segment-000003.log.gz"
+    ]
+    entries = archive.find()
+    assert [entry["command"] for entry in entries] == ["make 2", "make 3"]
+    assert archive.read(entries[0]) == "output 2\n"
+
+
+def test_makevoke_run(tmp_path, capsys):
+    """
+    Outputs of runs should be archived while still printed unless hidden.
+    """
+    class Makefile(MakevokeBase):
+        PYTHON = '"{}"'.format(sys.executable)
+        ENABLED_CONTEXT_VARS = ["BASE_DIR", "PYTHON"]
+        LOG_ARCHIVE = tmp_path / "logs"
+
+    script = "import sys; print('hello'); print('oops', file=sys.stderr); exit({})"
+
+    result = Makefile.run(
+        Context(), "{{PYTHON}} -c \"{}\"".format(script.format(0)), in_stream=False,
+    )
+
+    assert result.stdout == "hello\n"
+    assert capsys.readouterr().out == "hello\n"
+
+    with pytest.raises(UnexpectedExit):
+        Makefile.run(
+            Context(), "{{PYTHON}} -c \"{}\"".format(script.format(3)),
+            hide=True, in_stream=False,
+        )
+
+    assert capsys.readouterr().out == ""
+
+    # Hidden from configuration
+    hidden = Context(config=Config(overrides={"run": {"hide": True}}))
+    Makefile.run(
+        hidden, "{{PYTHON}} -c \"{}\"".format(script.format(0)), in_stream=False,
+    )
+
+    assert capsys.readouterr().out == ""
+
+    archive = LogArchive(str(tmp_path / "logs"))
+    entries = archive.find()
+
+    assert [entry["exited"] for entry in entries] == [0, 3, 0]
+    assert archive.read(entries[1]) == "hello\n"
+    assert archive.read(entries[1], "stderr") == "oops\n"